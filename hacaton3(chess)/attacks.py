@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Модуль з таблицями ходів і атак, обчисленими наперед для кожного поля
+
+Усі таблиці - словники {(x, y): ...}:
+    KNIGHT_MOVES, KING_MOVES - список полів, куди б'є кінь/король з даного поля
+    PAWN_TAKES[color] - список полів, які б'є пішак кольору color з даного поля
+    PAWN_ATTACKERS[color] - список полів, з яких пішак кольору color б'є дане поле
+    ROOK_RAYS, BISHOP_RAYS, QUEEN_RAYS - список променів з даного поля; кожен промінь -
+                                         список полів у порядку віддалення
+"""
+
+SQUARES = [(x, y) for y in range(8) for x in range(8)]
+
+KNIGHT_STEPS = [(1, 2), (2, 1), (1, -2), (2, -1), (-1, 2), (-2, 1), (-1, -2), (-2, -1)]
+KING_STEPS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+ROOK_DIRS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRS = [(-1, -1), (1, 1), (1, -1), (-1, 1)]
+
+
+def on_desk(pos):
+    return 0 <= pos[0] < 8 and 0 <= pos[1] < 8
+
+
+def _step_table(steps):
+    """
+    таблиця полів, досяжних одним кроком з кожного поля
+
+    :param steps: список зміщень (dx, dy)
+    :return: словник {(x, y): список кортежів (х, у)}
+    """
+    return {pos: [(pos[0] + dx, pos[1] + dy) for dx, dy in steps if on_desk((pos[0] + dx, pos[1] + dy))]
+            for pos in SQUARES}
+
+
+def _ray_table(directions):
+    """
+    таблиця променів з кожного поля у заданих напрямках
+
+    :param directions: список напрямків (dx, dy)
+    :return: словник {(x, y): список променів}
+    """
+    table = {}
+    for pos in SQUARES:
+        rays = []
+        for dx, dy in directions:
+            ray = []
+            tmp = (pos[0] + dx, pos[1] + dy)
+            while on_desk(tmp):
+                ray.append(tmp)
+                tmp = (tmp[0] + dx, tmp[1] + dy)
+            if ray:
+                rays.append(ray)
+        table[pos] = rays
+    return table
+
+
+KNIGHT_MOVES = _step_table(KNIGHT_STEPS)
+KING_MOVES = _step_table(KING_STEPS)
+PAWN_TAKES = {'w': _step_table([(1, 1), (-1, 1)]),
+              'b': _step_table([(1, -1), (-1, -1)])}
+# пішак кольору color б'є поле cell, якщо стоїть на полі, яке б'є з cell пішак іншого кольору
+PAWN_ATTACKERS = {'w': PAWN_TAKES['b'], 'b': PAWN_TAKES['w']}
+ROOK_RAYS = _ray_table(ROOK_DIRS)
+BISHOP_RAYS = _ray_table(BISHOP_DIRS)
+QUEEN_RAYS = {pos: BISHOP_RAYS[pos] + ROOK_RAYS[pos] for pos in SQUARES}
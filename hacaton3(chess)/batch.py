@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Пакетне розв'язування задач "мат у N ходів" з файлу EPD/FEN
+
+Файл читається по рядку, і результат кожної задачі одразу записується
+окремим рядком JSON, тому пам'ять не залежить від розміру файлу.
+Кожен рядок файлу - запис FEN (6 полів) або EPD (4 поля і операції, напр.
+`dm 2; id "puzzle 1";`). Порожні рядки і рядки, що починаються з '#', пропускаються.
+Операція dm задає к-ть ходів до мату для конкретної задачі (від 1 до 255).
+
+Рядок результату:
+    {"n": номер рядка, "id": ..., "fen": ..., "status": "mate" | "no_mate" | "budget" | "error",
+     "mate_in": к-ть ходів, "line": [["d2", "e2"], ...], "nodes": ..., "seconds": ...}
+
+Запуск:
+    python3 batch.py puzzles.epd --output results.jsonl --mate-in 3 --nodes 200000 --time 5
+
+З ключем --checks-only сторона, яка ставить мат, робить лише ходи з шахом: так
+значно швидше, але мати з тихим ходом не знаходяться (статус no_mate).
+З ключем --stats до результату додається поле "stats" - статистика пошуку
+(див. SearchStats.as_dict): позиції, ходи, відсічення по півходах і час ітерацій.
+З ключем --tablebase DIR позиції, для яких є таблиці ендшпілю в каталозі DIR
+(див. tablebase.py), розв'язуються без перебору.
+З ключем --proof мат шукається числами доказу (Position.prove_mate): так розв'язуються
+задачі на мат у 6 і більше ходів, але знайдений мат не обов'язково найкоротший.
+Дзеркальні позиції (див. Position.get_canonical) розв'язуються лише раз: повторна задача
+отримує результат з кешу (поле "cached": true, "nodes": 0) з ходами, перенесеними на її
+орієнтацію. Розмір кешу задає ключ --cache (0 - без кешу).
+З ключем --workers N задачі розв'язуються в N процесах: позиції пакуються в спільну
+пам'ять (див. shared.py), і процеси отримують лише номери записів.
+"""
+import argparse
+import json
+import sys
+import time
+
+from figures import Position, SearchBudget, SearchStats, ErrorBudget, ErrorBadFormat, ErrorNoKing, transform_line
+from tablebase import Tablebase
+from transposition import SolutionCache
+
+CACHED_STATUSES = ('mate', 'no_mate')      # результати, які не залежать від ліміту і зберігаються в кеші
+
+
+def parse_epd(line):
+    """
+    Розбирає рядок EPD або FEN
+
+    :param line: рядок
+    :return: (FEN, словник операцій EPD)
+    """
+    fields = line.split(None, 4)
+    if len(fields) < 2:
+        raise ErrorBadFormat
+    operations = {}
+    if len(fields) > 4 and not fields[4].split(None, 1)[0].isdigit():
+        # EPD: після 4 полів ідуть операції "код операнди;"
+        for operation in fields[4].split(';'):
+            parts = operation.strip().split(None, 1)
+            if parts:
+                operations[parts[0]] = parts[1].strip('"') if len(parts) > 1 else ''
+        fields = fields[:4]
+    return ' '.join(fields), operations
+
+
+def get_mate_in(operations, mate_in):
+    """
+    К-ть ходів до мату для задачі: операція dm або значення за замовчуванням
+
+    межа 255 - це розмір запису в спільній пам'яті (див. shared.SharedBatch), і вона
+    однакова для обох шляхів, щоб solve_file і solve_file_shared відкидали ті самі задачі
+    :param operations: словник операцій EPD (див. parse_epd)
+    :param mate_in: к-ть ходів до мату за замовчуванням
+    :return: ціле число від 1 до 255
+    """
+    depth = int(operations.get('dm', mate_in))
+    if depth not in range(1, 256):
+        raise ValueError('к-ть ходів до мату має бути від 1 до 255')
+    return depth
+
+
+def iter_puzzles(file):
+    """
+    Генератор задач з файлу (рядок за рядком)
+
+    :param file: відкритий текстовий файл
+    :return: кортежі (номер рядка, рядок без пробілів по краях)
+    """
+    for n, line in enumerate(file, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield n, line
+
+
+def orient_result(result, symmetry):
+    """
+    Переносить результат на симетричну позицію: з орієнтації задачі в канонічну і назад
+    (симетрія обернена сама до себе)
+
+    :param result: словник з полями 'status', 'mate_in', 'line'
+    :param symmetry: симетрія з Position.get_canonical
+    :return: новий словник з цими полями
+    """
+    line = result['line']
+    return {'status': result['status'], 'mate_in': result['mate_in'],
+            'line': None if line is None else [list(turn) for turn in transform_line(line, symmetry)]}
+
+
+def solve_position(position, color, mate_in, max_nodes=None, time_limit=None, checks_only=False, with_stats=False,
+                   tablebase=None, proof=False, cache=None):
+    """
+    Розв'язує задачу для вже розставленої позиції
+
+    :param position: об'єкт класу Position (змінюється і відновлюється)
+    :param color: колір сторони, яка ходить
+    :param mate_in: к-ть ходів до мату
+    :param cache: об'єкт SolutionCache для задач з тими самими параметрами пошуку або None
+    :return: словник {'status', 'mate_in', 'line', 'nodes', 'seconds'[, 'stats', 'cached']};
+             решта параметрів - див. solve
+    """
+    start = time.perf_counter()
+    if cache is not None:
+        key, symmetry = position.get_canonical(color)
+        key = (key, mate_in)
+        cached = cache.get(key)
+        if cached is not None:
+            result = orient_result(cached, symmetry)
+            result.update(nodes=0, cached=True, seconds=time.perf_counter() - start)
+            if with_stats:
+                result['stats'] = None      # пошуку не було, але поле є в кожному результаті
+            return result
+    result = {'status': 'error', 'mate_in': None, 'line': None, 'nodes': 0}
+    budget = SearchBudget(max_nodes, time_limit)
+    stats = SearchStats() if with_stats else None
+    try:
+        if proof:
+            mate = position.prove_mate(color, mate_in, budget=budget, stats=stats)
+        else:
+            mate = position.find_forced_mate(color, mate_in, budget=budget, checks_only=checks_only, stats=stats,
+                                             tablebase=tablebase)
+    except ErrorBudget:
+        result['status'] = 'budget'
+    except (ErrorBadFormat, ErrorNoKing, ValueError) as e:
+        result['error'] = str(e)
+    else:
+        result['status'] = 'mate' if mate else 'no_mate'
+        if mate:
+            result['mate_in'] = (len(mate) + 1) // 2
+            result['line'] = [list(turn) for turn in mate]
+    result['nodes'] = budget.nodes
+    if stats is not None:
+        result['stats'] = stats.as_dict()
+    result['seconds'] = time.perf_counter() - start
+    if cache is not None and result['status'] in CACHED_STATUSES:
+        cache.put(key, orient_result(result, symmetry))
+    return result
+
+
+def solve(line, mate_in, max_nodes=None, time_limit=None, checks_only=False, with_stats=False, tablebase=None,
+          proof=False, cache=None):
+    """
+    Розв'язує одну задачу
+
+    :param line: рядок EPD або FEN
+    :param mate_in: к-ть ходів до мату (якщо в EPD немає операції dm)
+    :param max_nodes: ліміт к-ті позицій для цієї задачі
+    :param time_limit: ліміт часу в секундах для цієї задачі
+    :param checks_only: розглядати лише ходи з шахом для сторони, яка ставить мат
+    :param with_stats: додати до результату статистику пошуку
+    :param tablebase: об'єкт Tablebase або None
+    :param proof: шукати мат числами доказу (checks_only і tablebase тоді не використовуються)
+    :param cache: об'єкт SolutionCache, спільний для задач з тими самими параметрами, або None
+    :return: словник з результатом
+    """
+    start = time.perf_counter()
+    result = {'id': None, 'fen': line}
+    try:
+        fen, operations = parse_epd(line)
+        result['id'] = operations.get('id')
+        result['fen'] = fen
+        mate_in = get_mate_in(operations, mate_in)
+        position = Position()
+        color = position.set_fen(fen)
+    except (ErrorBadFormat, ErrorNoKing, ValueError) as e:
+        result.update(status='error', mate_in=None, line=None, nodes=0, error=str(e),
+                      seconds=time.perf_counter() - start)
+        return result
+    result.update(solve_position(position, color, mate_in, max_nodes, time_limit, checks_only, with_stats,
+                                 tablebase, proof, cache))
+    return result
+
+
+def solve_file(file, output, mate_in, max_nodes=None, time_limit=None, checks_only=False, with_stats=False,
+               tablebase=None, proof=False, cache=None):
+    """
+    Розв'язує всі задачі з файлу, записуючи результати по одному рядку JSON
+
+    :param file: відкритий текстовий файл з задачами
+    :param output: відкритий текстовий файл для результатів
+    :param mate_in: к-ть ходів до мату за замовчуванням
+    :param max_nodes: ліміт к-ті позицій на одну задачу
+    :param time_limit: ліміт часу на одну задачу
+    :param checks_only: див. solve
+    :param with_stats: див. solve
+    :param tablebase: див. solve
+    :param proof: див. solve
+    :param cache: див. solve
+    :return: словник {статус: к-ть задач}
+    """
+    totals = {}
+    for n, line in iter_puzzles(file):
+        result = solve(line, mate_in, max_nodes, time_limit, checks_only, with_stats, tablebase, proof, cache)
+        result['n'] = n
+        output.write(json.dumps(result, ensure_ascii=False) + '\n')
+        output.flush()
+        totals[result['status']] = totals.get(result['status'], 0) + 1
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="пакетне розв'язування задач на мат")
+    parser.add_argument('input', help='файл EPD/FEN (одна позиція в рядку)')
+    parser.add_argument('--output', help='файл для результатів JSON lines (за замовчуванням - stdout)')
+    parser.add_argument('--mate-in', type=int, default=3, help='к-ть ходів до мату, якщо немає операції dm')
+    parser.add_argument('--nodes', type=int, help='ліміт к-ті позицій на одну задачу')
+    parser.add_argument('--time', type=float, help='ліміт часу в секундах на одну задачу')
+    parser.add_argument('--checks-only', action='store_true', help='розглядати лише ходи з шахом')
+    parser.add_argument('--stats', action='store_true', help='додати статистику пошуку до результатів')
+    parser.add_argument('--tablebase', help='каталог з таблицями ендшпілю')
+    parser.add_argument('--proof', action='store_true', help='шукати мат числами доказу (df-pn)')
+    parser.add_argument('--cache', type=int, default=1 << 16,
+                        help='к-ть розв\'язків дзеркальних позицій у кеші (0 - без кешу)')
+    parser.add_argument('--workers', type=int, help='к-ть процесів (задачі передаються через спільну пам\'ять)')
+    parser.add_argument('--chunk', type=int, default=4096, help='к-ть задач в одному пакеті для --workers')
+    args = parser.parse_args(argv)
+
+    cache = SolutionCache(args.cache) if args.cache > 0 else None
+    if args.workers:
+        from shared import solve_file_shared
+        output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            with open(args.input, encoding='utf-8') as file:
+                totals = solve_file_shared(file, output, args.mate_in, args.workers, args.nodes, args.time,
+                                           args.checks_only, args.stats, args.tablebase, args.proof, args.chunk,
+                                           cache)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        print(totals, file=sys.stderr)
+        return 0
+
+    tablebase = Tablebase(args.tablebase) if args.tablebase else None
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        with open(args.input, encoding='utf-8') as file:
+            totals = solve_file(file, output, args.mate_in, args.nodes, args.time, args.checks_only, args.stats,
+                                tablebase, args.proof, cache)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if tablebase is not None:
+            tablebase.close()
+    print(totals, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
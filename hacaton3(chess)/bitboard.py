@@ -0,0 +1,631 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Модуль з альтернативною реалізацією шахової дошки на бітбордах
+
+Кожному типу і кольору фігур відповідає 64-бітна маска (ціле число),
+де біт з номером x + 8 * y означає, що на полі (x, y) стоїть така фігура.
+Атаки коня, короля і пішаків, а також промені для далекобійних фігур
+обчислюються один раз при імпорті модуля.
+
+Фігура на дошці кодується цілим числом: номер типу у FIGURE_TYPES + 1,
+для чорних ще + BLACK (так само, як у Position.get_bytes). Пошук усередині
+працює лише з номерами полів і кодами фігур: ходи робляться make_move і
+скасовуються unmake_move прямо на масках, а хеш Зобріста (ті самі ключі,
+що й у figures.Position) оновлюється інкрементально.
+
+Клас BitboardPosition має той самий інтерфейс, що і figures.Position
+(add_figure, move, is_under_attack, check_mate, find_checkmates, ...),
+тому для переходу на нього достатньо замінити конструктор.
+"""
+from core import ErrorNoKing, ch2py, ch2ch, square, coords, SQUARE_NAMES
+from figures import Figure, FIGURE_TYPES, ZOBRIST_KEYS, ZOBRIST_BLACK, ErrorGetOutOfDesk
+from transposition import TranspositionTable
+
+FULL = (1 << 64) - 1
+
+KNIGHT_STEPS = [(1, 2), (2, 1), (1, -2), (2, -1), (-1, 2), (-2, 1), (-1, -2), (-2, -1)]
+KING_STEPS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+# напрямки променів: ті, що збільшують номер поля, і ті, що зменшують
+POSITIVE_DIRS = [(1, 0), (0, 1), (1, 1), (-1, 1)]
+NEGATIVE_DIRS = [(-1, 0), (0, -1), (-1, -1), (1, -1)]
+ROOK_DIRS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+BISHOP_DIRS = [(1, 1), (-1, 1), (-1, -1), (1, -1)]
+
+# коди фігур: тип (1..6) + колір (0 - білі, BLACK - чорні)
+KING, QUEEN, BISHOP, ROOK, KNIGHT, PAWN = range(1, 7)
+BLACK = 8
+SIDES = {'w': 0, 'b': BLACK}
+CODES = {(t, c): FIGURE_TYPES.index(t) + 1 + SIDES[c] for t in FIGURE_TYPES for c in ('w', 'b')}
+CODE_KEYS = {code: key for key, code in CODES.items()}
+
+# фігури, які мають сенс для трансформації пішака
+TRANSFORMS = ('queen', 'rook', 'bishop', 'knight')
+
+# один незмінний об'єкт Figure на кожен код фігури
+FIGURES = {code: Figure(*key) for code, key in CODE_KEYS.items()}
+
+# ключі Зобріста за кодом фігури і номером поля
+ZOBRIST = {code: [ZOBRIST_KEYS[key][coords(sq)] for sq in range(64)] for code, key in CODE_KEYS.items()}
+
+
+def _step_table(steps):
+    """
+    Будує таблицю атак для фігур, які ходять на фіксовані зміщення
+
+    :param steps: список зміщень (dx, dy)
+    :return: список з 64 масок
+    """
+    table = []
+    for sq in range(64):
+        x, y = coords(sq)
+        mask = 0
+        for dx, dy in steps:
+            if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+                mask |= 1 << square((x + dx, y + dy))
+        table.append(mask)
+    return table
+
+
+def _ray_table(direction):
+    """
+    Будує таблицю променів з кожного поля у заданому напрямку (без самого поля)
+
+    :param direction: кортеж (dx, dy)
+    :return: список з 64 масок
+    """
+    table = []
+    for sq in range(64):
+        x, y = coords(sq)
+        mask = 0
+        x, y = x + direction[0], y + direction[1]
+        while 0 <= x < 8 and 0 <= y < 8:
+            mask |= 1 << square((x, y))
+            x, y = x + direction[0], y + direction[1]
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table(KNIGHT_STEPS)
+KING_ATTACKS = _step_table(KING_STEPS)
+PAWN_ATTACKS = {'w': _step_table([(1, 1), (-1, 1)]),
+                'b': _step_table([(1, -1), (-1, -1)])}
+RAYS = {d: _ray_table(d) for d in POSITIVE_DIRS + NEGATIVE_DIRS}
+# усі поля на вертикалі і горизонталі / на діагоналях кожного поля
+ROOK_LINES = [sum(RAYS[d][sq] for d in ROOK_DIRS) for sq in range(64)]
+BISHOP_LINES = [sum(RAYS[d][sq] for d in BISHOP_DIRS) for sq in range(64)]
+
+# промені для _slider_attacks: (таблиця, чи збільшується номер поля вздовж променя)
+ROOK_RAYS = [(RAYS[d], d in POSITIVE_DIRS) for d in ROOK_DIRS]
+BISHOP_RAYS = [(RAYS[d], d in POSITIVE_DIRS) for d in BISHOP_DIRS]
+SLIDER_RAYS = {ROOK: ROOK_RAYS, BISHOP: BISHOP_RAYS, QUEEN: ROOK_RAYS + BISHOP_RAYS}
+
+# горизонталі, з яких пішак робить подвійний хід і на яких він трансформується
+PAWN_START_RANK = {'w': 1, 'b': 6}
+PAWN_LAST_RANK = {'w': 6, 'b': 1}
+# те саме за стороною (0 або BLACK): напрямок ходу пішака, атаки, стартова і передостання горизонталі
+PAWN_STEP = {0: 8, BLACK: -8}
+PAWN_SIDE_ATTACKS = {0: PAWN_ATTACKS['w'], BLACK: PAWN_ATTACKS['b']}
+PAWN_SIDE_START = {0: PAWN_START_RANK['w'], BLACK: PAWN_START_RANK['b']}
+PAWN_SIDE_LAST = {0: PAWN_LAST_RANK['w'], BLACK: PAWN_LAST_RANK['b']}
+PROMOTIONS = {side: [(CODES[(t, c)], t) for t in TRANSFORMS] for c, side in SIDES.items()}
+
+
+def _slider_attacks(sq, occupied, rays):
+    """
+    Атаки далекобійної фігури з поля sq з урахуванням блокуючих фігур
+
+    :param sq: номер поля
+    :param occupied: маска всіх фігур на дошці
+    :param rays: список пар (таблиця променів, чи збільшується номер поля) - ROOK_RAYS або BISHOP_RAYS
+    :return: маска атакованих полів
+    """
+    attacks = 0
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= table[first]
+        attacks |= ray
+    return attacks
+
+
+def _iter_squares(mask):
+    """
+    Генератор номерів полів, біти яких встановлені у масці
+
+    :param mask: ціле число
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitboardPosition:
+    """
+    Клас реалізації шахової дошки на бітбордах
+
+    Поряд з масками для кожного коду фігури зберігається список з 64 полів
+    з кодом фігури або 0 - щоб швидко дізнатись, яка фігура стоїть на полі.
+
+    методи ті самі, що й у figures.Position:
+        add_figure(pos, figure) -> None - додає фігуру на дошку
+        take_figure(pos) -> Figure - забирає фігуру з дошки
+        get_figure(pos) -> Figure - повертає фігуру з дошки, але не видаляє її
+        get_figures_by_color(color) -> словник - фігури певного кольору
+        get_figures_by_type_color(figure_type, color) -> словник - фігури певного типу і кольору
+        create_start_position() -> None - розставляє фігури стандартним чином
+        get_key(color) -> int - хеш Зобріста позиції з урахуванням сторони, яка ходить
+        is_under_attack(cell, color) -> bool - чи знаходиться поле cell під атакою
+        move(pos1, pos2, transform) -> bool - реалізує хід (повертає контрольний флаг)
+        make_move(sq1, sq2, code) -> None - робить хід між номерами полів, який можна скасувати
+        unmake_move() -> None - скасовує останній хід, зроблений make_move
+        get_legal_moves(color) -> словник - всі допустимі ходи для певної сторони
+        check_mate(color) -> bool - перевіряє наявність мату для певної сторони
+        find_checkmates(color, deep_step) - пошук усіх матів у межах deep_step ходів
+    """
+    def __init__(self, current_state=None):
+        self._clear()
+        if current_state:
+            for pos, figure in current_state.items():
+                self.add_figure(pos, figure)
+
+    def _clear(self):
+        self.boards = [0] * 16
+        self.occupied = {0: 0, BLACK: 0}
+        self.squares = [0] * 64
+        self.hash = 0
+        self.history = []
+
+    def copy(self):
+        """
+        Повертає незалежну копію дошки (копіюються лише цілі числа і список полів)
+
+        :return: BitboardPosition
+        """
+        res = BitboardPosition.__new__(BitboardPosition)
+        res.boards = self.boards.copy()
+        res.occupied = self.occupied.copy()
+        res.squares = self.squares.copy()
+        res.hash = self.hash
+        res.history = []
+        return res
+
+    @property
+    def current_state(self):
+        """
+        Словник {позиція: об'єкт класу Figure} - як у figures.Position
+        """
+        return {coords(sq): FIGURES[code] for sq, code in enumerate(self.squares) if code}
+
+    def _put(self, sq, code):
+        bit = 1 << sq
+        self.boards[code] |= bit
+        self.occupied[code & BLACK] |= bit
+        self.squares[sq] = code
+        self.hash ^= ZOBRIST[code][sq]
+
+    def _remove(self, sq):
+        code = self.squares[sq]
+        if code:
+            bit = 1 << sq
+            self.boards[code] ^= bit
+            self.occupied[code & BLACK] ^= bit
+            self.squares[sq] = 0
+            self.hash ^= ZOBRIST[code][sq]
+        return code
+
+    def add_figure(self, pos, figure):
+        if pos[0] not in range(8) or pos[1] not in range(8):
+            raise ErrorGetOutOfDesk
+        sq = square(pos)
+        self._remove(sq)
+        self._put(sq, CODES[(figure.get_type(), figure.get_color())])
+
+    def create_start_position(self):
+        """
+        метод, який створює стартову позицію для шахмат
+
+        :return: None
+        """
+        self._clear()
+        for j in range(8):
+            self._put(square((j, 1)), CODES[('pawn', 'w')])
+            self._put(square((j, 6)), CODES[('pawn', 'b')])
+        order = ['rook', 'knight', 'bishop', 'queen', 'king', 'bishop', 'knight', 'rook']
+        for j, figure_type in enumerate(order):
+            self._put(square((j, 0)), CODES[(figure_type, 'w')])
+            self._put(square((j, 7)), CODES[(figure_type, 'b')])
+
+    def take_figure(self, pos):
+        code = self._remove(square(pos))
+        return FIGURES[code] if code else None
+
+    def get_figure(self, pos):
+        code = self.squares[square(pos)]
+        return FIGURES[code] if code else None
+
+    def get_figures_by_color(self, color):
+        return {coords(sq): FIGURES[self.squares[sq]] for sq in _iter_squares(self.occupied[SIDES[color]])}
+
+    def get_figures_by_type_color(self, figure_type, color):
+        code = CODES[(figure_type, color)]
+        return {coords(sq): FIGURES[code] for sq in _iter_squares(self.boards[code])}
+
+    def get_key(self, color):
+        """
+        хеш Зобріста позиції разом зі стороною, яка ходить (той самий, що у figures.Position)
+
+        :param color: колір сторони, яка ходить
+        :return: ціле 64-бітне число
+        """
+        return self.hash ^ ZOBRIST_BLACK if color == 'b' else self.hash
+
+    def move(self, pos1, pos2, transform2='queen'):
+        """
+        функція, яка реалізує хід фігури
+
+        :param pos1: кортеж (х, у) - стартова позиція
+        :param pos2: кортеж (х, у) - кінцева позиція
+        :param transform2: тип фігури, в яку трансформується пішак
+        :return: Король живий - True, інакше - False
+        """
+        sq1, sq2 = square(pos1), square(pos2)
+        target = self.squares[sq2]
+        if target & 7 == KING:
+            return False
+        code = self.squares[sq1]
+        if code:
+            self._remove(sq1)
+            self._remove(sq2)
+            if code & 7 == PAWN and pos1[1] == PAWN_SIDE_LAST[code & BLACK]:
+                code = CODES[(transform2, CODE_KEYS[code][1])]
+            self._put(sq2, code)
+        return True
+
+    def make_move(self, sq1, sq2, code=0):
+        """
+        робить хід з поля sq1 на поле sq2, запам'ятовуючи все, що потрібно для unmake_move
+
+        :param sq1: номер стартового поля
+        :param sq2: номер кінцевого поля
+        :param code: код фігури, в яку трансформується пішак (0 - без трансформації)
+        :return: None
+        """
+        captured = self._remove(sq2)
+        moved = self._remove(sq1)
+        self._put(sq2, code or moved)
+        self.history.append((sq1, sq2, moved, captured))
+
+    def unmake_move(self):
+        """
+        скасовує останній хід, зроблений make_move
+
+        :return: None
+        """
+        sq1, sq2, moved, captured = self.history.pop()
+        self._remove(sq2)
+        self._put(sq1, moved)
+        if captured:
+            self._put(sq2, captured)
+
+    def _attacks(self, code, sq):
+        """
+        Маска полів, які атакує фігура code з поля sq
+
+        :param code: код фігури
+        :param sq: номер поля
+        :return: ціле число
+        """
+        figure_type = code & 7
+        if figure_type == KNIGHT:
+            return KNIGHT_ATTACKS[sq]
+        elif figure_type == KING:
+            return KING_ATTACKS[sq]
+        elif figure_type == PAWN:
+            return PAWN_SIDE_ATTACKS[code & BLACK][sq]
+        return _slider_attacks(sq, self.occupied[0] | self.occupied[BLACK], SLIDER_RAYS[figure_type])
+
+    def _quiet_moves(self, code, sq):
+        """
+        Маска тихих ходів (без взяття) фігури code з поля sq
+
+        :param code: код фігури
+        :param sq: номер поля
+        :return: ціле число
+        """
+        empty = ~(self.occupied[0] | self.occupied[BLACK]) & FULL
+        if code & 7 != PAWN:
+            return self._attacks(code, sq) & empty
+        side = code & BLACK
+        step = PAWN_STEP[side]
+        one = sq + step
+        if not 0 <= one < 64 or not empty >> one & 1:
+            return 0
+        res = 1 << one
+        if sq >> 3 == PAWN_SIDE_START[side] and empty >> (one + step) & 1:
+            res |= 1 << (one + step)
+        return res
+
+    def _is_attacked(self, sq, side):
+        """
+        чи атакує поле sq хоча б одна фігура сторони side
+
+        :param sq: номер поля
+        :param side: 0 для білих або BLACK для чорних
+        :return: bool
+        """
+        boards = self.boards
+        if KNIGHT_ATTACKS[sq] & boards[side | KNIGHT]:
+            return True
+        if PAWN_SIDE_ATTACKS[side ^ BLACK][sq] & boards[side | PAWN]:
+            return True
+        if KING_ATTACKS[sq] & boards[side | KING]:
+            return True
+        occupied = self.occupied[0] | self.occupied[BLACK]
+        queens = boards[side | QUEEN]
+        rooks = (boards[side | ROOK] | queens) & ROOK_LINES[sq]
+        if rooks and _slider_attacks(sq, occupied, ROOK_RAYS) & rooks:
+            return True
+        bishops = (boards[side | BISHOP] | queens) & BISHOP_LINES[sq]
+        return bool(bishops and _slider_attacks(sq, occupied, BISHOP_RAYS) & bishops)
+
+    def is_under_attack(self, cell, color):
+        """
+        чи атакує поле cell хоча б одна фігура суперника сторони color
+
+        :param cell: кортеж (х, у)
+        :param color: колір сторони, для якої перевіряється поле
+        :return: bool
+        """
+        return self._is_attacked(square(cell), SIDES[color] ^ BLACK)
+
+    def _king_square(self, side):
+        king = self.boards[side | KING]
+        if not king:
+            raise ErrorNoKing
+        return king.bit_length() - 1
+
+    def _king_pos(self, color):
+        return coords(self._king_square(SIDES[color]))
+
+    def _pseudo_moves(self, side):
+        """
+        всі ходи сторони side без перевірки, чи лишається король під шахом
+
+        :param side: 0 для білих або BLACK для чорних
+        :return: список пар (sq1, маска полів, куди може піти фігура з sq1)
+        """
+        enemy = self.occupied[side ^ BLACK]
+        squares = self.squares
+        moves = []
+        for sq in _iter_squares(self.occupied[side]):
+            code = squares[sq]
+            takes = self._attacks(code, sq) & enemy
+            moves.append((sq, takes, self._quiet_moves(code, sq)))
+        return moves
+
+    def _get_all_moves_color(self, color):
+        """
+        функція пошуку всіх можливих ходів для однієї сторони
+
+        :param color: колір сторони
+        :return: позиція короля, словник {key=позиція фігури: value=список можливих ходів}
+        """
+        side = SIDES[color]
+        king_pos = coords(self._king_square(side))
+        moves = {}
+        for sq, takes, quiet in self._pseudo_moves(side):
+            moves[coords(sq)] = [coords(t) for t in _iter_squares(takes)] + \
+                                [coords(t) for t in _iter_squares(quiet)]
+        return king_pos, moves
+
+    def _legal_moves(self, side):
+        """
+        всі допустимі ходи сторони side у вигляді номерів полів за один прохід
+
+        як і у figures.Position.get_legal_moves, від короля один раз знаходяться маска
+        фігур, які дають шах (і полів, ходом на які від шаху можна закритись), та зв'язані
+        фігури з масками ліній зв'язки; після цього ходи фільтруються операціями над масками.
+        Ходи короля перевіряються на атаку поля, на яке він іде, коли сам король знятий
+        з маски зайнятих полів
+        :param side: 0 для білих або BLACK для чорних
+        :return: номер поля короля, чи є шах, список пар (sq1, sq2)
+        """
+        king = self._king_square(side)
+        enemy = side ^ BLACK
+        boards = self.boards
+        occupied = self.occupied[0] | self.occupied[BLACK]
+        own = self.occupied[side]
+
+        checkers = KNIGHT_ATTACKS[king] & boards[enemy | KNIGHT] | \
+            PAWN_SIDE_ATTACKS[side][king] & boards[enemy | PAWN]
+        block = checkers    # поля, ходом на які можна закритись від шаху або з'їсти фігуру, що його дає
+        pins = {}           # {поле зв'язаної фігури: маска лінії зв'язки}
+        queens = boards[enemy | QUEEN]
+        for rays, lines, sliders in ((ROOK_RAYS, ROOK_LINES, boards[enemy | ROOK] | queens),
+                                     (BISHOP_RAYS, BISHOP_LINES, boards[enemy | BISHOP] | queens)):
+            if not sliders & lines[king]:
+                continue
+            for table, positive in rays:
+                ray = table[king]
+                blockers = ray & occupied
+                if not blockers:
+                    continue
+                first = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+                if sliders >> first & 1:
+                    checkers |= 1 << first
+                    block |= ray ^ table[first]
+                elif own >> first & 1:
+                    blockers ^= 1 << first
+                    if blockers:
+                        second = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+                        if sliders >> second & 1:
+                            pins[first] = ray ^ table[second]
+
+        legal = []
+        double = checkers & (checkers - 1)      # від подвійного шаху можна лише піти королем
+        for sq1, takes, quiet in self._pseudo_moves(side):
+            targets = takes | quiet
+            if sq1 == king:
+                # короля тимчасово знімаємо, щоб він не закривав від атаки поля позаду себе
+                self.occupied[side] ^= 1 << king
+                legal.extend((sq1, sq2) for sq2 in _iter_squares(targets) if not self._is_attacked(sq2, enemy))
+                self.occupied[side] ^= 1 << king
+                continue
+            if double:
+                continue
+            if checkers:
+                targets &= block
+            if sq1 in pins:
+                targets &= pins[sq1]
+            legal.extend((sq1, sq2) for sq2 in _iter_squares(targets))
+        return king, bool(checkers), legal
+
+    def get_legal_moves(self, color):
+        """
+        функція пошуку всіх допустимих ходів для однієї сторони
+
+        :param color: колір сторони
+        :return: позиція короля, чи є шах, словник {key=позиція фігури: value=список допустимих ходів}
+        """
+        king, check, legal = self._legal_moves(SIDES[color])
+        right_moves = {}
+        for sq1, sq2 in legal:
+            right_moves.setdefault(coords(sq1), []).append(coords(sq2))
+        return coords(king), check, right_moves
+
+    def check_mate(self, color, possible_moves=False):
+        """
+        функція перевірки шаха і мата
+
+        :param color: string ('w' or 'b')
+        :param possible_moves: bool (флаг чи видавати допустимі ходи)
+        :return: bool, словник {key=позиція фігури: value=список допустимих ходів} або bool
+        """
+        king_pos, check, right_moves = self.get_legal_moves(color)
+        checkmate = check and not right_moves
+        return checkmate, right_moves if possible_moves else checkmate
+
+    def _can_take_king(self, side, legal):
+        """
+        чи можна одним з допустимих ходів з'їсти короля суперника (тоді ситуація - некоректна)
+
+        :param side: 0 для білих або BLACK для чорних
+        :param legal: список пар (sq1, sq2) з _legal_moves
+        :return: bool
+        """
+        king = self.boards[side ^ BLACK | KING]
+        return any(king >> sq2 & 1 for sq1, sq2 in legal)
+
+    def _get_turns(self, side, legal):
+        """
+        генератор ходів для пошуку: для пішака, що трансформується, хід повторюється для кожної фігури
+
+        :param side: 0 для білих або BLACK для чорних
+        :param legal: список пар (sq1, sq2) з _legal_moves
+        :return: кортежі (sq1, sq2, code, turn), де turn - хід у шаховій нотації
+        """
+        names = SQUARE_NAMES
+        squares = self.squares
+        pawn, last = side | PAWN, PAWN_SIDE_LAST[side]
+        for sq1, sq2 in legal:
+            if squares[sq1] != pawn or sq1 >> 3 != last:
+                yield sq1, sq2, 0, (names[sq1], names[sq2])
+            else:
+                for code, transform in PROMOTIONS[side]:
+                    yield sq1, sq2, code, (names[sq1], names[sq2], transform)
+
+    def _iter_checkmates(self, side, depth, pre_moves, table):
+        """
+        генератор матів рівно через depth ходів від поточної позиції (пошук в глибину)
+
+        той самий алгоритм, що й figures.Position._iter_checkmates: ходи робляться
+        make_move і скасовуються unmake_move, вердикт для позиції запам'ятовується
+        у таблиці транспозицій
+        :param side: 0 для білих або BLACK для чорних
+        :param depth: к-ть ходів, що залишилась до перевірки на мат
+        :param pre_moves: кортеж з кортежів - попередні ходи
+        :param table: об'єкт TranspositionTable
+        :return: кортежі ходів, які ведуть до мату
+        """
+        n = len(pre_moves)
+        key = self.hash ^ ZOBRIST_BLACK if side else self.hash
+        lines = table.probe(key, depth)
+        if lines is not None:       # позиція вже була перевірена
+            for line in lines:
+                yield (*pre_moves, *line)
+            return
+
+        found = []      # продовження до мату з цієї позиції
+        king, check, legal = self._legal_moves(side)
+        checkmate = check and not legal
+        if not depth:
+            if checkmate:
+                found.append(())
+                yield pre_moves
+        elif not checkmate and not self._can_take_king(side, legal):
+            # якщо мат вже був знайдений раніше або короля можна з'їсти, то далі не шукаємо
+            for sq1, sq2, code, turn in self._get_turns(side, legal):
+                self.make_move(sq1, sq2, code)
+                try:
+                    for line in self._iter_checkmates(side ^ BLACK, depth - 1, (*pre_moves, turn), table):
+                        if len(found) <= table.max_lines:
+                            found.append(line[n:])
+                        yield line
+                finally:
+                    self.unmake_move()      # дошка відновлюється навіть якщо генератор закрили
+        table.store(key, depth, found)
+
+    def find_checkmates(self, color, deep_step, table=None):
+        """
+        функція пошуку усіх можливих шах і матів у межах даної к-ті кроків
+
+        результат той самий, що і у figures.Position.find_checkmates: пошук в глибину
+        з ітеративним поглибленням і таблицею транспозицій, мати впорядковані за кількістю ходів
+        :param color: колір сторони, яка ходить першою
+        :param deep_step: ціле число - глибина пошуку
+        :param table: об'єкт TranspositionTable (якщо не вказано - створюється новий)
+        :return: список з кортежів (кортеж(start, end, transform), кортеж(start, end) ...)
+        """
+        if table is None:
+            table = TranspositionTable()
+        if self.check_mate(color)[0]:
+            return []
+        side = SIDES[color]
+        return [line for depth in range(1, deep_step) for line in self._iter_checkmates(side, depth, (), table)]
+
+    def __repr__(self):
+        white_side = self.get_figures_by_color('w')
+        black_side = self.get_figures_by_color('b')
+        white_str, black_str = '', ''
+        for pos, fig in white_side.items():
+            white_str += ch2ch(pos) + ':' + str(fig) + '; '
+        for pos, fig in black_side.items():
+            black_str += ch2ch(pos) + ':' + str(fig) + '; '
+        return str(white_str + '\n' + black_str)
+
+    __str__ = __repr__
+
+
+if __name__ == "__main__":
+
+    # та сама ситуація з хакатона, що і у figures.py
+    DESK = BitboardPosition()
+    DESK.add_figure(ch2py('a7'), Figure('queen', 'w'))
+    DESK.add_figure(ch2py('b3'), Figure('king', 'w'))
+    DESK.add_figure(ch2py('d2'), Figure('rook', 'w'))
+    DESK.add_figure(ch2py('f1'), Figure('bishop', 'w'))
+
+    DESK.add_figure(ch2py('c6'), Figure('king', 'b'))
+    DESK.add_figure(ch2py('d6'), Figure('pawn', 'b'))
+
+    print('find_checkmates:')
+    for i in DESK.find_checkmates('w', 4):
+        print(i)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Книга дебютів: ходи, зіграні в партіях з корпусу, за хешем позиції
+
+Файл книги - відсортований за ключем масив записів по 12 байтів:
+    ключ (8 байтів, хеш Зобріста Position.get_key), хід (2 байти), вага (2 байти)
+big-endian. Хід: поле start (y * 8 + x) | поле end << 6 | перетворення пішака << 12
+(0 - немає, 1..4 - ферзь, тура, офіцер, кінь). Вага - скільки разів хід зіграли в позиції.
+Файл читається через mmap і шукається двійковим пошуком, тому пам'ять
+не залежить від розміру книги.
+
+Корпус - PGN (ходи в алгебраїчній нотації) або список партій, по одній у рядку,
+з ходами у вигляді e2e4 g1f3 e7e8q. Рокіровки і взяття на проході модуль figures
+не підтримує, тому партія додається до книги лише до першого такого ходу.
+
+Книгу перед генерацією ходів читає лише engine.search_best_move. Пошуки матів
+(Position.iter_checkmates, find_checkmates, find_forced_mate) книгу не використовують:
+їм треба перебрати всі ходи або довести мат при будь-якому захисті, а книга знає лише,
+які ходи зіграли в партіях, тож не може ні замінити перебір, ні скоротити його.
+
+Побудова:
+    python3 book.py games.pgn --output book.bin --plies 20
+"""
+import argparse
+import mmap
+import re
+import struct
+import sys
+
+from core import NAME_COORDS, SQUARE_INDEX, SQUARE_NAMES, ch2py
+from figures import Position
+
+RECORD = struct.Struct('>QHH')
+PROMOTIONS = ('', 'queen', 'rook', 'bishop', 'knight')
+SAN_FIGURES = {'K': 'king', 'Q': 'queen', 'R': 'rook', 'B': 'bishop', 'N': 'knight'}
+MAX_WEIGHT = 0xffff
+
+_COORDINATE_MOVE = re.compile(r'^([a-h][1-8])([a-h][1-8])([qrbn]?)$')
+_SAN_MOVE = re.compile(r'^([KQRBN]?)([a-h]?)([1-8]?)x?([a-h][1-8])(?:=?([QRBN]))?$')
+_RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+
+def encode_move(turn):
+    """
+    :param turn: хід у шаховій нотації, напр. ('e7', 'e8', 'queen')
+    :return: ціле число (2 байти)
+    """
+    start, end = SQUARE_INDEX[NAME_COORDS[turn[0]]], SQUARE_INDEX[NAME_COORDS[turn[1]]]
+    promotion = PROMOTIONS.index(turn[2]) if len(turn) == 3 else 0
+    return start | end << 6 | promotion << 12
+
+
+def decode_move(move):
+    """
+    :param move: ціле число з encode_move
+    :return: хід у шаховій нотації
+    """
+    start, end, promotion = move & 63, move >> 6 & 63, move >> 12
+    turn = (SQUARE_NAMES[start], SQUARE_NAMES[end])
+    return turn + (PROMOTIONS[promotion],) if promotion else turn
+
+
+def iter_pgn_games(file):
+    """
+    генератор партій з файлу PGN
+
+    коментарі, варіанти, NAG і номери ходів пропускаються
+    :param file: відкритий текстовий файл
+    :return: списки ходів у алгебраїчній нотації
+    """
+    moves = []
+    depth = 0           # вкладеність варіантів (...)
+    comment = False     # всередині коментаря {...}
+    for line in file:
+        line = line.strip()
+        if not comment and (line.startswith('[') or line.startswith('%')):
+            continue
+        for token in re.findall(r'\{|\}|\(|\)|;.*|[^\s{}()]+', line):
+            if comment:
+                comment = token != '}'
+            elif token == '{':
+                comment = True
+            elif token.startswith(';'):
+                break       # коментар до кінця рядка
+            elif token == '(':
+                depth += 1
+            elif token == ')':
+                depth -= 1
+            elif depth:
+                continue
+            elif token in _RESULTS:
+                if moves:
+                    yield moves
+                moves = []
+            elif not token.startswith('$'):
+                token = re.sub(r'^\d+\.+', '', token)     # номер ходу, напр. "12." або "12...e5"
+                if token:
+                    moves.append(token)
+    if moves:
+        yield moves
+
+
+def iter_move_lists(file):
+    """
+    генератор партій з файлу, де кожен рядок - ходи однієї партії через пробіл
+
+    :param file: відкритий текстовий файл
+    :return: списки ходів
+    """
+    for line in file:
+        moves = line.split()
+        if moves and not line.startswith('#'):
+            yield moves
+
+
+def parse_move(position, color, token):
+    """
+    перетворює хід з корпусу (SAN або e2e4) на хід у шаховій нотації
+
+    :param position: об'єкт класу Position
+    :param color: колір сторони, яка ходить
+    :param token: рядок, напр. 'Nbd7', 'exd5', 'e8=Q+', 'e7e8q'
+    :return: хід у шаховій нотації або None, якщо хід неможливий або не підтримується
+    """
+    token = token.rstrip('+#!?')
+    match = _COORDINATE_MOVE.match(token)
+    if match:
+        start, end, promotion = match.groups()
+        wanted = (start, end, SAN_FIGURES[promotion.upper()]) if promotion else (start, end)
+        for item in position.get_legal_turns(color):
+            if item[3] == wanted or len(item[3]) == 3 and not promotion and item[3][:2] == wanted \
+                    and item[2] == 'queen':
+                return item[3]
+        return None
+
+    match = _SAN_MOVE.match(token)
+    if not match:
+        return None     # рокіровка або нерозпізнаний хід
+    letter, from_file, from_rank, end, promotion = match.groups()
+    figure_type = SAN_FIGURES[letter] if letter else 'pawn'
+    promotion = SAN_FIGURES[promotion] if promotion else 'queen'
+    for pos1, pos2, transform, turn in position.get_legal_turns(color):
+        if turn[1] != end or position.get_figure(pos1).get_type() != figure_type:
+            continue
+        if from_file and turn[0][0] != from_file or from_rank and turn[0][1] != from_rank:
+            continue
+        if len(turn) == 3 and transform != promotion:
+            continue
+        return turn
+    return None
+
+
+class Book:
+    """
+    Книга дебютів з файлу (mmap і двійковий пошук)
+
+    методи:
+        find(position, color) -> список - ходи книги з вагами, від найчастішого
+        choose(position, color, rnd) -> хід або None - хід з книги (випадковий пропорційно вазі, якщо rnd)
+        close() -> None - закриває файл
+    """
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:      # порожній файл
+            self._data = b''
+        self.size = len(self._data) // RECORD.size
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __len__(self):
+        return self.size
+
+    def _key(self, i):
+        return struct.unpack_from('>Q', self._data, i * RECORD.size)[0]
+
+    def find(self, position, color):
+        """
+        ходи книги для позиції
+
+        :param position: об'єкт класу Position
+        :param color: колір сторони, яка ходить
+        :return: список (хід у шаховій нотації, вага), від найбільшої ваги
+        """
+        key = position.get_key(color)
+        lo, hi = 0, self.size
+        while lo < hi:      # перший запис з ключем >= key
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        result = []
+        while lo < self.size:
+            record_key, move, weight = RECORD.unpack_from(self._data, lo * RECORD.size)
+            if record_key != key:
+                break
+            turn = decode_move(move)
+            figure = position.get_figure(ch2py(turn[0]))
+            if figure is not None and figure.get_color() == color:     # захист від колізій хешу
+                result.append((turn, weight))
+            lo += 1
+        return result
+
+    def choose(self, position, color, rnd=None):
+        """
+        хід з книги
+
+        :param position: об'єкт класу Position
+        :param color: колір сторони, яка ходить
+        :param rnd: об'єкт random.Random для вибору пропорційно вазі (None - найчастіший хід)
+        :return: хід у шаховій нотації або None, якщо позиції немає в книзі
+        """
+        moves = self.find(position, color)
+        if not moves:
+            return None
+        if rnd is None:
+            return moves[0][0]
+        return rnd.choices([turn for turn, weight in moves], [weight for turn, weight in moves])[0]
+
+
+def build(games, path, plies=20):
+    """
+    будує файл книги з партій
+
+    :param games: ітератор списків ходів (див. iter_pgn_games, iter_move_lists)
+    :param path: шлях до файлу книги
+    :param plies: скільки перших півходів кожної партії додається до книги
+    :return: (к-ть партій, к-ть записів)
+    """
+    counts = {}         # {(ключ, хід): вага}
+    n = 0
+    for moves in games:
+        n += 1
+        position = Position()
+        position.create_start_position()
+        color = 'w'
+        for token in moves[:plies]:
+            turn = parse_move(position, color, token)
+            if turn is None:
+                break
+            entry = (position.get_key(color), encode_move(turn))
+            counts[entry] = counts.get(entry, 0) + 1
+            position.make_turn(turn)
+            color = 'b' if color == 'w' else 'w'
+    records = sorted(counts.items(), key=lambda item: (item[0][0], -item[1], item[0][1]))
+    with open(path, 'wb') as file:
+        for (key, move), weight in records:
+            file.write(RECORD.pack(key, move, min(weight, MAX_WEIGHT)))
+    return n, len(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='побудова книги дебютів')
+    parser.add_argument('input', help='файл PGN або список партій (ходи e2e4 ... по партії в рядку)')
+    parser.add_argument('--output', default='book.bin', help='файл книги')
+    parser.add_argument('--plies', type=int, default=20, help='к-ть перших півходів кожної партії')
+    parser.add_argument('--format', choices=('pgn', 'moves'),
+                        help='формат корпусу (за замовчуванням - за розширенням файлу)')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('pgn' if args.input.lower().endswith('.pgn') else 'moves')
+    with open(args.input, encoding='utf-8', errors='replace') as file:
+        games = iter_pgn_games(file) if fmt == 'pgn' else iter_move_lists(file)
+        n, size = build(games, args.output, args.plies)
+    print('{} партій, {} записів'.format(n, size), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
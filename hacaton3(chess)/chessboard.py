@@ -1,24 +1,7 @@
+import time
 import turtle
 
-
-FIGURE_CODES = {('king', 'b'): 9818,
-                ('queen', 'b'): 9819,
-                ('bishop', 'b'): 9821,
-                ('rook', 'b'): 9820,
-                ('knight', 'b'): 9822,
-                ('pawn', 'b'): 9823,
-                ('king', 'w'): 9812,
-                ('queen', 'w'): 9813,
-                ('bishop', 'w'): 9815,
-                ('rook', 'w'): 9814,
-                ('knight', 'w'): 9816,
-                ('pawn', 'w'): 9817,
-                }
-
-
-class ErrorNoKing(Exception):
-    def __str__(self):
-        return "No king"
+from core import FIGURE_CODES, ch2py
 
 
 class ErrorEmptyCell(Exception):
@@ -26,154 +9,156 @@ class ErrorEmptyCell(Exception):
         return "Nothing to move, cell is empty"
 
 
-def ch2py(pos_ch):
+class Chessboard:
     """
-    function that changes string 'a1' to tuple '(0,0)'
-    :param pos_ch: string of coordinates
-    :return: tuple of coordinates
+    Отрисовка доски черепашкой (turtle)
+
+    методы:
+        show_position(position) -> None - рисует доску и все фигуры
+        show_move(position, cell1, cell2) -> None - рисует ход фигуры (позиция не меняется)
+        refresh(position) -> int - перерисовывает только изменившиеся клетки
+        play(position, line, delay) -> None - проигрывает последовательность ходов
+
+    В режиме live (Chessboard(live=True)) анимация черепашки выключена (tracer(0)),
+    и экран обновляется одним вызовом update() после каждой пачки изменений.
+    Доска помнит, какие фигуры нарисованы на каждой клетке, поэтому после
+    хода перерисовываются только клетки, на которых что-то изменилось.
     """
-    s = 'abcdefgh'
-    y = int(pos_ch[1]) - 1
-    x = s.index(pos_ch[0])
-    return x, y
-
+    a = 90      # масштаб - размер клетки
 
-def ch2ch(pos_py):
-    """
-    Function that changes tuple '(0,0)' to string 'a1'.
+    def __init__(self, live=False):
+        self.t = turtle.Turtle()
+        self.live = live
+        self._shown = None      # {клетка: (тип, цвет)} - что нарисовано сейчас
+        if live:
+            self.t.screen.tracer(0)
+            self.t.hideturtle()
 
-    :param pos_py: tuple of coordinates
-    :return: string of coordinates
-    """
-    s = 'abcdefgh'
-    x = s[pos_py[0]]
-    return x + str(pos_py[1] + 1)
+    def _update(self):
+        if self.live:
+            self.t.screen.update()
 
+    def _draw_square(self, cell):
+        """
+        Закрашивает клетку (стирая фигуру на ней)
 
-class Chessboard:
-    def __init__(self):
-        self.t = turtle.Turtle()
+        :param cell: кортеж (х, у)
+        :return: None
+        """
+        a = self.a
+        color = 'dark grey' if (cell[0] + cell[1]) % 2 == 0 else 'light grey'
+        self.t.up()
+        self.t.setpos(-4 * a + cell[0] * a, -4 * a + cell[1] * a + a)
+        self.t.color('black', color)
+        self.t.seth(0)
+        self.t.down()
+        self.t.begin_fill()
+        for k in range(4):
+            self.t.fd(a)
+            self.t.right(90)
+        self.t.end_fill()
+        self.t.up()
 
-    def _rev_color(self, color):
+    def _draw_figure(self, cell, figure):
         """
-        Обращает цвет черной клетки на белую, и наоборот
+        Рисует фигуру на клетке
 
-        :param color:
-        :return:
+        :param cell: кортеж (х, у)
+        :param figure: кортеж (тип, цвет)
+        :return: None
         """
-        return 'dark grey' if color == 'light grey' else 'light grey'
+        a = self.a
+        self.t.up()
+        self.t.setpos(-4 * a + cell[0] * a + int(a * 0.1), -4 * a + cell[1] * a + int(a * 0.05))
+        self.t.color('black')
+        self.t.write(chr(FIGURE_CODES[figure]), font=('', int(a * 2 / 3)))
 
     def show_position(self, position):
         """
         Отрисовывает текущее состояние доски
 
         Отрисовка включает в себя и отрисовку доски, поэтому переставляя фигуры
-        (изменяя position) желательно пользоваться следующей функцией
-        а - масштаб
+        (изменяя position) желательно пользоваться refresh
         :param position: <class 'Position'> instance
         :return: None
         """
-        self.t.penup()
-        a = 90
-        # для отрисовки доски
-        start_pos_x = -4 * a
-        start_pos_y = 4 * a
-        # для отрисовки фигур
-        another_start_pos_x = -4 * a
-        another_start_pos_y = -4 * a
-        # цвет первой клетки
-        fill_color = 'light grey'
-        self.t.color()
-        # цикл отрисовки всех строк
-        for j in range(8):
-            self.t.setpos(start_pos_x, start_pos_y)
-            self.t.pendown()
-            # цикл отрисовки строки
-            for i in range(8):
-                self.t.setpos(start_pos_x, start_pos_y)
-                self.t.color('black', fill_color)
-                self.t.begin_fill()
-                self.t.seth(0)
-                # цикл отрисовки отдельной клетки
-                for k in range(4):
-                    self.t.fd(a)
-                    self.t.right(90)
-                self.t.end_fill()
-                start_pos_x += a
-                fill_color = self._rev_color(fill_color)
-            self.t.penup()
-            fill_color = self._rev_color(fill_color)
-            start_pos_x = -4 * a
-            start_pos_y -= a
-        figs = position.get_pos()
+        for x in range(8):
+            for y in range(8):
+                self._draw_square((x, y))
+        self._shown = {}
         # отрисовка всех фигур, используя базу всех кодов
-        for pos, fig in figs.items():
+        for pos, fig in position.current_state.items():
             fig = (fig.get_type(), fig.get_color())
-            fig_code = FIGURE_CODES[fig]
-            pos_x = another_start_pos_x + pos[0] * a + int(a * 0.1)
-            pos_y = another_start_pos_y + pos[1] * a + int(a * 0.05)
-            self.t.up()
-            self.t.setpos(pos_x, pos_y)
-            # отрисовка конкретной фигуры
-            self.t.write(chr(fig_code), font=('', int(a * 2 / 3)))
-
-    def show_move(self, position, cell1, cell2):
+            self._draw_figure(pos, fig)
+            self._shown[pos] = fig
+        self._update()
+
+    def refresh(self, position):
+        """
+        Перерисовывает только клетки, на которых фигуры отличаются от нарисованных
+
+        :param position: <class 'Position'> instance
+        :return: количество перерисованных клеток
+        """
+        if self._shown is None:
+            self.show_position(position)
+            return 64
+        current = {pos: (fig.get_type(), fig.get_color()) for pos, fig in position.current_state.items()}
+        changed = [pos for pos in set(current) | set(self._shown) if current.get(pos) != self._shown.get(pos)]
+        for pos in changed:
+            self._draw_square(pos)
+            if pos in current:
+                self._draw_figure(pos, current[pos])
+        self._shown = current
+        self._update()
+        return len(changed)
+
+    def play(self, position, line, delay=0.5):
+        """
+        Проигрывает последовательность ходов, перерисовывая только изменившиеся клетки
+
+        Ходы делаются на самой позиции (make_turn) и после проигрывания отменяются,
+        на экране остается конечная позиция
+        :param position: <class 'Position'> instance
+        :param line: ходы в шахматной нотации - кортеж из find_checkmates/find_forced_mate,
+                     напр. (('a7', 'b8'), ('c6', 'c5'), ('b8', 'b5'))
+        :param delay: пауза между ходами в секундах
+        :return: None
+        """
+        self.refresh(position)
+        made = 0
+        try:
+            for turn in line:
+                time.sleep(delay)
+                position.make_turn(turn)
+                made += 1
+                self.refresh(position)
+        finally:
+            for _ in range(made):
+                position.unmake_move()
+
+    def show_move(self, position, cell1, cell2, block=True):
         """
         Отрисовывает передвижение фигуры
 
-        а - масштаб
         :param position: <class 'Position'> instance
         :param cell1: start position
         :param cell2: end position
+        :param block: ждать закрытия окна (turtle.mainloop)
         :return: None
         """
         cell1, cell2 = ch2py(cell1), ch2py(cell2)
-        # определение цвета начальной и конечной клетки
-        start_flag, end_flag = (cell1[0] + cell1[1]) % 2, (cell2[0] + cell2[1]) % 2
-        start_color = 'dark grey' if start_flag == 0 else 'light grey'
-        end_color = 'dark grey' if end_flag == 0 else 'light grey'
-        a = 90
-        start_pos_x = -4 * a
-        start_pos_y = -4 * a
-        figs = position.get_pos()
-        try:
-            figure = figs[cell1]
-        except KeyError:
+        figure = position.current_state.get(cell1, None)
+        if figure is None:
             raise ErrorEmptyCell
         figure = (figure.get_type(), figure.get_color())
-        fig_code = FIGURE_CODES[figure]
-        # --------- удаление первой фигуры с доски --------
-        pos_x = start_pos_x + cell1[0] * a
-        pos_y = start_pos_y + cell1[1] * a
-        self.t.seth(0)
-        self.t.up()
-        self.t.setpos(pos_x, pos_y + a)
-        self.t.color('black', start_color)
-        self.t.begin_fill()
-        self.t.seth(0)
-        self.t.down()
-        for k in range(4):
-            self.t.fd(a)
-            self.t.right(90)
-        self.t.end_fill()
-        # --------- удаление второй фигуры с доски (на случай если есть)--------
-        pos_x = start_pos_x + cell2[0] * a
-        pos_y = start_pos_y + cell2[1] * a
-        self.t.seth(0)
-        self.t.up()
-        self.t.setpos(pos_x, pos_y + a)
-        self.t.color('black', end_color)
-        self.t.begin_fill()
-        self.t.seth(0)
-        self.t.down()
-        for k in range(4):
-            self.t.fd(a)
-            self.t.right(90)
-        self.t.end_fill()
-        self.t.up()
-        # --------- отрисовка фигуры на новой клетке ---------
-        pos_x = start_pos_x + cell2[0] * a + int(a * 0.1)
-        pos_y = start_pos_y + cell2[1] * a + int(a * 0.05)
-        self.t.setpos(pos_x, pos_y)
-        self.t.write(chr(fig_code), font=('', int(a * 2 / 3)))
-        turtle.mainloop()
\ No newline at end of file
+        # удаление фигур с обеих клеток и отрисовка фигуры на новой клетке
+        self._draw_square(cell1)
+        self._draw_square(cell2)
+        self._draw_figure(cell2, figure)
+        if self._shown is not None:
+            self._shown.pop(cell1, None)
+            self._shown[cell2] = figure
+        self._update()
+        if block:
+            turtle.mainloop()
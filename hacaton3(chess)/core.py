@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Спільне ядро: координати полів, коди символів фігур і базові винятки
+
+Поле задається трьома способами: рядком 'e2', кортежем (x, y) = (4, 1) і номером
+x + 8 * y = 12. Таблиці перетворень між ними обчислюються один раз при імпорті,
+тому кожне перетворення - це один пошук у списку чи словнику.
+"""
+
+FILES = 'abcdefgh'
+
+SQUARE_COORDS = [(sq % 8, sq // 8) for sq in range(64)]                 # номер -> (x, y)
+SQUARE_NAMES = [FILES[x] + str(y + 1) for x, y in SQUARE_COORDS]        # номер -> 'a1'
+SQUARE_INDEX = {pos: sq for sq, pos in enumerate(SQUARE_COORDS)}        # (x, y) -> номер
+COORD_NAMES = dict(zip(SQUARE_COORDS, SQUARE_NAMES))                    # (x, y) -> 'a1'
+NAME_COORDS = dict(zip(SQUARE_NAMES, SQUARE_COORDS))                    # 'a1' -> (x, y)
+
+# символи Unicode для фігур
+FIGURE_CODES = {('king', 'b'): 9818,
+                ('queen', 'b'): 9819,
+                ('bishop', 'b'): 9821,
+                ('rook', 'b'): 9820,
+                ('knight', 'b'): 9822,
+                ('pawn', 'b'): 9823,
+                ('king', 'w'): 9812,
+                ('queen', 'w'): 9813,
+                ('bishop', 'w'): 9815,
+                ('rook', 'w'): 9814,
+                ('knight', 'w'): 9816,
+                ('pawn', 'w'): 9817,
+                }
+
+
+class ErrorNoKing(Exception):
+
+    def __str__(self):
+        return "Відсутній король"
+
+
+def ch2py(pos_ch):
+    """
+    function that changes string 'a1' to tuple '(0,0)'
+    :param pos_ch: string of coordinates
+    :return: tuple of coordinates
+    """
+    try:
+        return NAME_COORDS[pos_ch]
+    except KeyError:
+        raise ValueError('некоректне поле: {!r}'.format(pos_ch))
+
+
+def ch2ch(pos_py):
+    """
+    Function that changes tuple '(0,0)' to string 'a1'.
+
+    :param pos_py: tuple of coordinates
+    :return: string of coordinates
+    """
+    return COORD_NAMES[pos_py]
+
+
+def square(pos):
+    """
+    Функція, яка змінює кортеж (x, y) на номер поля 0..63
+
+    :param pos: кортеж (х, у)
+    :return: ціле число
+    """
+    return SQUARE_INDEX[pos]
+
+
+def coords(sq):
+    """
+    Функція, яка змінює номер поля 0..63 на кортеж (x, y)
+
+    :param sq: ціле число
+    :return: кортеж (х, у)
+    """
+    return SQUARE_COORDS[sq]
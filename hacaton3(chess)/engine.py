@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Пошук найкращого ходу: альфа-бета з ітеративним поглибленням і пошуком взяттів
+
+Позиція оцінюється за матеріалом і положенням фігур (модуль evaluation); оцінку
+Position оновлює при кожному ході, тому в листках вона береться готовою.
+На глибині 0 пошук продовжується лише взяттями і перетвореннями пішака (а під шахом -
+усіма ходами), щоб не оцінювати позицію посеред розмінів. Ходи впорядковуються:
+найкращий хід з таблиці транспозицій, взяття за MVV-LVA, перетворення, тихі ходи.
+Ліміт часу перевіряється через SearchBudget; якщо час вичерпано, повертається
+результат останньої завершеної ітерації. Якщо позиція є в книзі дебютів (модуль book),
+хід береться з книги без пошуку (пошуки матів книгу не використовують - див. book).
+
+Запуск:
+    python3 engine.py "8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1" --depth 4 --time 5 --book book.bin
+"""
+import argparse
+import sys
+
+from book import Book
+from figures import Position, SearchBudget, ErrorBudget, FIGURE_VALUES
+from transposition import ScoreTable
+
+MATE = 100000       # оцінка мату; мат ближче до кореня оцінюється вище
+MATE_BOUND = MATE - 1000
+
+# тип запису таблиці транспозицій: точна оцінка, оцінка не менша, оцінка не більша
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def _to_table(score, ply):
+    # оцінка мату в таблиці зберігається відносно позиції, а не кореня
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def _ordered_turns(position, right_moves, best=None, captures_only=False):
+    """
+    ходи у порядку перебору
+
+    :param position: об'єкт класу Position
+    :param right_moves: словник з допустимими ходами
+    :param best: хід у нотації, який перебирається першим (з таблиці транспозицій)
+    :param captures_only: лише взяття і перетворення пішака
+    :return: список кортежів (pos1, pos2, transform, turn)
+    """
+    state = position.current_state
+    scored = []
+    for item in position._get_turns(right_moves):
+        pos1, pos2, transform, turn = item
+        victim = state.get(pos2, None)
+        if turn == best:
+            score = (0, 0, 0)
+        elif victim is not None:
+            score = (1, -FIGURE_VALUES[victim.get_type()], FIGURE_VALUES[state[pos1].get_type()])
+        elif len(turn) == 3:        # перетворення пішака
+            score = (2, -FIGURE_VALUES[transform], 0)
+        elif captures_only:
+            continue
+        else:
+            score = (3, 0, 0)
+        scored.append((score, item))
+    scored.sort(key=lambda pair: pair[0])
+    return [item for score, item in scored]
+
+
+def _quiesce(position, color, alpha, beta, ply, budget):
+    """
+    пошук лише взяттями до спокійної позиції
+
+    :return: оцінка з боку color
+    """
+    budget.spend()
+    king_pos, check, right_moves = position.get_legal_moves(color)
+    if not right_moves:
+        return -MATE + ply if check else 0
+    if not check:
+        stand_pat = position.get_score(color)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+    alter_color = 'b' if color == 'w' else 'w'
+    for pos1, pos2, transform, turn in _ordered_turns(position, right_moves, captures_only=not check):
+        position.make_move(pos1, pos2, transform)
+        try:
+            score = -_quiesce(position, alter_color, -beta, -alpha, ply + 1, budget)
+        finally:
+            position.unmake_move()
+        if score >= beta:
+            return score
+        alpha = max(alpha, score)
+    return alpha
+
+
+def _alpha_beta(position, color, depth, alpha, beta, ply, table, budget):
+    """
+    альфа-бета пошук (negamax)
+
+    :param position: об'єкт класу Position
+    :param color: колір сторони, яка ходить
+    :param depth: к-ть півходів, що залишилась
+    :param alpha: нижня межа оцінки
+    :param beta: верхня межа оцінки
+    :param ply: к-ть півходів від кореня
+    :param table: об'єкт ScoreTable
+    :param budget: об'єкт SearchBudget
+    :return: (оцінка з боку color, найкращий хід у нотації або None)
+    """
+    if depth <= 0:
+        return _quiesce(position, color, alpha, beta, ply, budget), None
+    budget.spend()
+
+    key = position.get_key(color)
+    entry = table.probe(key, depth)
+    best = None
+    if entry is not None:
+        flag, score, best = entry
+        score = _from_table(score, ply)
+        if ply and (flag == EXACT or flag == LOWER and score >= beta or flag == UPPER and score <= alpha):
+            return score, best
+
+    king_pos, check, right_moves = position.get_legal_moves(color)
+    if not right_moves:
+        return (-MATE + ply if check else 0), None
+
+    alter_color = 'b' if color == 'w' else 'w'
+    alpha_start = alpha
+    best_score = -MATE - 1
+    for pos1, pos2, transform, turn in _ordered_turns(position, right_moves, best):
+        position.make_move(pos1, pos2, transform)
+        try:
+            score = -_alpha_beta(position, alter_color, depth - 1, -beta, -alpha, ply + 1, table, budget)[0]
+        finally:
+            position.unmake_move()
+        if score > best_score:
+            best_score, best = score, turn
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+    flag = UPPER if best_score <= alpha_start else LOWER if best_score >= beta else EXACT
+    table.store(key, depth, flag, _to_table(best_score, ply), best)
+    return best_score, best
+
+
+def search_best_move(position, color, depth, time_limit=None, table=None, book=None):
+    """
+    найкращий хід сторони color (альфа-бета з ітеративним поглибленням)
+
+    :param position: об'єкт класу Position (змінюється і відновлюється)
+    :param color: колір сторони, яка ходить
+    :param depth: максимальна глибина в півходах
+    :param time_limit: ліміт часу в секундах (None - без обмеження)
+    :param table: об'єкт ScoreTable (якщо не вказано - створюється новий); таблиця
+                  TranspositionTable пошуку матів з тими самими ключами сюди не підходить
+    :param book: об'єкт book.Book; якщо позиція є в книзі і найчастіший хід з книги допустимий,
+                 пошук не запускається і повертається цей хід; недопустимий хід з книги
+                 (колізія хешу або пошкоджений файл) пропускається і хід шукається як звичайно
+    :return: (хід у нотації або None, якщо ходів немає; оцінка з боку color у сантипішаках,
+              для мату - близька до MATE). Для ходу з книги оцінка - статична оцінка позиції
+              (position.get_score), а не результат пошуку
+    """
+    if book is not None:
+        turn = book.choose(position, color)
+        if turn is not None and turn in {legal[3] for legal in position.get_legal_turns(color)}:
+            return turn, position.get_score(color)
+    if table is None:
+        table = ScoreTable()
+    elif not isinstance(table, ScoreTable):
+        raise TypeError('для search_best_move потрібна ScoreTable, а не {}'.format(type(table).__name__))
+    budget = SearchBudget(time_limit=time_limit)
+    king_pos, check, right_moves = position.get_legal_moves(color)
+    if not right_moves:
+        return None, (-MATE if check else 0)
+
+    # якщо час закінчиться ще на першій ітерації, повертається перший з впорядкованих ходів
+    best_turn = _ordered_turns(position, right_moves)[0][3]
+    best_score = position.get_score(color)
+    for d in range(1, depth + 1):
+        try:
+            best_score, best_turn = _alpha_beta(position, color, d, -MATE - 1, MATE + 1, 0, table, budget)
+        except ErrorBudget:
+            break
+        if abs(best_score) > MATE_BOUND:
+            break       # знайдено найкоротший мат
+    return best_turn, best_score
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='пошук найкращого ходу')
+    parser.add_argument('fen', help='позиція у форматі FEN')
+    parser.add_argument('--depth', type=int, default=4, help='глибина в півходах')
+    parser.add_argument('--time', type=float, help='ліміт часу в секундах')
+    parser.add_argument('--book', help='файл книги дебютів')
+    args = parser.parse_args(argv)
+
+    position = Position()
+    color = position.set_fen(args.fen)
+    book = Book(args.book) if args.book else None
+    try:
+        turn, score = search_best_move(position, color, args.depth, args.time, book=book)
+    finally:
+        if book is not None:
+            book.close()
+    print(turn, score)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
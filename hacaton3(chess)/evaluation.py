@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Модуль з таблицями оцінки позиції: матеріал і позиційні бонуси фігур
+
+Оцінка - у сантипішаках з боку білих (плюс - краще білим). Position підтримує
+суму SCORES для всіх фігур на дошці при кожній зміні дошки (як і хеш Зобріста),
+тому оцінка позиції не потребує перебору фігур.
+
+Таблиці позиційних бонусів записані для білих так, як дошка виглядає з боку білих
+(перший рядок - 8-ма горизонталь); для чорних вони дзеркально відображаються.
+"""
+
+PIECE_VALUES = {'king': 0, 'queen': 900, 'rook': 500, 'bishop': 330, 'knight': 320, 'pawn': 100}
+
+PIECE_SQUARE_TABLES = {
+    'pawn': [[0, 0, 0, 0, 0, 0, 0, 0],
+             [50, 50, 50, 50, 50, 50, 50, 50],
+             [10, 10, 20, 30, 30, 20, 10, 10],
+             [5, 5, 10, 25, 25, 10, 5, 5],
+             [0, 0, 0, 20, 20, 0, 0, 0],
+             [5, -5, -10, 0, 0, -10, -5, 5],
+             [5, 10, 10, -20, -20, 10, 10, 5],
+             [0, 0, 0, 0, 0, 0, 0, 0]],
+    'knight': [[-50, -40, -30, -30, -30, -30, -40, -50],
+               [-40, -20, 0, 0, 0, 0, -20, -40],
+               [-30, 0, 10, 15, 15, 10, 0, -30],
+               [-30, 5, 15, 20, 20, 15, 5, -30],
+               [-30, 0, 15, 20, 20, 15, 0, -30],
+               [-30, 5, 10, 15, 15, 10, 5, -30],
+               [-40, -20, 0, 5, 5, 0, -20, -40],
+               [-50, -40, -30, -30, -30, -30, -40, -50]],
+    'bishop': [[-20, -10, -10, -10, -10, -10, -10, -20],
+               [-10, 0, 0, 0, 0, 0, 0, -10],
+               [-10, 0, 5, 10, 10, 5, 0, -10],
+               [-10, 5, 5, 10, 10, 5, 5, -10],
+               [-10, 0, 10, 10, 10, 10, 0, -10],
+               [-10, 10, 10, 10, 10, 10, 10, -10],
+               [-10, 5, 0, 0, 0, 0, 5, -10],
+               [-20, -10, -10, -10, -10, -10, -10, -20]],
+    'rook': [[0, 0, 0, 0, 0, 0, 0, 0],
+             [5, 10, 10, 10, 10, 10, 10, 5],
+             [-5, 0, 0, 0, 0, 0, 0, -5],
+             [-5, 0, 0, 0, 0, 0, 0, -5],
+             [-5, 0, 0, 0, 0, 0, 0, -5],
+             [-5, 0, 0, 0, 0, 0, 0, -5],
+             [-5, 0, 0, 0, 0, 0, 0, -5],
+             [0, 0, 0, 5, 5, 0, 0, 0]],
+    'queen': [[-20, -10, -10, -5, -5, -10, -10, -20],
+              [-10, 0, 0, 0, 0, 0, 0, -10],
+              [-10, 0, 5, 5, 5, 5, 0, -10],
+              [-5, 0, 5, 5, 5, 5, 0, -5],
+              [0, 0, 5, 5, 5, 5, 0, -5],
+              [-10, 5, 5, 5, 5, 5, 0, -10],
+              [-10, 0, 5, 0, 0, 0, 0, -10],
+              [-20, -10, -10, -5, -5, -10, -10, -20]],
+    'king': [[-30, -40, -40, -50, -50, -40, -40, -30],
+             [-30, -40, -40, -50, -50, -40, -40, -30],
+             [-30, -40, -40, -50, -50, -40, -40, -30],
+             [-30, -40, -40, -50, -50, -40, -40, -30],
+             [-20, -30, -30, -40, -40, -30, -30, -20],
+             [-10, -20, -20, -20, -20, -20, -20, -10],
+             [20, 20, 0, 0, 0, 0, 20, 20],
+             [20, 30, 10, 0, 0, 10, 30, 20]],
+}
+
+
+def _score_table(figure_type, color):
+    """
+    внесок фігури в оцінку з боку білих для кожного поля
+
+    :param figure_type: тип фігури
+    :param color: колір фігури
+    :return: словник {(x, y): ціле число}
+    """
+    table = PIECE_SQUARE_TABLES[figure_type]
+    if color == 'w':
+        return {(x, y): PIECE_VALUES[figure_type] + table[7 - y][x] for x in range(8) for y in range(8)}
+    return {(x, y): -PIECE_VALUES[figure_type] - table[y][x] for x in range(8) for y in range(8)}
+
+
+# {(тип, колір): {(x, y): внесок в оцінку з боку білих}}
+SCORES = {(t, c): _score_table(t, c) for t in PIECE_VALUES for c in ('w', 'b')}
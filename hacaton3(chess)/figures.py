@@ -4,14 +4,51 @@
 Модуль з класами для реалізації логіки гри у шахи
 
 """
-from collections import defaultdict
+import random
+import time
+from attacks import KNIGHT_MOVES, KING_MOVES, PAWN_TAKES, PAWN_ATTACKERS, ROOK_RAYS, BISHOP_RAYS, QUEEN_RAYS
+from transposition import TranspositionTable
+from evaluation import SCORES
+from core import ErrorNoKing, ch2py, ch2ch, COORD_NAMES, SQUARE_COORDS, SQUARE_INDEX, SQUARE_NAMES
 FIGURE_TYPES = ['king', 'queen', 'bishop', 'rook', 'knight', 'pawn']
 
+# ключі Зобріста: випадкове 64-бітне число для кожної фігури на кожному полі
+# (генератор з фіксованим зерном, щоб хеші збігались між запусками і процесами)
+_zobrist_random = random.Random(2019)
+ZOBRIST_KEYS = {(t, c): {(x, y): _zobrist_random.getrandbits(64) for x in range(8) for y in range(8)}
+                for t in FIGURE_TYPES for c in ('w', 'b')}
+ZOBRIST_BLACK = _zobrist_random.getrandbits(64)     # додається, якщо ходять чорні
+
+# літери фігур у FEN (білі - великі, чорні - малі)
+FIGURE_LETTERS = {'king': 'k', 'queen': 'q', 'bishop': 'b', 'rook': 'r', 'knight': 'n', 'pawn': 'p'}
+LETTER_FIGURES = {v: k for k, v in FIGURE_LETTERS.items()}
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1'
+
+# симетрії позиції (рокіровок і взяття на проході немає, тому обидві завжди допустимі):
+# дзеркало вертикалей a <-> h і дзеркало горизонталей 1 <-> 8 зі зміною кольорів фігур
+# і сторони, яка ходить; кожна симетрія обернена сама до себе
+FLIP_FILES = 1
+FLIP_COLORS = 2
+SYMMETRIES = (0, FLIP_FILES, FLIP_COLORS, FLIP_FILES | FLIP_COLORS)
+# номер поля після симетрії - це номер ^ маска (x ^ 7 для вертикалей, y ^ 7 для горизонталей)
+_SYMMETRY_MASKS = {s: (7 if s & FLIP_FILES else 0) | (56 if s & FLIP_COLORS else 0) for s in SYMMETRIES}
+_SYMMETRY_NAMES = {s: {name: SQUARE_NAMES[sq ^ mask] for sq, name in enumerate(SQUARE_NAMES)}
+                   for s, mask in _SYMMETRY_MASKS.items()}
+
+# цінність фігур для впорядкування взяттів (MVV-LVA)
+FIGURE_VALUES = {'king': 100, 'queen': 9, 'rook': 5, 'bishop': 3, 'knight': 3, 'pawn': 1}
+
+
+def transform_line(line, symmetry):
+    """
+    переносить ходи на симетричну позицію (див. Position.get_canonical)
 
-class ErrorNoKing(Exception):
-
-    def __str__(self):
-        return "Відсутній король"
+    :param line: ітерабельний об'єкт з ходами (start, end[, transform])
+    :param symmetry: одна з SYMMETRIES
+    :return: кортеж ходів у вигляді кортежів
+    """
+    names = _SYMMETRY_NAMES[symmetry]
+    return tuple((names[turn[0]], names[turn[1]], *turn[2:]) for turn in line)
 
 
 class ErrorGetOutOfDesk(Exception):
@@ -20,28 +57,121 @@ class ErrorGetOutOfDesk(Exception):
         return "Координати фігури не коректні"
 
 
-def ch2py(pos_ch):
+class ErrorBadFormat(Exception):
+
+    def __str__(self):
+        return "Некоректний запис позиції"
+
+
+class ErrorBudget(Exception):
+
+    def __str__(self):
+        return "Вичерпано ліміт пошуку"
+
+
+class SearchBudget:
     """
-    function that changes string 'a1' to tuple '(0,0)'
-    :param pos_ch: string of coordinates
-    :return: tuple of coordinates
+    Ліміт пошуку за к-тю переглянутих позицій і/або за часом
+
+    пошук викликає spend() для кожної позиції; коли ліміт вичерпано, spend()
+    кидає ErrorBudget, і дошка відновлюється під час розкручування стеку
     """
-    s = 'abcdefgh'
-    y = int(pos_ch[1]) - 1
-    x = s.index(pos_ch[0])
-    return x, y
+    def __init__(self, max_nodes=None, time_limit=None):
+        """
+        :param max_nodes: максимальна к-ть позицій (None - без обмеження)
+        :param time_limit: максимальний час у секундах (None - без обмеження)
+        """
+        self.max_nodes = max_nodes
+        self.deadline = time.monotonic() + time_limit if time_limit is not None else None
+        self.nodes = 0
+
+    def spend(self):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise ErrorBudget
+        # час перевіряється не для кожної позиції, бо це відносно дорого
+        if self.deadline is not None and not self.nodes & 255 and time.monotonic() > self.deadline:
+            raise ErrorBudget
 
 
-def ch2ch(pos_py):
+class SearchStats:
     """
-    Function that changes tuple '(0,0)' to string 'a1'.
+    Статистика пошуку матів
 
-    :param pos_py: tuple of coordinates
-    :return: string of coordinates
+    для кожного півходу від кореня рахуються позиції, згенеровані допустимі ходи,
+    відсічення (гілки, перервані до перебору всіх ходів) і влучання в таблицю
+    транспозицій; для кожної ітерації поглиблення і кожного першого ходу - к-ть
+    позицій і час. Для генератора iter_checkmates час включає і час, який витратив
+    на обробку матів той, хто його ітерує.
+
+    callback(event, record) - необов'язкова функція, яка викликається після кожного
+    першого ходу (event='root', record={'turn', 'depth', 'nodes', 'seconds'}) і кожної
+    ітерації (event='iteration', record={'depth', 'nodes', 'seconds'})
     """
-    s = 'abcdefgh'
-    x = s[pos_py[0]]
-    return x + str(pos_py[1] + 1)
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.nodes = 0
+        self.plies = []         # [{'nodes', 'moves', 'cutoffs', 'tt_hits'}] для кожного півходу
+        self.iterations = []    # [{'depth', 'nodes', 'seconds'}]
+        self.root_moves = {}    # {хід: {'nodes', 'seconds'}} - сумарно за всі ітерації
+        self._start = time.perf_counter()
+
+    def _ply(self, ply):
+        while len(self.plies) <= ply:
+            self.plies.append({'nodes': 0, 'moves': 0, 'cutoffs': 0, 'tt_hits': 0})
+        return self.plies[ply]
+
+    def node(self, ply):
+        self.nodes += 1
+        self._ply(ply)['nodes'] += 1
+
+    def moves(self, ply, right_moves):
+        self._ply(ply)['moves'] += sum(len(targets) for targets in right_moves.values())
+
+    def cutoff(self, ply):
+        self._ply(ply)['cutoffs'] += 1
+
+    def tt_hit(self, ply):
+        self._ply(ply)['tt_hits'] += 1
+
+    def root_move(self, turn, depth, nodes, seconds):
+        """
+        :param turn: перший хід
+        :param depth: глибина ітерації
+        :param nodes: к-ть позицій у піддереві цього ходу
+        :param seconds: час на піддерево цього ходу
+        """
+        record = self.root_moves.setdefault(turn, {'nodes': 0, 'seconds': 0.0})
+        record['nodes'] += nodes
+        record['seconds'] += seconds
+        if self.callback is not None:
+            self.callback('root', {'turn': turn, 'depth': depth, 'nodes': nodes, 'seconds': seconds})
+
+    def iteration(self, depth, nodes, seconds):
+        """
+        :param depth: глибина ітерації
+        :param nodes: к-ть позицій за ітерацію
+        :param seconds: час ітерації
+        """
+        record = {'depth': depth, 'nodes': nodes, 'seconds': seconds}
+        self.iterations.append(record)
+        if self.callback is not None:
+            self.callback('iteration', record)
+
+    def as_dict(self):
+        """
+        :return: словник для JSON; branching - середня к-ть ходів у позиції на цьому півході
+        """
+        plies = []
+        for ply, record in enumerate(self.plies):
+            record = dict(ply=ply, **record)
+            record['branching'] = record['moves'] / record['nodes'] if record['nodes'] else 0.0
+            plies.append(record)
+        return {'nodes': self.nodes,
+                'seconds': time.perf_counter() - self._start,
+                'plies': plies,
+                'iterations': self.iterations,
+                'root_moves': [dict(turn=turn, **record) for turn, record in self.root_moves.items()]}
 
 
 class Figure:
@@ -58,10 +188,37 @@ class Figure:
         _get_<figure>(desk, pos) -> list - список можливих ходів для кожної фігури
         _get_<figure>_takes(desk, pos_ -> list - список можливих атак для кожної фігури
 
+    Фігури незмінні, тому для кожної пари (тип, колір) існує лише один об'єкт:
+    Figure(type_f, color) повертає його з кешу, а копія дошки копіює лише посилання.
+    Методи для ходів і атак вибираються один раз при створенні об'єкта.
     """
-    def __init__(self, type_f, color):
-        self._type = type_f
-        self._color = color
+    __slots__ = ('_type', '_color', '_transform_row', '_moves', '_takes')
+
+    _cache = {}     # {(тип, колір): фігура}
+
+    def __new__(cls, type_f, color):
+        figure = cls._cache.get((type_f, color), None)
+        if figure is None:
+            if type_f not in FIGURE_TYPES or color not in ('w', 'b'):
+                raise ValueError('невідома фігура: {} {}'.format(type_f, color))
+            figure = super().__new__(cls)
+            figure._type = type_f
+            figure._color = color
+            # горизонталь, з якої пішак перетворюється
+            figure._transform_row = (6 if color == 'w' else 1) if type_f == 'pawn' else None
+            figure._moves = getattr(figure, '_get_' + type_f)
+            figure._takes = getattr(figure, '_get_' + type_f + '_takes')
+            cls._cache[(type_f, color)] = figure
+        return figure
+
+    def __reduce__(self):
+        return Figure, (self._type, self._color)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __str__(self):
         return "Black " + self._type if self._color == 'b' else "White " + self._type
@@ -76,8 +233,7 @@ class Figure:
         return self._color
 
     def is_transform(self, pos):
-        return self._type == 'pawn' and self._color == 'w' and pos[1] == 6 \
-            or self._type == 'pawn' and self._color == 'b' and pos[1] == 1
+        return pos[1] == self._transform_row
 
     def _get_king_takes(self, desk, pos):
         """
@@ -86,13 +242,8 @@ class Figure:
         :param pos: кортеж (х, у)
         :return: список кортежів (х, у)
         """
-        moves = []
-        for x in range(pos[0] - 1, pos[0] + 2):
-            for y in range(pos[1] - 1, pos[1] + 2):
-                figure = desk.get((x, y), 'no')
-                if figure != 'no' and figure.get_color() != self._color:
-                    moves.append((x, y))
-        return moves
+        return [tmp for tmp in KING_MOVES[pos]
+                if tmp in desk and desk[tmp].get_color() != self._color]
 
     @staticmethod
     def _get_king(desk, pos):
@@ -102,55 +253,63 @@ class Figure:
         :param pos: кортеж (х, у)
         :return: список кортежів (х, у)
         """
-        moves = []
-        for x in range(pos[0] - 1, pos[0] + 2):
-            for y in range(pos[1] - 1, pos[1] + 2):
-                figure = desk.get((x, y), 'no')
-                if figure == 'no' and x in range(8) and y in range(8):
-                    moves.append((x, y))
-
-        return moves
+        return [tmp for tmp in KING_MOVES[pos] if tmp not in desk]
 
-    def _get_bishop_takes(self, desk, pos):
+    def _get_rays_takes(self, desk, pos, rays):
         """
-        повертає можливі взяття для офіцера
+        повертає перші чужі фігури на кожному з променів
         :param desk: словник {позиція: об'єкт класу Figure}
         :param pos: кортеж (х, у)
+        :param rays: таблиця променів (див. модуль attacks)
         :return: список кортежів (х, у)
         """
         moves = []
-        for t in [(-1, -1), (1, 1), (1, -1), (-1, 1)]:
-            for j in range(1, 8):
-                tmp = (pos[0] + t[0] * j, pos[1] + t[1] * j)
-                figure = desk.get(tmp, 'no')
-                if figure == 'no':
+        for ray in rays[pos]:
+            for tmp in ray:
+                figure = desk.get(tmp, None)
+                if figure is None:
                     continue
-                elif figure.get_color() == self._color:
-                    break
                 elif figure.get_color() != self._color:
                     moves.append(tmp)
-                    break
+                break
         return moves
 
     @staticmethod
-    def _get_bishop(desk, pos):
+    def _get_rays(desk, pos, rays):
         """
-        повертає можливі ходи для офіцера
+        повертає вільні поля на кожному з променів до першої фігури
         :param desk: словник {позиція: об'єкт класу Figure}
         :param pos: кортеж (х, у)
+        :param rays: таблиця променів (див. модуль attacks)
         :return: список кортежів (х, у)
         """
         moves = []
-        for t in [(-1, -1), (1, 1), (1, -1), (-1, 1)]:
-            for j in range(1, 8):
-                tmp = (pos[0] + t[0] * j, pos[1] + t[1] * j)
-                figure = desk.get(tmp, 'no')
-                if figure == 'no' and tmp[0] in range(8) and tmp[1] in range(8):
-                    moves.append(tmp)
-                else:
+        for ray in rays[pos]:
+            for tmp in ray:
+                if tmp in desk:
                     break
+                moves.append(tmp)
         return moves
 
+    def _get_bishop_takes(self, desk, pos):
+        """
+        повертає можливі взяття для офіцера
+        :param desk: словник {позиція: об'єкт класу Figure}
+        :param pos: кортеж (х, у)
+        :return: список кортежів (х, у)
+        """
+        return self._get_rays_takes(desk, pos, BISHOP_RAYS)
+
+    @staticmethod
+    def _get_bishop(desk, pos):
+        """
+        повертає можливі ходи для офіцера
+        :param desk: словник {позиція: об'єкт класу Figure}
+        :param pos: кортеж (х, у)
+        :return: список кортежів (х, у)
+        """
+        return Figure._get_rays(desk, pos, BISHOP_RAYS)
+
     def _get_rook_takes(self, desk, pos):
         """
         повертає можливі взяття для тури
@@ -158,43 +317,17 @@ class Figure:
         :param pos: кортеж (х, у)
         :return: список кортежів (х, у)
         """
-        moves = []
-        for t in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            for j in range(1, 8):
-                tmp = (pos[0] + t[0] * j, pos[1] + t[1] * j)
-                figure = desk.get(tmp, 'no')
-                if figure == 'no':
-                    continue
-                elif figure.get_color() == self._color:
-                    break
-                elif figure.get_color() != self._color:
-                    moves.append(tmp)
-                    break
-        return moves
+        return self._get_rays_takes(desk, pos, ROOK_RAYS)
 
-    def _get_rook(self, desk, pos):
+    @staticmethod
+    def _get_rook(desk, pos):
         """
-        повертає можливі ходи для короля
+        повертає можливі ходи для тури
         :param desk: словник {позиція: об'єкт класу Figure}
         :param pos: кортеж (х, у)
         :return: список кортежів (х, у)
         """
-        moves = []
-        for t in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            for j in range(1, 8):
-                tmp = (pos[0] + t[0] * j, pos[1] + t[1] * j)
-                figure = desk.get(tmp, 'no')
-                if figure == 'no' and tmp[0] in range(8) and tmp[1] in range(8):
-                    moves.append(tmp)
-                elif figure == 'no':
-                    continue
-                elif figure.get_color() == self._color:
-                    break
-                elif figure.get_color() != self._color:
-                    break
-                else:
-                    moves.append(tmp)
-        return moves
+        return Figure._get_rays(desk, pos, ROOK_RAYS)
 
     def _get_queen_takes(self, desk, pos):
         """
@@ -203,20 +336,17 @@ class Figure:
         :param pos: кортеж (х, у)
         :return: список кортежів (х, у)
         """
-        moves1 = self._get_bishop_takes(desk, pos)
-        moves2 = self._get_rook_takes(desk, pos)
-        return moves1 + moves2
+        return self._get_rays_takes(desk, pos, QUEEN_RAYS)
 
-    def _get_queen(self, desk, pos):
+    @staticmethod
+    def _get_queen(desk, pos):
         """
         повертає можливі ходи для королеви
         :param desk: словник {позиція: об'єкт класу Figure}
         :param pos: кортеж (х, у)
         :return: список кортежів (х, у)
         """
-        moves1 = self._get_bishop(desk, pos)
-        moves2 = self._get_rook(desk, pos)
-        return moves1 + moves2
+        return Figure._get_rays(desk, pos, QUEEN_RAYS)
 
     def _get_knight_takes(self, desk, pos):
         """
@@ -225,13 +355,8 @@ class Figure:
         :param pos: кортеж (х, у)
         :return: список кортежів (х, у)
         """
-        moves = []
-        for t in [(1, 2), (2, 1), (1, -2), (2, -1), (-1, 2), (-2, 1)]:
-            tmp = (pos[0] + t[0], pos[1] + t[1])
-            figure = desk.get(tmp, 'no')
-            if figure != 'no' and figure.get_color() != self._color:
-                moves.append(tmp)
-        return moves
+        return [tmp for tmp in KNIGHT_MOVES[pos]
+                if tmp in desk and desk[tmp].get_color() != self._color]
 
     @staticmethod
     def _get_knight(desk, pos):
@@ -241,13 +366,7 @@ class Figure:
         :param pos: кортеж (х, у)
         :return: список кортежів (х, у)
         """
-        moves = []
-        for t in [(1, 2), (2, 1), (1, -2), (2, -1), (-1, 2), (-2, 1)]:
-            tmp = (pos[0] + t[0], pos[1] + t[1])
-            figure = desk.get(tmp, 'no')
-            if figure == 'no' and tmp[0] in range(8) and tmp[1] in range(8):
-                moves.append(tmp)
-        return moves
+        return [tmp for tmp in KNIGHT_MOVES[pos] if tmp not in desk]
 
     def _get_pawn(self, desk, pos):
         """
@@ -262,10 +381,11 @@ class Figure:
         tmp2 = (pos[0], pos[1] + 2 * t)
 
         figure = desk.get(tmp1, 'no')
-        if figure == 'no' and tmp1[1] in range(8) and tmp2[1] in range(8):
+        if figure == 'no' and tmp1[1] in range(8):
             moves.append(tmp1)
             figure2 = desk.get(tmp2, 'no')
-            if (t and pos[1] in range(4) or not t and pos[1] in range(4, 8)) and figure2 == 'no':
+            # подвійний хід - тільки зі стартової горизонталі
+            if pos[1] == (1 if t == 1 else 6) and figure2 == 'no':
                 moves.append(tmp2)
 
         return moves
@@ -277,15 +397,8 @@ class Figure:
         :param pos: кортеж (х, у)
         :return: список кортежів (х, у)
         """
-        moves = []
-        t = 1 if self._color == 'w' else -1
-        tmp1 = (pos[0] + 1, pos[1] + t)
-        tmp2 = (pos[0] - 1, pos[1] + t)
-        for tmp in (tmp1, tmp2):
-            figure = desk.get(tmp, 'no')
-            if figure != 'no' and figure.get_color() != self._color:
-                moves.append(tmp)
-        return moves
+        return [tmp for tmp in PAWN_TAKES[self._color][pos]
+                if tmp in desk and desk[tmp].get_color() != self._color]
 
     def get_available_moves(self, pos, cell):
         """
@@ -294,18 +407,7 @@ class Figure:
         :param cell: об'єкт класу Position
         :return: список кортежів (х, у)
         """
-        if self._type == 'king':
-            return self._get_king(cell.current_state, pos)
-        elif self._type == 'queen':
-            return self._get_queen(cell.current_state, pos)
-        elif self._type == 'bishop':
-            return self._get_bishop(cell.current_state, pos)
-        elif self._type == 'pawn':
-            return self._get_pawn(cell.current_state, pos)
-        elif self._type == 'rook':
-            return self._get_rook(cell.current_state, pos)
-        elif self._type == 'knight':
-            return self._get_knight(cell.current_state, pos)
+        return self._moves(cell.current_state, pos)
 
     def get_available_takes(self, pos, cell):
         """
@@ -314,18 +416,7 @@ class Figure:
         :param cell: об'єкт класу Position
         :return: список кортежів (х, у)
         """
-        if self._type == 'king':
-            return self._get_king_takes(cell.current_state, pos)
-        elif self._type == 'queen':
-            return self._get_queen_takes(cell.current_state, pos)
-        elif self._type == 'bishop':
-            return self._get_bishop_takes(cell.current_state, pos)
-        elif self._type == 'pawn':
-            return self._get_pawn_takes(cell.current_state, pos)
-        elif self._type == 'rook':
-            return self._get_rook_takes(cell.current_state, pos)
-        elif self._type == 'knight':
-            return self._get_knight_takes(cell.current_state, pos)
+        return self._takes(cell.current_state, pos)
 
 
 class Position:
@@ -336,24 +427,108 @@ class Position:
         add_figure(pos, figure) -> None - додає фігуру на дошку
         take_figure(pos) -> Figure - забирає фігуру з дошки
         get_figure(pos) -> Figure - повертає фігуру з дошки, але не видаляє її
-        get_figure_by_color(color) -> list - список фігур певного кольору
-        get_figures_by_type_color(figure_type, color) -> list - список фігур певного типу і кольору
+        get_figures_by_color(color) -> словник - фігури певного кольору
+        get_figures_by_type_color(figure_type, color) -> словник - фігури певного типу і кольору
+        get_king_pos(color) -> кортеж - позиція короля певного кольору
+        get_key(color) -> int - хеш Зобріста позиції разом зі стороною, що ходить
+        get_score(color) -> int - оцінка позиції (матеріал і положення фігур) з боку color
         create_start_position() -> None - розставляє фігури стандартним чином
+        set_fen(fen) -> str - розставляє фігури за записом FEN, повертає сторону, яка ходить
+        get_fen(color) -> str - запис позиції у форматі FEN
+        get_bytes() -> bytes - позиція, запакована у 32 байти
+        set_bytes(data) -> None - розставляє фігури за 32 байтами з get_bytes
+        get_symmetric(symmetry) -> Position - дзеркальна позиція (див. SYMMETRIES)
+        get_canonical(color) -> (bytes, int) - ключ, спільний для симетричних позицій, і симетрія до нього
+        is_attacked_by(cell, color) -> bool - чи атакує поле cell хоча б одна фігура кольору color
         is_under_attack(cell, color) -> bool - чи знаходиться поле cell під атакою
         move(pos1, pos2, transform) -> bool - реалізує хід (повертає контрольний флаг)
+        make_move(pos1, pos2, transform) -> bool - реалізує хід із запам'ятовуванням для відкату
+        unmake_move() -> None - скасовує останній хід, зроблений make_move
+        make_turn(turn) -> bool - make_move для ходу у шаховій нотації
         _get_all_moves_color(color) -> словник - повертає всі можливі ходи для певної сторони
+        get_legal_moves(color) -> словник - повертає всі допустимі ходи для певної сторони
         check_mate(color) -> bool - перевіряє наявність мату для певної сторони
-        _create_all_possible_desks(right_moves, pre_moves) -> словник - повертає всі можливі ситуації
-        find_checkmates(color, deep_step)
+        _get_turns(right_moves) -> генератор - всі ходи разом з їх записом у шаховій нотації
+        get_legal_turns(color) -> генератор - ходи, після яких король не під атакою
+        perft(color, depth) -> int - к-ть позицій на глибині depth
+        divide(color, depth) -> словник - perft для кожного першого ходу
+        iter_checkmates(color, deep_step) -> генератор - мати у порядку зростання к-ті ходів
+        find_checkmates(color, deep_step) -> list - список всіх матів з iter_checkmates
+        find_forced_mate(color, max_moves) -> кортеж - головна лінія найкоротшого примусового мату
+        prove_mate(color, max_moves) -> кортеж - головна лінія примусового мату, пошук числами доказу
+
+    Поряд з current_state підтримуються словники фігур кожного кольору і кожного
+    типу та кольору, тому current_state слід змінювати лише методами класу.
     """
     def __init__(self, current_state=None):
-        self.current_state = current_state.copy() if current_state else {}
+        self._clear()
+        if current_state:
+            for pos, figure in current_state.items():
+                self._place(pos, figure)
+
+    def _clear(self):
+        self.current_state = {}
+        self._undo = []     # стек відкатів для make_move/unmake_move
+        self.hash = 0       # хеш Зобріста, оновлюється при кожній зміні дошки
+        self.score = 0      # оцінка з боку білих (див. модуль evaluation), оновлюється так само
+        self._pieces = {'w': {}, 'b': {}}       # {колір: {позиція: фігура}}
+        self._figures = {(t, c): {} for t in FIGURE_TYPES for c in ('w', 'b')}  # {(тип, колір): {позиція: фігура}}
+
+    def _place(self, pos, figure):
+        """
+        ставить фігуру на вільне поле, оновлюючи словники фігур, хеш і оцінку
+
+        :param pos: кортеж (х, у)
+        :param figure: об'єкт класу Figure
+        :return: None
+        """
+        key = (figure.get_type(), figure.get_color())
+        self.current_state[pos] = figure
+        self._pieces[key[1]][pos] = figure
+        self._figures[key][pos] = figure
+        self.hash ^= ZOBRIST_KEYS[key][pos]
+        self.score += SCORES[key][pos]
+
+    def _lift(self, pos):
+        """
+        знімає фігуру з поля, оновлюючи словники фігур, хеш і оцінку
+
+        :param pos: кортеж (х, у)
+        :return: об'єкт класу Figure
+        """
+        figure = self.current_state.pop(pos)
+        key = (figure.get_type(), figure.get_color())
+        del self._pieces[key[1]][pos]
+        del self._figures[key][pos]
+        self.hash ^= ZOBRIST_KEYS[key][pos]
+        self.score -= SCORES[key][pos]
+        return figure
+
+    def get_key(self, color):
+        """
+        хеш Зобріста позиції з урахуванням сторони, яка ходить
+
+        :param color: колір сторони, яка ходить
+        :return: ціле число
+        """
+        return self.hash ^ ZOBRIST_BLACK if color == 'b' else self.hash
+
+    def get_score(self, color):
+        """
+        оцінка позиції (матеріал і положення фігур) у сантипішаках
+
+        :param color: колір сторони, з боку якої оцінюється позиція
+        :return: ціле число (плюс - краще стороні color)
+        """
+        return self.score if color == 'w' else -self.score
 
     def add_figure(self, pos, figure):
         if pos[0] not in range(8) or pos[1] not in range(8):
             raise ErrorGetOutOfDesk
         else:
-            self.current_state[pos] = figure
+            if pos in self.current_state:
+                self._lift(pos)
+            self._place(pos, figure)
 
     def create_start_position(self):
         """
@@ -361,7 +536,7 @@ class Position:
 
         :return: None
         """
-        self.current_state = {}
+        self._clear()
 
         # pawns
         for j in range(8):
@@ -390,21 +565,176 @@ class Position:
         self.add_figure(ch2py('d8'), Figure('queen', 'b'))
         self.add_figure(ch2py('e8'), Figure('king', 'b'))
 
+    def set_fen(self, fen):
+        """
+        метод, який розставляє фігури за записом FEN
+
+        рокіровки і взяття на проході не підтримуються, тому відповідні поля ігноруються
+        :param fen: рядок FEN, напр. START_FEN (достатньо розстановки і сторони, яка ходить)
+        :return: колір сторони, яка ходить ('w' або 'b')
+        """
+        fields = fen.split()
+        rows = fields[0].split('/') if fields else []
+        color = fields[1] if len(fields) > 1 else 'w'
+        if len(rows) != 8 or color not in ('w', 'b'):
+            raise ErrorBadFormat
+
+        self._clear()
+        for i, row in enumerate(rows):
+            y, x = 7 - i, 0
+            for letter in row:
+                if letter.isdigit():
+                    x += int(letter)
+                elif letter.lower() in LETTER_FIGURES and x < 8:
+                    figure_color = 'w' if letter.isupper() else 'b'
+                    self._place((x, y), Figure(LETTER_FIGURES[letter.lower()], figure_color))
+                    x += 1
+                else:
+                    raise ErrorBadFormat
+            if x != 8:
+                raise ErrorBadFormat
+        return color
+
+    def get_fen(self, color='w'):
+        """
+        метод, який повертає запис позиції у форматі FEN
+
+        :param color: колір сторони, яка ходить
+        :return: рядок FEN
+        """
+        rows = []
+        for y in range(7, -1, -1):
+            row, empty = '', 0
+            for x in range(8):
+                figure = self.current_state.get((x, y), None)
+                if figure is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                letter = FIGURE_LETTERS[figure.get_type()]
+                row += letter.upper() if figure.get_color() == 'w' else letter
+            rows.append(row + (str(empty) if empty else ''))
+        return '/'.join(rows) + ' ' + color + ' - - 0 1'
+
+    def get_bytes(self):
+        """
+        метод, який пакує позицію у 32 байти: по 4 біти на поле a1, b1, ..., h8
+
+        код поля: 0 - порожнє, 1..6 - біла фігура (номер у FIGURE_TYPES + 1),
+        9..14 - чорна фігура (те саме + 8)
+        :return: bytes довжиною 32
+        """
+        codes = []
+        for y in range(8):
+            for x in range(8):
+                figure = self.current_state.get((x, y), None)
+                if figure is None:
+                    codes.append(0)
+                else:
+                    code = FIGURE_TYPES.index(figure.get_type()) + 1
+                    codes.append(code if figure.get_color() == 'w' else code | 8)
+        return bytes(codes[i] | codes[i + 1] << 4 for i in range(0, 64, 2))
+
+    def set_bytes(self, data):
+        """
+        метод, який розставляє фігури за 32 байтами, отриманими з get_bytes
+
+        :param data: bytes довжиною 32
+        :return: None
+        """
+        if len(data) != 32:
+            raise ErrorBadFormat
+        self._clear()
+        # фігури ставляться в тому ж порядку, що і в set_fen (від 8-ї горизонталі до 1-ї),
+        # щоб пошук перебирав ходи однаково, звідки б не прийшла позиція
+        for y in range(7, -1, -1):
+            for x in range(8):
+                byte = data[4 * y + (x >> 1)]
+                code = byte >> 4 if x & 1 else byte & 15
+                if not code:
+                    continue
+                if code & 7 not in range(1, 7):
+                    raise ErrorBadFormat
+                color = 'b' if code & 8 else 'w'
+                self._place((x, y), Figure(FIGURE_TYPES[(code & 7) - 1], color))
+
+    def get_symmetric(self, symmetry):
+        """
+        метод, який повертає симетричну позицію (сторона, яка ходить, змінюється
+        при FLIP_COLORS)
+
+        :param symmetry: одна з SYMMETRIES
+        :return: новий об'єкт класу Position
+        """
+        mask = _SYMMETRY_MASKS[symmetry]
+        position = Position()
+        for pos, figure in self.current_state.items():
+            color = figure.get_color()
+            if symmetry & FLIP_COLORS:
+                color = 'b' if color == 'w' else 'w'
+            position._place(SQUARE_COORDS[SQUARE_INDEX[pos] ^ mask], Figure(figure.get_type(), color))
+        return position
+
+    def get_canonical(self, color):
+        """
+        метод, який повертає ключ позиції, однаковий для всіх симетричних позицій:
+        найменший з записів get_bytes + сторона, яка ходить, серед SYMMETRIES
+
+        розв'язок канонічної позиції переноситься на цю через transform_line(line, symmetry)
+        Ключ використовують лише кеші цілих задач (batch, shared, service): таблиці
+        транспозицій пошуків матів лишаються на get_key, бо всередині одного дерева дзеркальні
+        позиції майже не трапляються (до 5% позицій на 3 півходи і лише від симетричного
+        кореня), а get_canonical у сотні разів дорожчий за get_key
+        :param color: колір сторони, яка ходить
+        :return: (ключ - bytes довжиною 33, симетрія, яка переводить цю позицію в канонічну)
+        """
+        codes = [0] * 64
+        for pos, figure in self.current_state.items():
+            code = FIGURE_TYPES.index(figure.get_type()) + 1
+            codes[SQUARE_INDEX[pos]] = code if figure.get_color() == 'w' else code | 8
+        best = None
+        for symmetry in SYMMETRIES:
+            mask = _SYMMETRY_MASKS[symmetry]
+            side = color
+            moved = [codes[sq ^ mask] for sq in range(64)]
+            if symmetry & FLIP_COLORS:
+                side = 'b' if color == 'w' else 'w'
+                moved = [code ^ 8 if code else 0 for code in moved]
+            key = bytes(moved[i] | moved[i + 1] << 4 for i in range(0, 64, 2)) + side.encode()
+            if best is None or key < best[0]:
+                best = (key, symmetry)
+        return best
+
     def take_figure(self, pos):
-        fig = self.current_state.get(pos, -1)
-        return None if fig == -1 else self.current_state.pop(pos)
+        return self._lift(pos) if pos in self.current_state else None
 
     def get_figure(self, pos):
         return self.current_state.get(pos, None)
 
     def get_figures_by_color(self, color):
-        res = {p: f for p, f in self.current_state.items() if f.get_color() == color}
-        return res
+        """
+        словник {позиція: фігура} для фігур кольору color (не змінювати!)
+        """
+        return self._pieces[color]
 
     def get_figures_by_type_color(self, figure_type, color):
-        res = {p: f for p, f in self.current_state.items()
-               if f.get_color() == color and f.get_type() == figure_type}
-        return res
+        """
+        словник {позиція: фігура} для фігур типу figure_type кольору color (не змінювати!)
+        """
+        return self._figures[(figure_type, color)]
+
+    def get_king_pos(self, color):
+        """
+        позиція короля кольору color
+
+        :param color: колір
+        :return: кортеж (х, у) або None, якщо короля немає
+        """
+        for pos in self._figures[('king', color)]:
+            return pos
+        return None
 
     def move(self, pos1, pos2, transform2='queen'):
         """
@@ -421,22 +751,111 @@ class Position:
             return False
 
         if figure is not None:     # якщо ні, то перевіряємо, чи фігура, яка ходить - пішак
+            if mb_king is not None:
+                self._lift(pos2)
+            self._lift(pos1)
             if figure.is_transform(pos1):   # якщо вона на позиції, після якої може перетворитись
-                self.current_state.pop(pos1)
-                self.current_state[pos2] = Figure(transform2, figure.get_color())
+                self._place(pos2, Figure(transform2, figure.get_color()))
             else:
-                self.current_state[pos2] = self.current_state.pop(pos1)
+                self._place(pos2, figure)
         return True
 
+    def make_move(self, pos1, pos2, transform2='queen'):
+        """
+        функція, яка реалізує хід фігури на місці, запам'ятовуючи все необхідне
+        (фігуру, що ходила, з'їдену фігуру, трансформацію пішака) у стеку відкатів
+
+        кожен виклик make_move має бути скасований рівно одним викликом unmake_move
+        :param pos1: кортеж (х, у) - стартова позиція
+        :param pos2: кортеж (х, у) - кінцева позиція
+        :param transform2: тип фігури, в яку трансформується пішак
+        :return: Король живий - True, інакше - False (тоді хід не робиться)
+        """
+        figure = self.current_state.get(pos1, None)
+        captured = self.current_state.get(pos2, None)
+        if captured and captured.get_type() == 'king':
+            self._undo.append(None)
+            return False
+        if figure is None:
+            self._undo.append(None)
+            return True
+
+        transform = figure.is_transform(pos1)
+        self._undo.append((pos1, pos2, figure, captured, transform))
+        if captured is not None:
+            self._lift(pos2)
+        self._lift(pos1)
+        self._place(pos2, Figure(transform2, figure.get_color()) if transform else figure)
+        return True
+
+    def unmake_move(self):
+        """
+        функція, яка скасовує останній хід, зроблений make_move
+
+        :return: None
+        """
+        record = self._undo.pop()
+        if record is None:      # хід нічого не змінив
+            return
+        pos1, pos2, figure, captured, transform = record
+        self._lift(pos2)
+        self._place(pos1, figure)    # для трансформації повертається саме пішак
+        if captured is not None:
+            self._place(pos2, captured)
+
+    def make_turn(self, turn):
+        """
+        make_move для ходу у шаховій нотації
+
+        :param turn: кортеж (start, end) або (start, end, transform), напр. ('e2', 'e4')
+        :return: Король живий - True, інакше - False
+        """
+        transform = turn[2] if len(turn) == 3 else 'queen'
+        return self.make_move(ch2py(turn[0]), ch2py(turn[1]), transform)
+
+    def is_attacked_by(self, cell, color):
+        """
+        функція, яка перевіряє, чи атакує поле cell хоча б одна фігура кольору color
+
+        фігури шукаються від самого поля за таблицями з модуля attacks, тому
+        перевірка зупиняється на першому ж знайденому нападнику
+        :param cell: кортеж (х, у)
+        :param color: колір нападників
+        :return: bool
+        """
+        state = self.current_state
+        for pos in KNIGHT_MOVES[cell]:
+            figure = state.get(pos, None)
+            if figure is not None and figure.get_color() == color and figure.get_type() == 'knight':
+                return True
+        for pos in PAWN_ATTACKERS[color][cell]:
+            figure = state.get(pos, None)
+            if figure is not None and figure.get_color() == color and figure.get_type() == 'pawn':
+                return True
+        for pos in KING_MOVES[cell]:
+            figure = state.get(pos, None)
+            if figure is not None and figure.get_color() == color and figure.get_type() == 'king':
+                return True
+        for rays, types in ((ROOK_RAYS, ('rook', 'queen')), (BISHOP_RAYS, ('bishop', 'queen'))):
+            for ray in rays[cell]:
+                for pos in ray:
+                    figure = state.get(pos, None)
+                    if figure is None:
+                        continue
+                    if figure.get_color() == color and figure.get_type() in types:
+                        return True
+                    break       # промінь закритий іншою фігурою
+        return False
+
     def is_under_attack(self, cell, color):
-        rev_color = 'w' if color == 'b' else 'b'
-        # opposite side
-        side = self.get_figures_by_color(rev_color)
-        moves = []
-        for pos, fig in side.items():
-            moves += fig.get_available_takes(pos, self)
-        # if in all possible moves
-        return cell in moves
+        """
+        функція, яка перевіряє, чи атакує поле cell суперник сторони color
+
+        :param cell: кортеж (х, у)
+        :param color: колір сторони, для якої перевіряється поле
+        :return: bool
+        """
+        return self.is_attacked_by(cell, 'w' if color == 'b' else 'b')
 
     def _get_all_moves_color(self, color):
         """
@@ -445,17 +864,81 @@ class Position:
         :param color: колір сторони
         :return: словник  {key=позиція фігури: value=список можливих ходів}
         """
+        king_pos = self.get_king_pos(color)     # позиція короля відома без перебору дошки
+        if king_pos is None:
+            raise ErrorNoKing
         side = self.get_figures_by_color(color)  # словник всіх фігур даного кольору
-        king_pos = None
         moves = {}
         for pos, fig in side.items():  # створюємо словник можливих ходів для всіх фігур даного кольору
-            if fig.get_type() == 'king':  # додатково запам'ятовуємо позицію короля
-                king_pos = pos
             moves[pos] = fig.get_available_takes(pos, self)
             moves[pos] += fig.get_available_moves(pos, self)
+        return king_pos, moves
+
+    def get_legal_moves(self, color):
+        """
+        функція пошуку всіх допустимих ходів для однієї сторони за один прохід
+
+        спочатку від короля один раз знаходяться фігури, які дають шах (і поля, ходом на які
+        від шаху можна закритись), та зв'язані фігури (і лінії, вздовж яких вони можуть ходити).
+        Після цього кожен можливий хід перевіряється лише за цими множинами, без копіювання
+        дошки; ходи короля перевіряються на атаку поля, на яке він іде
+        :param color: колір сторони
+        :return: позиція короля, чи є шах, словник {key=позиція фігури: value=список допустимих ходів}
+        """
+        king_pos = self.get_king_pos(color)
         if king_pos is None:
             raise ErrorNoKing
-        return king_pos, moves
+        rev_color = 'w' if color == 'b' else 'b'
+        state = self.current_state
+
+        checkers = 0        # к-ть фігур, які дають шах
+        block = None        # поля, ходом на які можна закритись від шаху або з'їсти фігуру, що його дає
+        pins = {}           # {позиція зв'язаної фігури: поля лінії зв'язки}
+        for steps, figure_type in ((KNIGHT_MOVES[king_pos], 'knight'),
+                                   (PAWN_ATTACKERS[rev_color][king_pos], 'pawn')):
+            for pos in steps:
+                figure = state.get(pos, None)
+                if figure is not None and figure.get_color() == rev_color and figure.get_type() == figure_type:
+                    checkers += 1
+                    block = {pos}
+        for rays, types in ((ROOK_RAYS, ('rook', 'queen')), (BISHOP_RAYS, ('bishop', 'queen'))):
+            for ray in rays[king_pos]:
+                own = None      # перша своя фігура на промені
+                for i, pos in enumerate(ray):
+                    figure = state.get(pos, None)
+                    if figure is None:
+                        continue
+                    if figure.get_color() == color:
+                        if own is not None:
+                            break       # дві свої фігури - зв'язки немає
+                        own = pos
+                        continue
+                    if figure.get_type() in types:
+                        if own is None:
+                            checkers += 1
+                            block = set(ray[:i + 1])
+                        else:
+                            pins[own] = set(ray[:i + 1])
+                    break
+
+        moves = {}
+        for pos, figure in self.get_figures_by_color(color).items():
+            targets = figure.get_available_takes(pos, self) + figure.get_available_moves(pos, self)
+            if pos == king_pos:
+                # короля тимчасово знімаємо, щоб він не закривав від атаки поля позаду себе
+                del state[king_pos]
+                targets = [tmp for tmp in targets if not self.is_attacked_by(tmp, rev_color)]
+                state[king_pos] = figure
+            elif checkers > 1:
+                continue        # від подвійного шаху можна лише піти королем
+            else:
+                if block is not None:
+                    targets = [tmp for tmp in targets if tmp in block]
+                if pos in pins:
+                    targets = [tmp for tmp in targets if tmp in pins[pos]]
+            if targets:
+                moves[pos] = targets
+        return king_pos, checkers > 0, moves
 
     def check_mate(self, color, possible_moves=False):
         """
@@ -464,63 +947,134 @@ class Position:
         :param color: string ('w' or 'b')
         :param possible_moves: bool (флаг чи видавати допустимі ходи)
         :return: if possible_moves:
-                    bool, словник  {key=позиція фігури: value=список можливих ходів},
+                    bool, словник  {key=позиція фігури: value=список допустимих ходів},
                  else:
                     bool
         """
-        checkmate = True
-        king_pos, moves = self._get_all_moves_color(color)    # отримуємо позицію короля і всі можливі ходи
-        right_moves = defaultdict(list)        # словник з допустимими ходами
-
-        if king_pos and self.is_under_attack(king_pos, color):   # якщо наявний шаг
-            for pos1, mb_pos in moves.items():                # проходимо по всіх можливих ходах
-                for pos2 in mb_pos:
-                    tmp_king_pos = king_pos                  # якщо ходить король, то додатково запам'ятовуємо
-                    if pos1 == king_pos:                     # позицію короля
-                        tmp_king_pos = pos2
-                    tmp_desk = Position(self.current_state)   # створюємо тимчасову дошку
-                    tmp_desk.move(pos1, pos2)                  # робимо хід на цій дошці
-                    if not tmp_desk.is_under_attack(tmp_king_pos, color):  # якщо після ходу королю нічого не загрошує
-                        checkmate = False                                    # то ігра продовжується
-                        right_moves[pos1].append(pos2)                   # записуємо цей хід до словника
-        elif not king_pos:
-            raise ErrorNoKing   # якщо короля не існує то видає помилку
-        else:
-            right_moves = moves.copy()     # якщо королю нічого не загрожує, то ігра продовжується
-            checkmate = False              # і всі ходи - допустимі
+        king_pos, check, right_moves = self.get_legal_moves(color)
+        checkmate = check and not right_moves      # шах, від якого нема куди подітись
         return checkmate, right_moves if possible_moves else checkmate
 
-    def _create_all_possible_desks(self, right_moves, pre_moves):
+    def _get_turns(self, right_moves):
         """
-        функція, яка для даної позиції створює всі можливі
+        генератор, який для даної позиції перебирає всі допустимі ходи
 
+        для пішака, що трансформується, хід повторюється для кожної можливої фігури
         :param right_moves: словник з допустимими ходами
-        :param pre_moves: кортеж з кортежів - попередні ходи
-        :return: словник {key=попередні ходи: value=об'єкт Position}
+        :return: кортежі (pos1, pos2, transform, turn), де turn - хід у шаховій нотації
         """
-        all_desks = []
+        names = COORD_NAMES
         for pos1, mb_pos in right_moves.items():    # проходимо по всіх допустимих ходах
             figure = self.current_state[pos1]
+            name1 = names[pos1]
             for pos2 in mb_pos:
                 if not figure.is_transform(pos1):     # якщо фігура не пішак
-                    tmp_desk = Position(self.current_state)      # створюємо новий об'єкт Position
-                    king_alive = tmp_desk.move(pos1, pos2)       # робимо хід
-                    if king_alive:                            # якщо король залишився живий
-                        all_desks.append((*pre_moves, (ch2ch(pos1), ch2ch(pos2))))  # запам'ятовуємо хід
-                    else:
-                        return {}           # якщо короля з'їли, то дана ситуація - некоректна
+                    yield pos1, pos2, 'queen', (name1, names[pos2])
                 else:
                     for transform in ('queen', 'rook', 'bishop', 'knight'):  # якщо фігура - пішак, то додатково
-                        tmp_desk = Position(self.current_state)          # проходимо по всіх можливих трансформаціях
+                        yield pos1, pos2, transform, (name1, names[pos2], transform)  # всі трансформації
+
+    def _get_ordered_turns(self, color, right_moves, checks_only=False):
+        """
+        допустимі ходи, впорядковані для пошуку мату: спочатку ходи з шахом, потім
+        взяття (найцінніша фігура суперника найдешевшою своєю - MVV-LVA), потім тихі ходи
+
+        :param color: колір сторони, яка ходить
+        :param right_moves: словник з допустимими ходами
+        :param checks_only: залишити лише ходи з шахом
+        :return: список кортежів (pos1, pos2, transform, turn), як у _get_turns
+        """
+        enemy_king = self.get_king_pos('w' if color == 'b' else 'b')
+        scored = []
+        for i, item in enumerate(self._get_turns(right_moves)):
+            pos1, pos2, transform = item[:3]
+            victim = self.current_state.get(pos2, None)
+            attacker = self.current_state[pos1]
+            self.make_move(pos1, pos2, transform)
+            check = enemy_king is not None and self.is_attacked_by(enemy_king, color)
+            self.unmake_move()
+            if checks_only and not check:
+                continue
+            if victim is None:
+                score = (0 if check else 2, 0, 0, i)
+            else:
+                score = (0 if check else 1, -FIGURE_VALUES[victim.get_type()],
+                         FIGURE_VALUES[attacker.get_type()], i)
+            scored.append((score, item))
+        scored.sort(key=lambda pair: pair[0])
+        return [item for score, item in scored]
+
+    def _get_search_turns(self, color, right_moves, ordered, checks_only):
+        """
+        ходи для пошуку: без впорядкування, впорядковані або лише з шахом
+
+        :param checks_only: чи залишати лише ходи з шахом для цієї сторони
+        :return: ітератор кортежів (pos1, pos2, transform, turn)
+        """
+        if ordered or checks_only:
+            return self._get_ordered_turns(color, right_moves, checks_only)
+        return self._get_turns(right_moves)
+
+    def _can_take_king(self, right_moves):
+        """
+        чи можна одним з допустимих ходів з'їсти короля (тоді ситуація - некоректна)
+
+        :param right_moves: словник з допустимими ходами
+        :return: bool
+        """
+        for mb_pos in right_moves.values():
+            for pos2 in mb_pos:
+                figure = self.current_state.get(pos2, None)
+                if figure is not None and figure.get_type() == 'king':
+                    return True
+        return False
+
+    def get_legal_turns(self, color):
+        """
+        генератор ходів сторони color, після яких її король не під атакою
+
+        :param color: колір сторони, яка ходить
+        :return: кортежі (pos1, pos2, transform, turn), як у _get_turns
+        """
+        return self._get_turns(self.get_legal_moves(color)[2])
+
+    def perft(self, color, depth):
+        """
+        к-ть позицій, до яких ведуть всі послідовності з depth допустимих ходів
 
-                        king_alive = tmp_desk.move(pos1, pos2, transform)   # аналогічно робимо хід
-                        new_desk = (*pre_moves, (ch2ch(pos1), ch2ch(pos2), transform))
-                        if king_alive and new_desk not in all_desks:     # запам'ятовуємо хід, якщо його не було
-                            all_desks.append(new_desk)
-                        elif not king_alive:
-                            return {}        # якщо короля з'їли, то дана ситуація - некоректна
+        використовується для перевірки генератора ходів і вимірювання його швидкості
+        :param color: колір сторони, яка ходить першою
+        :param depth: ціле число - глибина
+        :return: ціле число
+        """
+        if not depth:
+            return 1
+        alter_color = 'b' if color == 'w' else 'w'
+        turns = list(self.get_legal_turns(color))
+        if depth == 1:
+            return len(turns)
+        nodes = 0
+        for pos1, pos2, transform, turn in turns:
+            self.make_move(pos1, pos2, transform)
+            nodes += self.perft(alter_color, depth - 1)
+            self.unmake_move()
+        return nodes
+
+    def divide(self, color, depth):
+        """
+        perft, розбитий за першим ходом
 
-        return all_desks
+        :param color: колір сторони, яка ходить першою
+        :param depth: ціле число - глибина (не менше 1)
+        :return: словник {хід у шаховій нотації: к-ть позицій}
+        """
+        alter_color = 'b' if color == 'w' else 'w'
+        res = {}
+        for pos1, pos2, transform, turn in list(self.get_legal_turns(color)):
+            self.make_move(pos1, pos2, transform)
+            res[turn] = self.perft(alter_color, depth - 1)
+            self.unmake_move()
+        return res
 
     def _do_moves(self, moves):
         """
@@ -536,44 +1090,254 @@ class Position:
             else:
                 self.move(ch2py(turn[0]), ch2py(turn[1]), transform2=turn[2])
 
-    def find_checkmates(self, color, deep_step):
+    def _iter_checkmates(self, color, depth, pre_moves, table, budget=None, ordered=False, attacker=None,
+                         stats=None):
         """
-        функція пошуку усіх можливих шах і матів у межах даної к-ті кроків
+        генератор матів рівно через depth ходів від поточної позиції (пошук в глибину)
+
+        усі ходи робляться на цій же дошці через make_move і скасовуються unmake_move,
+        тому пам'ять пропорційна лише глибині пошуку. Вердикт для позиції (продовження
+        до мату або їх відсутність) запам'ятовується у таблиці транспозицій, тому позиція,
+        до якої прийшли іншим порядком ходів, повторно не перебирається
+        :param color: колір сторони, яка ходить
+        :param depth: к-ть ходів, що залишилась до перевірки на мат
+        :param pre_moves: кортеж з кортежів - попередні ходи
+        :param table: об'єкт TranspositionTable
+        :param budget: об'єкт SearchBudget або None
+        :param ordered: чи впорядковувати ходи (див. _get_ordered_turns)
+        :param attacker: колір сторони, для якої розглядаються лише ходи з шахом (None - для жодної)
+        :param stats: об'єкт SearchStats або None
+        :return: кортежі ходів, які ведуть до мату
+        """
+        if budget is not None:
+            budget.spend()
+        n = len(pre_moves)
+        if stats is not None:
+            stats.node(n)
+        key = self.get_key(color)
+        lines = table.probe(key, depth)
+        if lines is not None:       # позиція вже була перевірена
+            if stats is not None:
+                stats.tt_hit(n)
+            for line in lines:
+                yield (*pre_moves, *line)
+            return
+
+        found = []      # продовження до мату з цієї позиції
+        checkmate, right_moves = self.check_mate(color, possible_moves=True)
+        if stats is not None:
+            stats.moves(n, right_moves)
+        if not depth:
+            if checkmate:
+                found.append(())
+                yield pre_moves
+        elif not checkmate and not self._can_take_king(right_moves):
+            # якщо мат вже був знайдений раніше або ситуація некоректна, то далі не шукаємо
+            alter_color = 'b' if color == 'w' else 'w'
+            for pos1, pos2, transform, turn in self._get_search_turns(color, right_moves, ordered, color == attacker):
+                if stats is not None and not n:
+                    nodes, start = stats.nodes, time.perf_counter()
+                self.make_move(pos1, pos2, transform)
+                try:
+                    for line in self._iter_checkmates(alter_color, depth - 1, (*pre_moves, turn), table, budget,
+                                                      ordered, attacker, stats):
+                        if len(found) <= table.max_lines:
+                            found.append(line[n:])
+                        yield line
+                finally:
+                    self.unmake_move()      # дошка відновлюється навіть якщо генератор закрили
+                if stats is not None and not n:
+                    stats.root_move(turn, depth, stats.nodes - nodes, time.perf_counter() - start)
+        elif stats is not None:
+            stats.cutoff(n)
+        table.store(key, depth, found)
+
+    def iter_checkmates(self, color, deep_step, table=None, budget=None, ordered=False, checks_only=False,
+                        stats=None):
+        """
+        генератор усіх можливих шах і матів у межах даної к-ті кроків
 
-        алгоритм - пошук в ширину: для ситуації створюємо всі можливі ситуації, а потім для
-        кожної з них перевіряємо шах і мат та аналогічно створюємо далі всі можливі ситуації і т.д.
+        алгоритм - пошук в глибину з ітеративним поглибленням: спочатку знаходяться
+        всі мати в 1 хід, потім у 2 ходи і т.д., тому мати видаються впорядкованими
+        за к-тю ходів одразу як знайдені. Під час ітерації дошка змінюється і
+        повертається до початкового стану після завершення (або закриття) генератора.
         :param color: колір сторони, яка ходить першою
         :param deep_step: ціле число - глибина пошуку
-        :return: список з кортежів (кортеж(start, end, transform), кортеж(start, end) ...),
+        :param table: об'єкт TranspositionTable (якщо не вказано - створюється новий)
+        :param budget: об'єкт SearchBudget; коли ліміт вичерпано, генератор кидає ErrorBudget
+        :param ordered: пробувати спочатку шахи, потім взяття за MVV-LVA, потім тихі ходи
+        :param checks_only: сторона color робить лише ходи з шахом (таблицю транспозицій
+                            в цьому режимі не можна ділити з пошуком без нього)
+        :param stats: об'єкт SearchStats, куди записується статистика пошуку
+        :return: кортежі (кортеж(start, end, transform), кортеж(start, end) ...),
                                         де start - стартова позиція
                                         end - кінцева позиція
                                         transform - фігура, в яку перетворився пішак, якщо була така ситуація
         """
+        if table is None:
+            table = TranspositionTable()
+        if self.check_mate(color)[0]:
+            return
+        for depth in range(1, deep_step):
+            if stats is not None:
+                nodes, start = stats.nodes, time.perf_counter()
+            yield from self._iter_checkmates(color, depth, (), table, budget,
+                                             ordered, color if checks_only else None, stats)
+            if stats is not None:
+                stats.iteration(depth, stats.nodes - nodes, time.perf_counter() - start)
+
+    def find_checkmates(self, color, deep_step, table=None, workers=None, split_depth=1,
+                        ordered=False, checks_only=False, stats=None):
+        """
+        функція пошуку усіх можливих шах і матів у межах даної к-ті кроків
+
+        :param color: колір сторони, яка ходить першою
+        :param deep_step: ціле число - глибина пошуку
+        :param table: об'єкт TranspositionTable (якщо не вказано - створюється новий)
+        :param workers: к-ть процесів для паралельного пошуку (див. модуль parallel)
+        :param split_depth: на скількох перших ходах дерево ділиться між процесами
+        :param ordered: див. iter_checkmates (не використовується при workers)
+        :param checks_only: див. iter_checkmates (не використовується при workers)
+        :param stats: див. iter_checkmates (не використовується при workers)
+        :return: список з кортежів - див. iter_checkmates
+        """
+        if workers:
+            from parallel import find_checkmates_parallel
+            return find_checkmates_parallel(self, color, deep_step, workers, split_depth)
+        return list(self.iter_checkmates(color, deep_step, table, ordered=ordered, checks_only=checks_only,
+                                         stats=stats))
+
+    def _find_forced_mate(self, color, moves, table, budget, ordered=True, checks_only=False, stats=None, ply=0,
+                          tablebase=None):
+        """
+        чи може сторона color поставити мат не більше ніж за moves своїх ходів,
+        як би не захищався суперник
+
+        :param color: колір сторони, яка ставить мат (і ходить зараз)
+        :param moves: максимальна к-ть ходів сторони color
+        :param table: об'єкт TranspositionTable
+        :param budget: об'єкт SearchBudget або None
+        :param ordered: чи впорядковувати ходи (див. _get_ordered_turns)
+        :param checks_only: сторона color робить лише ходи з шахом
+        :param stats: об'єкт SearchStats або None
+        :param ply: к-ть півходів від кореня
+        :param tablebase: об'єкт tablebase.Tablebase або None
+        :return: головна лінія (найдовший захист) - кортеж ходів, або None
+        """
+        if budget is not None:
+            budget.spend()
+        if stats is not None:
+            stats.node(ply)
+        if tablebase is not None:
+            result = tablebase.probe(self, color)
+            if result is not None:      # відповідь з таблиці ендшпілю
+                wdl, plies = result
+                return tablebase.best_line(self, color) if wdl == 1 and plies < 2 * moves else None
+        key = self.get_key(color)
+        cached = table.probe(key, moves)
+        if cached is not None:
+            if stats is not None:
+                stats.tt_hit(ply)
+            return cached[0] if cached else None
+
         alter_color = 'b' if color == 'w' else 'w'
-        all_desks = ['']   # словник, який містить в собі усі ситуації одного покоління
-        all_checkmates = []
-        checkmate, right_moves = self.check_mate(color, possible_moves=True)
-        if not checkmate:
-            for step in range(deep_step):     # якщо на першому кроці відсутній шах і мат
-                tmp_all_desks = []     # наступне покоління
-
-                # проходимо по всіх ситуаціях step-го покоління (кожна ситуація описана послідовністю ходів)
-                for pre in all_desks:      # кожну ситуацію перевіряємо на шах і мат
-                    tmp_desk = Position(self.current_state)  # для цього створюємо тимчасову дошку
-                    tmp_desk._do_moves(pre)                 # робимо на ній ходи
-                    tmp_checkmate, tmp_right_moves = tmp_desk.check_mate(color, possible_moves=True)
-                    if not tmp_checkmate and step != deep_step - 1:     # якщо все норм, то створюємо можливі ситуації
-                        tmp_all_desks += tmp_desk._create_all_possible_desks(tmp_right_moves, pre)
-                    elif not tmp_checkmate:
-                        continue     # якщо вже останнє покоління, то ситуації нафіг нада
-                    elif tmp_checkmate:                             # якщо шах і мат - додаємо до словника
-                        all_checkmates.append(pre)
-
-                all_desks = tmp_all_desks      # забуваємо теперішнє покоління і переходим до наступного
-                n = len(all_desks)       # <optional> - виводимо інфу про к-ть ситуацій в поколінні
-                print(n)
-                alter_color, color = color, alter_color   # тепер ходить інша сторона
-        return all_checkmates
+        result = None
+        right_moves = self.get_legal_moves(color)[2]
+        if stats is not None:
+            stats.moves(ply, right_moves)
+        for pos1, pos2, transform, turn in self._get_search_turns(color, right_moves, ordered, checks_only):
+            if stats is not None and not ply:
+                nodes, start = stats.nodes, time.perf_counter()
+            self.make_move(pos1, pos2, transform)
+            try:
+                if budget is not None:
+                    budget.spend()
+                checkmate, replies = self.check_mate(alter_color, possible_moves=True)
+                if stats is not None:
+                    stats.node(ply + 1)
+                    stats.moves(ply + 1, replies)
+                if checkmate:
+                    line = (turn,)
+                elif moves == 1 or not replies:
+                    line = None         # мату в один хід немає або пат
+                else:
+                    best = None         # найдовший захист
+                    for rpos1, rpos2, rtransform, reply in self._get_search_turns(alter_color, replies,
+                                                                                   ordered, False):
+                        self.make_move(rpos1, rpos2, rtransform)
+                        try:
+                            sub = self._find_forced_mate(color, moves - 1, table, budget, ordered, checks_only,
+                                                         stats, ply + 2, tablebase)
+                        finally:
+                            self.unmake_move()
+                        if sub is None:
+                            best = None     # від мату можна захиститись
+                            if stats is not None:
+                                stats.cutoff(ply + 1)
+                            break
+                        if best is None or len(sub) > len(best):
+                            best = (reply, *sub)
+                    line = (turn, *best) if best else None
+            finally:
+                self.unmake_move()
+            if stats is not None and not ply:
+                stats.root_move(turn, moves, stats.nodes - nodes, time.perf_counter() - start)
+            if line is not None:
+                result = line
+                if stats is not None:
+                    stats.cutoff(ply)
+                break
+        table.store(key, moves, (result,) if result else ())
+        return result
+
+    def find_forced_mate(self, color, max_moves, table=None, budget=None, ordered=True, checks_only=False,
+                         stats=None, tablebase=None):
+        """
+        функція пошуку найкоротшого примусового мату (задача "мат у N ходів")
+
+        на відміну від find_checkmates, мат має ставитись при будь-якому захисті суперника;
+        к-ть ходів перебирається від 1 до max_moves
+        :param color: колір сторони, яка ставить мат (і ходить першою)
+        :param max_moves: максимальна к-ть ходів сторони color
+        :param table: об'єкт TranspositionTable (якщо не вказано - створюється новий)
+        :param budget: об'єкт SearchBudget; коли ліміт вичерпано, кидається ErrorBudget
+        :param ordered: пробувати спочатку шахи, потім взяття за MVV-LVA, потім тихі ходи
+        :param checks_only: сторона color робить лише ходи з шахом (швидко, але тихі
+                            ходи перед матом пропускаються; таблицю транспозицій
+                            в цьому режимі не можна ділити з пошуком без нього)
+        :param stats: об'єкт SearchStats, куди записується статистика пошуку
+        :param tablebase: об'єкт tablebase.Tablebase; позиції, які є в таблицях ендшпілю
+                          (зокрема після взяттів), не перебираються
+        :return: кортеж ходів (start, end[, transform]) головної лінії або None, якщо мату немає
+        """
+        if table is None:
+            table = TranspositionTable()
+        for moves in range(1, max_moves + 1):
+            if stats is not None:
+                nodes, start = stats.nodes, time.perf_counter()
+            line = self._find_forced_mate(color, moves, table, budget, ordered, checks_only, stats, 0, tablebase)
+            if stats is not None:
+                stats.iteration(moves, stats.nodes - nodes, time.perf_counter() - start)
+            if line is not None:
+                return line
+        return None
+
+    def prove_mate(self, color, max_moves, table=None, budget=None, stats=None):
+        """
+        функція пошуку примусового мату числами доказу (df-pn, див. модуль proof)
+
+        на відміну від find_forced_mate, дерево не перебирається на повну ширину,
+        тому мати у 6 і більше ходів з вузькими лініями знаходяться за розумний час;
+        знайдений мат не обов'язково найкоротший
+        :param color: колір сторони, яка ставить мат (і ходить першою)
+        :param max_moves: максимальна к-ть ходів сторони color
+        :param table: об'єкт transposition.ProofTable (якщо не вказано - створюється новий)
+        :param budget: об'єкт SearchBudget; коли ліміт вичерпано, кидається ErrorBudget
+        :param stats: об'єкт SearchStats, куди записується статистика пошуку
+        :return: кортеж ходів (start, end[, transform]) головної лінії або None, якщо мат не знайдено
+        """
+        from proof import prove_mate
+        return prove_mate(self, color, max_moves, table, budget, stats)
 
     def __repr__(self):
         white_side = self.get_figures_by_color('w')
@@ -624,6 +1388,9 @@ if __name__ == "__main__":
     input('press enter to continue')
     DESK2 = Position()
     DESK2.create_start_position()
-    checkmates = DESK2.find_checkmates('w', 5)
-    for i in checkmates:
+    def print_iteration(event, record):
+        if event == 'iteration':
+            print('depth {depth}: {nodes} nodes, {seconds:.3f}s'.format(**record))
+
+    for i in DESK2.iter_checkmates('w', 5, stats=SearchStats(print_iteration)):
         print(i)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Модуль паралельного пошуку матів у кількох процесах
+
+Дерево ходів розбивається на перших split_depth ходах: кожне піддерево,
+яке починається після цих ходів, стає окремим завданням для
+ProcessPoolExecutor. Завдання лежать у спільній черзі, і кожен вільний процес
+забирає наступне, тому нерівні за розміром піддерева самі розподіляються між
+процесами (при split_depth=2 завдань значно більше і розподіл рівніший).
+
+Кожен процес отримує позицію лише один раз (32 байти з Position.get_bytes) і тримає власну
+таблицю транспозицій; завдання - це лише колір і кортеж ходів від кореня.
+Результати об'єднуються в детермінованому порядку: як і у Position.find_checkmates,
+за к-тю ходів, а в межах однієї к-ті ходів - за порядком завдань і, всередині
+завдання, за алфавітом (порядок не залежить від того, який процес виконав завдання
+і що вже було в його таблиці транспозицій).
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+from figures import Position
+from transposition import TranspositionTable
+
+_worker_position = None     # позиція-корінь у процесі-виконавці
+_worker_table = None        # таблиця транспозицій процесу-виконавця
+
+
+def _init_worker(data):
+    global _worker_position, _worker_table
+    _worker_position = Position()
+    _worker_position.set_bytes(data)
+    _worker_table = TranspositionTable()
+
+
+def _search_subtree(color, pre_moves, generations):
+    """
+    Завдання для процесу-виконавця: шукає мати в піддереві після ходів pre_moves
+
+    :param color: колір сторони, яка ходить після pre_moves
+    :param pre_moves: кортеж ходів від кореня
+    :param generations: к-ть поколінь, які треба перевірити (0 - лише сама позиція)
+    :return: список списків матів для кожного покоління піддерева
+    """
+    position = _worker_position
+    for turn in pre_moves:
+        position.make_turn(turn)
+    try:
+        return [list(position._iter_checkmates(color, depth, pre_moves, _worker_table))
+                for depth in range(generations)]
+    finally:
+        for _ in pre_moves:
+            position.unmake_move()
+
+
+def _split(position, color, pre_moves, split_depth, deep_step, executor, slots):
+    """
+    Перебирає перші split_depth ходів і ставить у чергу завдання для піддерев
+
+    :param position: об'єкт класу Position (змінюється і відновлюється)
+    :param color: колір сторони, яка ходить
+    :param pre_moves: кортеж ходів від кореня
+    :param split_depth: на якій глибині дерево розбивається на завдання
+    :param deep_step: глибина пошуку
+    :param executor: ProcessPoolExecutor
+    :param slots: список (покоління, Future або список списків матів) у порядку пошуку
+    :return: None
+    """
+    step = len(pre_moves)
+    if step == split_depth:
+        future = executor.submit(_search_subtree, color, pre_moves, deep_step - step)
+        slots.append((step, future))
+        return
+
+    checkmate, right_moves = position.check_mate(color, possible_moves=True)
+    if checkmate:
+        slots.append((step, [[pre_moves]]))
+        return
+    if step == deep_step - 1 or position._can_take_king(right_moves):
+        return
+
+    alter_color = 'b' if color == 'w' else 'w'
+    for pos1, pos2, transform, turn in position._get_turns(right_moves):
+        position.make_move(pos1, pos2, transform)
+        try:
+            _split(position, alter_color, (*pre_moves, turn), split_depth, deep_step, executor, slots)
+        finally:
+            position.unmake_move()
+
+
+def find_checkmates_parallel(position, color, deep_step, workers, split_depth=1):
+    """
+    Паралельна версія Position.find_checkmates
+
+    :param position: об'єкт класу Position
+    :param color: колір сторони, яка ходить першою
+    :param deep_step: ціле число - глибина пошуку
+    :param workers: к-ть процесів
+    :param split_depth: 1 - завдання для кожного першого ходу, 2 - для кожної пари ходів
+    :return: список з кортежів - ті самі мати, що і у Position.find_checkmates
+    """
+    if deep_step < 2 or position.check_mate(color)[0]:
+        return []
+    split_depth = max(1, min(split_depth, deep_step - 1))
+
+    slots = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(position.get_bytes(),)) as executor:
+        _split(position, color, (), split_depth, deep_step, executor, slots)
+        found = [[] for _ in range(deep_step)]
+        for step, result in slots:
+            if not isinstance(result, list):
+                result = result.result()
+            for depth, lines in enumerate(result):
+                found[step + depth] += sorted(lines)
+    return [line for generation in found for line in generation]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Перевірка і вимірювання швидкості генератора ходів (perft)
+
+Для кожної позиції з набору SUITE рахується к-ть позицій на глибинах 1..depth,
+час і швидкість (позицій за секунду). Якщо к-ть позицій для глибини відома
+наперед, вона порівнюється з отриманою. Результати виводяться у консоль і,
+за потреби, записуються у JSON-файл, щоб порівнювати їх між версіями.
+
+Запуск:
+    python3 perft.py --depth 3 --output perft.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from figures import Position, Figure, ch2py
+
+
+def create_hackaton_position():
+    """
+    ситуація з хакатона (та ж, що і в прикладі у figures.py)
+
+    :return: об'єкт класу Position
+    """
+    desk = Position()
+    desk.add_figure(ch2py('a7'), Figure('queen', 'w'))
+    desk.add_figure(ch2py('b3'), Figure('king', 'w'))
+    desk.add_figure(ch2py('d2'), Figure('rook', 'w'))
+    desk.add_figure(ch2py('f1'), Figure('bishop', 'w'))
+    desk.add_figure(ch2py('c6'), Figure('king', 'b'))
+    desk.add_figure(ch2py('d6'), Figure('pawn', 'b'))
+    return desk
+
+
+def create_start_position():
+    desk = Position()
+    desk.create_start_position()
+    return desk
+
+
+# (назва, функція створення позиції, хто ходить, {глибина: очікувана к-ть позицій})
+SUITE = [('start', create_start_position, 'w', {1: 20, 2: 400, 3: 8902, 4: 197281}),
+         ('hackaton', create_hackaton_position, 'w', {1: 48, 2: 112, 3: 4725, 4: 19561})]
+
+
+def run_suite(depth, suite=SUITE):
+    """
+    рахує perft для кожної позиції набору на глибинах 1..depth
+
+    :param depth: максимальна глибина
+    :param suite: набір позицій (див. SUITE)
+    :return: словник з результатами
+    """
+    results = []
+    total_nodes, total_time = 0, 0.0
+    for name, create, color, expected in suite:
+        position = create()
+        for d in range(1, depth + 1):
+            start = time.perf_counter()
+            nodes = position.perft(color, d)
+            seconds = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += seconds
+            results.append({'position': name,
+                            'depth': d,
+                            'nodes': nodes,
+                            'expected': expected.get(d),
+                            'ok': expected.get(d, nodes) == nodes,
+                            'seconds': seconds,
+                            'nodes_per_second': nodes / seconds if seconds else 0.0})
+    return {'depth': depth,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+            'total_nodes': total_nodes,
+            'total_seconds': total_time,
+            'nodes_per_second': total_nodes / total_time if total_time else 0.0,
+            'ok': all(r['ok'] for r in results)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='perft: перевірка і швидкість генератора ходів')
+    parser.add_argument('--depth', type=int, default=3, help='максимальна глибина')
+    parser.add_argument('--output', help='JSON-файл для результатів')
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.depth)
+    for r in report['results']:
+        status = '' if r['expected'] is None else ('ok' if r['ok'] else 'ПОМИЛКА, очікувалось {}'.format(r['expected']))
+        print('{:10} {:2} {:>10} {:8.3f}s {:>10.0f} nps {}'.format(
+            r['position'], r['depth'], r['nodes'], r['seconds'], r['nodes_per_second'], status))
+    print('всього: {} позицій, {:.3f}s, {:.0f} nps'.format(
+        report['total_nodes'], report['total_seconds'], report['nodes_per_second']))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    return 0 if report['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
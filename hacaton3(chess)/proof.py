@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Пошук примусового мату числами доказу (df-pn - proof-number search у глибину)
+
+У позиції, де ходить сторона, яка ставить мат (вузол "АБО"), досить одного ходу,
+що веде до мату; у позиції захисника (вузол "І") мат має бути після будь-якого ходу.
+Для кожної позиції тримаються число доказу pn - скільки щонайменше позицій ще треба
+довести, щоб довести мат, і число спростування dn - скільки треба спростувати, щоб
+довести, що мату немає. Пошук завжди йде у гілку, яку найлегше вирішити, і
+повертається вгору лише коли числа перевищили пороги, тому дерево не перебирається
+на повну ширину: вузькі лінії з шахами перевіряються на 6-10 ходів і більше.
+Числа зберігаються в ProofTable, тому пам'ять обмежена розміром таблиці.
+
+Нова позиція отримує числа за к-тю допустимих ходів (pn для вузла "І", dn - для "АБО"),
+тому першими пробуються ходи, після яких у захисника мало відповідей.
+
+Повторення позиції на поточній лінії вважається нічиєю. Спростування через
+повторення залежить від шляху до позиції, тому "мату немає" означає лише, що мат
+не знайдено; знайдений мат завжди коректний - головна лінія будується заново
+за допустимими ходами і закінчується матом.
+
+Запуск:
+    python3 proof.py "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1" --moves 8 --nodes 500000
+"""
+import argparse
+import sys
+
+from figures import Position, SearchBudget, ErrorBudget, FIGURE_LETTERS
+from transposition import ProofTable
+
+INF = 10 ** 9               # "нескінченне" число: позицію доведено або спростовано
+MAX_NUMBER = INF - 1        # сума чисел обмежується, щоб не стати нескінченною
+EPSILON = 0.25              # запас порогу для другого найкращого ходу (поріг 1 + epsilon)
+
+
+def _count_moves(right_moves):
+    return sum(len(targets) for targets in right_moves.values())
+
+
+class _ProofSearch:
+    """
+    Стан одного пошуку: позиція (змінюється і відновлюється), сторона, яка ставить мат,
+    таблиця, ліміт, статистика і ключі позицій на поточній лінії
+    """
+    def __init__(self, position, attacker, table, budget=None, stats=None):
+        self.position = position
+        self.attacker = attacker
+        self.table = table
+        self.budget = budget
+        self.stats = stats
+        self.path = set()
+
+    def _probe(self, key, depth):
+        """
+        запис таблиці, придатний для горизонту depth
+
+        :return: кортеж (pn, dn, plies, depth) або None
+        """
+        entry = self.table.probe(key)
+        if entry is None:
+            return None
+        pn, dn, plies, entry_depth = entry
+        if pn == 0 and plies > depth or dn == 0 and entry_depth < depth:
+            return None     # вирішено для іншого горизонту
+        return entry
+
+    def _values(self, key, color, depth):
+        """
+        (phi, delta) позиції: для вузла "АБО" - (pn, dn), для "І" - (dn, pn)
+        """
+        if key in self.path:
+            pn, dn = INF, 0     # повторення - нічия
+        else:
+            entry = self._probe(key, depth)
+            pn, dn = (1, 1) if entry is None else entry[:2]
+        return (pn, dn) if color == self.attacker else (dn, pn)
+
+    def _store_initial(self, key, color, depth, check, right_moves):
+        """
+        зберігає числа нової позиції: мат, пат і горизонт вирішуються одразу,
+        інакше числа - за к-тю допустимих ходів
+        """
+        n = _count_moves(right_moves)
+        if not n:
+            if check and color != self.attacker:
+                self.table.store(key, depth, 0, INF, 0)     # мат
+            else:
+                self.table.store(key, depth, INF, 0)        # пат або мат стороні, яка атакує
+        elif depth <= 0:
+            self.table.store(key, depth, INF, 0)            # за горизонтом мату немає
+        elif color == self.attacker:
+            self.table.store(key, depth, 1, n)
+        else:
+            self.table.store(key, depth, n, 1)
+
+    def mid(self, color, depth, thphi, thdelta, ply):
+        """
+        розширює поточну позицію, поки її числа (phi, delta) не досягнуть порогів
+
+        :param color: колір сторони, яка ходить
+        :param depth: к-ть півходів до горизонту
+        :param thphi: поріг для phi
+        :param thdelta: поріг для delta
+        :param ply: к-ть півходів від кореня
+        :return: None - результат записується в таблицю
+        """
+        position = self.position
+        if self.budget is not None:
+            self.budget.spend()
+        key = position.get_key(color)
+        king_pos, check, right_moves = position.get_legal_moves(color)
+        if self.stats is not None:
+            self.stats.node(ply)
+            self.stats.moves(ply, right_moves)
+        if not right_moves or depth <= 0:
+            self._store_initial(key, color, depth, check, right_moves)
+            return
+
+        alter_color = 'b' if color == 'w' else 'w'
+        children = []
+        for pos1, pos2, transform, turn in position._get_turns(right_moves):
+            position.make_move(pos1, pos2, transform)
+            try:
+                child_key = position.get_key(alter_color)
+                if child_key not in self.path and self._probe(child_key, depth - 1) is None:
+                    self._store_initial(child_key, alter_color, depth - 1, *position.get_legal_moves(alter_color)[1:])
+            finally:
+                position.unmake_move()
+            children.append((child_key, pos1, pos2, transform))
+
+        self.path.add(key)
+        try:
+            while True:
+                phi, delta, delta2 = INF, 0, INF
+                for child in children:
+                    child_phi, child_delta = self._values(child[0], alter_color, depth - 1)
+                    delta = INF if child_phi >= INF or delta >= INF else min(MAX_NUMBER, delta + child_phi)
+                    if child_delta < phi:
+                        best, best_phi, delta2, phi = child, child_phi, phi, child_delta
+                    elif child_delta < delta2:
+                        delta2 = child_delta
+                if phi >= thphi or delta >= thdelta:
+                    break
+                child_thphi = INF if thdelta >= INF else thdelta - delta + best_phi
+                child_thdelta = min(thphi, int(delta2 * (1 + EPSILON)) + 1)
+                position.make_move(*best[1:])
+                try:
+                    self.mid(alter_color, depth - 1, child_thphi, child_thdelta, ply + 1)
+                finally:
+                    position.unmake_move()
+        finally:
+            self.path.discard(key)
+
+        pn, dn = (phi, delta) if color == self.attacker else (delta, phi)
+        plies = None
+        if pn == 0:
+            # мат: найкоротший серед доведених ходів або найдовший захист
+            proven = [entry[2] for entry in (self._probe(child[0], depth - 1) for child in children)
+                      if entry is not None and entry[0] == 0]
+            plies = (min(proven) if color == self.attacker else max(proven)) + 1
+        self.table.store(key, depth, pn, dn, plies)
+
+    def principal_line(self, color, depth):
+        """
+        головна лінія доведеного мату: сторона, яка ставить мат, обирає найкоротший
+        з доведених матів, захисник - найдовший захист. Позиції, записи яких витіснено
+        з таблиці, доводяться повторно.
+
+        :param color: колір сторони, яка ходить
+        :param depth: к-ть півходів до горизонту
+        :return: кортеж ходів або None, якщо мат не підтвердився
+        """
+        position = self.position
+        line = []
+        try:
+            while True:
+                king_pos, check, right_moves = position.get_legal_moves(color)
+                if not right_moves:
+                    return tuple(line) if check and color != self.attacker else None
+                if depth <= 0:
+                    return None
+                alter_color = 'b' if color == 'w' else 'w'
+                best = None
+                for attempt in range(2):
+                    for item in position._get_turns(right_moves):
+                        position.make_move(*item[:3])
+                        try:
+                            entry = self._probe(position.get_key(alter_color), depth - 1)
+                            if (entry is None or entry[0]) and color != self.attacker:
+                                self.mid(alter_color, depth - 1, INF, INF, len(line) + 1)
+                                entry = self._probe(position.get_key(alter_color), depth - 1)
+                                if entry is None or entry[0]:
+                                    return None     # від мату можна захиститись
+                        finally:
+                            position.unmake_move()
+                        if entry is None or entry[0]:
+                            continue
+                        if best is None or (entry[2] < best_plies if color == self.attacker
+                                            else entry[2] > best_plies):
+                            best, best_plies = item, entry[2]
+                    if best is not None:
+                        break
+                    self.mid(color, depth, INF, INF, len(line))
+                if best is None:
+                    return None
+                position.make_move(*best[:3])
+                line.append(best[3])
+                color, depth = alter_color, depth - 1
+        finally:
+            for _ in line:
+                position.unmake_move()
+
+
+def prove_mate(position, color, max_moves, table=None, budget=None, stats=None):
+    """
+    чи може сторона color поставити мат не більше ніж за max_moves своїх ходів,
+    як би не захищався суперник (пошук df-pn)
+
+    :param position: об'єкт класу Position (змінюється і відновлюється)
+    :param color: колір сторони, яка ставить мат (і ходить першою)
+    :param max_moves: максимальна к-ть ходів сторони color
+    :param table: об'єкт ProofTable (якщо не вказано - створюється новий); таблицю можна
+                  ділити лише між пошуками з тією ж стороною, яка ставить мат
+    :param budget: об'єкт SearchBudget; коли ліміт вичерпано, кидається ErrorBudget
+    :param stats: об'єкт SearchStats, куди записується к-ть позицій і ходів по півходах
+    :return: кортеж ходів (start, end[, transform]) головної лінії або None, якщо мат
+             не знайдено; лінія - найкоротший мат серед доведених, не обов'язково
+             найкоротший можливий (його шукає Position.find_forced_mate)
+    """
+    if table is None:
+        table = ProofTable()
+    search = _ProofSearch(position, color, table, budget, stats)
+    depth = 2 * max_moves - 1
+    search.mid(color, depth, INF, INF, 0)
+    entry = search._probe(position.get_key(color), depth)
+    if entry is None or entry[0]:
+        return None
+    return search.principal_line(color, depth)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='пошук примусового мату числами доказу')
+    parser.add_argument('fen', help='позиція у форматі FEN')
+    parser.add_argument('--moves', type=int, default=8, help='максимальна к-ть ходів до мату')
+    parser.add_argument('--nodes', type=int, help='ліміт к-ті позицій')
+    parser.add_argument('--time', type=float, help='ліміт часу в секундах')
+    args = parser.parse_args(argv)
+
+    position = Position()
+    color = position.set_fen(args.fen)
+    budget = SearchBudget(args.nodes, args.time)
+    try:
+        line = prove_mate(position, color, args.moves, budget=budget)
+    except ErrorBudget as e:
+        print('{} ({} позицій)'.format(e, budget.nodes))
+        return 1
+    if line is None:
+        print('мат не знайдено ({} позицій)'.format(budget.nodes))
+    else:
+        print('мат у {} ходів ({} позицій):'.format((len(line) + 1) // 2, budget.nodes))
+        print(' '.join(''.join(turn[:2]) + (FIGURE_LETTERS[turn[2]] if len(turn) == 3 else '') for turn in line))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
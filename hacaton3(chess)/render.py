@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Малювання позиції у SVG або PNG без дисплея (на відміну від chessboard.py з turtle)
+
+Порожня дошка (клітинки і координати) будується один раз для кожного розміру і
+зберігається як шаблон; для кожної позиції до шаблону додаються лише фігури.
+У SVG фігура - це посилання <use> на символ, описаний у шаблоні один раз,
+у PNG - вставка заздалегідь намальованого спрайта фігури.
+PNG потребує Pillow (pip install Pillow), який імпортується лише при першому виклику.
+
+Запуск (по файлу на кожну позицію з файлу EPD/FEN):
+    python3 render.py puzzles.epd --dir diagrams --format svg --size 360
+"""
+import argparse
+import io
+import os
+import sys
+
+from core import FIGURE_CODES, FILES, ch2py
+from figures import Position, ErrorBadFormat, ErrorNoKing
+
+LIGHT_COLOR = '#d3d3d3'     # light grey, як у chessboard.py
+DARK_COLOR = '#a9a9a9'      # dark grey
+HIGHLIGHT_COLOR = '#f0d060'
+
+_svg_templates = {}     # {(size, flipped): (початок SVG, кінець SVG)}
+_png_templates = {}     # {(size, flipped, font): (зображення дошки, {фігура: спрайт})}
+
+
+def _square_origin(pos, cell, flipped):
+    """
+    лівий верхній кут клітинки на зображенні
+
+    :param pos: кортеж (х, у)
+    :param cell: розмір клітинки
+    :param flipped: дошка з боку чорних
+    :return: кортеж (х, у) у пікселях
+    """
+    x, y = pos
+    if flipped:
+        return (7 - x) * cell, y * cell
+    return x * cell, (7 - y) * cell
+
+
+def _svg_template(size, flipped):
+    key = (size, flipped)
+    if key not in _svg_templates:
+        cell = size / 8
+        parts = ['<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                 'width="{0}" height="{0}" viewBox="0 0 {0} {0}">'.format(size),
+                 '<defs>']
+        for (figure_type, color), code in FIGURE_CODES.items():
+            parts.append('<symbol id="{}{}" viewBox="0 0 {} {}" overflow="visible">'
+                         '<text x="{}" y="{}" font-size="{}" text-anchor="middle">&#{};</text></symbol>'
+                         .format(color, figure_type, cell, cell, cell / 2, cell * 0.82, cell * 0.8, code))
+        parts.append('</defs>')
+        parts.append('<rect width="{0}" height="{0}" fill="{1}"/>'.format(size, LIGHT_COLOR))
+        for x in range(8):
+            for y in range(8):
+                if (x + y) % 2 == 0:
+                    left, top = _square_origin((x, y), cell, flipped)
+                    parts.append('<rect x="{}" y="{}" width="{}" height="{}" fill="{}"/>'
+                                 .format(left, top, cell, cell, DARK_COLOR))
+        for i, letter in enumerate(FILES):
+            left, top = _square_origin((i, 0), cell, flipped)
+            parts.append('<text x="{}" y="{}" font-size="{}">{}</text>'
+                         .format(left + cell * 0.88, size - cell * 0.04, cell * 0.14, letter))
+            left, top = _square_origin((0, i), cell, flipped)
+            parts.append('<text x="{}" y="{}" font-size="{}">{}</text>'
+                         .format(cell * 0.03, top + cell * 0.17, cell * 0.14, i + 1))
+        _svg_templates[key] = (''.join(parts), '</svg>')
+    return _svg_templates[key]
+
+
+def render_svg(position, size=360, flipped=False, highlight=()):
+    """
+    малює позицію у SVG
+
+    :param position: об'єкт класу Position
+    :param size: розмір зображення у пікселях
+    :param flipped: дошка з боку чорних
+    :param highlight: поля, які підсвічуються (напр. останній хід): кортежі (х, у) або рядки 'e2'
+    :return: рядок SVG
+    """
+    head, tail = _svg_template(size, flipped)
+    cell = size / 8
+    parts = [head]
+    for pos in highlight:
+        if isinstance(pos, str):
+            pos = ch2py(pos)
+        left, top = _square_origin(pos, cell, flipped)
+        parts.append('<rect x="{}" y="{}" width="{}" height="{}" fill="{}" fill-opacity="0.6"/>'
+                     .format(left, top, cell, cell, HIGHLIGHT_COLOR))
+    for pos, figure in position.current_state.items():
+        left, top = _square_origin(pos, cell, flipped)
+        parts.append('<use xlink:href="#{}{}" x="{}" y="{}" width="{}" height="{}"/>'
+                     .format(figure.get_color(), figure.get_type(), left, top, cell, cell))
+    parts.append(tail)
+    return ''.join(parts)
+
+
+def _png_template(size, flipped, font):
+    key = (size, flipped, font)
+    if key not in _png_templates:
+        try:
+            from PIL import Image, ImageDraw, ImageFont
+        except ImportError:
+            raise ImportError('для PNG потрібен Pillow: pip install Pillow')
+        cell = size // 8
+        board = Image.new('RGB', (cell * 8, cell * 8), LIGHT_COLOR)
+        draw = ImageDraw.Draw(board)
+        for x in range(8):
+            for y in range(8):
+                if (x + y) % 2 == 0:
+                    left, top = _square_origin((x, y), cell, flipped)
+                    draw.rectangle([left, top, left + cell - 1, top + cell - 1], fill=DARK_COLOR)
+        try:
+            glyph_font = ImageFont.truetype(font, int(cell * 0.8))
+        except OSError:
+            glyph_font = None       # шрифту з шаховими символами немає - фігури малюються літерами
+        sprites = {}
+        for (figure_type, color), code in FIGURE_CODES.items():
+            sprite = Image.new('RGBA', (cell, cell), (0, 0, 0, 0))
+            sprite_draw = ImageDraw.Draw(sprite)
+            if glyph_font is not None:
+                sprite_draw.text((cell / 2, cell / 2), chr(code), font=glyph_font, fill='black', anchor='mm')
+            else:
+                letter = 'N' if figure_type == 'knight' else figure_type[0].upper()
+                fill, outline = ('white', 'black') if color == 'w' else ('black', 'white')
+                sprite_draw.ellipse([cell * 0.15, cell * 0.15, cell * 0.85, cell * 0.85], fill=fill, outline=outline)
+                sprite_draw.text((cell / 2, cell / 2), letter, fill=outline, anchor='mm')
+            sprites[(figure_type, color)] = sprite
+        _png_templates[key] = (board, sprites)
+    return _png_templates[key]
+
+
+def render_png(position, size=360, flipped=False, highlight=(), font='DejaVuSans.ttf'):
+    """
+    малює позицію у PNG (потрібен Pillow)
+
+    :param position: об'єкт класу Position
+    :param size: розмір зображення у пікселях (округлюється до кратного 8)
+    :param flipped: дошка з боку чорних
+    :param highlight: поля, які підсвічуються: кортежі (х, у) або рядки 'e2'
+    :param font: шрифт TrueType з шаховими символами Unicode
+    :return: байти PNG
+    """
+    board, sprites = _png_template(size, flipped, font)
+    image = board.copy()
+    cell = size // 8
+    if highlight:
+        from PIL import ImageDraw
+        draw = ImageDraw.Draw(image)
+        for pos in highlight:
+            if isinstance(pos, str):
+                pos = ch2py(pos)
+            left, top = _square_origin(pos, cell, flipped)
+            draw.rectangle([left, top, left + cell - 1, top + cell - 1], fill=HIGHLIGHT_COLOR)
+    for pos, figure in position.current_state.items():
+        sprite = sprites[(figure.get_type(), figure.get_color())]
+        image.paste(sprite, _square_origin(pos, cell, flipped), sprite)
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return output.getvalue()
+
+
+def main(argv=None):
+    from batch import parse_epd, iter_puzzles
+
+    parser = argparse.ArgumentParser(description='малювання позицій у SVG/PNG')
+    parser.add_argument('input', help='файл EPD/FEN (одна позиція в рядку)')
+    parser.add_argument('--dir', default='.', help='каталог для зображень')
+    parser.add_argument('--format', choices=('svg', 'png'), default='svg')
+    parser.add_argument('--size', type=int, default=360, help='розмір зображення у пікселях')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.dir, exist_ok=True)
+    position = Position()
+    n = 0
+    with open(args.input, encoding='utf-8') as file:
+        for line_number, line in iter_puzzles(file):
+            try:
+                fen, operations = parse_epd(line)
+                color = position.set_fen(fen)
+            except (ErrorBadFormat, ErrorNoKing, ValueError) as e:
+                print('рядок {}: {}'.format(line_number, e), file=sys.stderr)
+                continue
+            path = os.path.join(args.dir, '{}.{}'.format(line_number, args.format))
+            if args.format == 'svg':
+                with open(path, 'w', encoding='utf-8') as out:
+                    out.write(render_svg(position, args.size, flipped=color == 'b'))
+            else:
+                with open(path, 'wb') as out:
+                    out.write(render_png(position, args.size, flipped=color == 'b'))
+            n += 1
+    print('{} зображень'.format(n), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
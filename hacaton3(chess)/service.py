@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Сервіс аналізу позицій на asyncio: черга завдань, ліміти часу і скасування
+
+Клієнт підключається по TCP і надсилає запити рядками JSON; відповіді теж
+приходять рядками JSON, по мірі того, як їх знаходить пошук. Пошук виконується
+в пулі процесів, тому цикл подій не блокується і кілька завдань (від різних
+клієнтів) виконуються паралельно; завдання понад к-ть процесів чекають у черзі.
+
+Запити:
+    {"op": "submit", "id": "j1", "fen": "...", "task": "checkmates", "depth": 4,
+     "deadline": 10, "nodes": 1000000}
+        task: checkmates (Position.iter_checkmates, depth - глибина),
+              forced_mate (Position.find_forced_mate, depth - к-ть ходів),
+              prove_mate (Position.prove_mate, depth - к-ть ходів);
+        deadline - ліміт часу в секундах від прийому завдання (включно з чеканням у черзі),
+        nodes - ліміт к-ті позицій; обидва необов'язкові
+    {"op": "cancel", "id": "j1"}
+
+Відповіді:
+    {"id": "j1", "event": "accepted"}
+    {"id": "j1", "event": "depth", "depth": 2, "nodes": ..., "seconds": ...} - завершено ітерацію
+    {"id": "j1", "event": "mate", "line": [["a7", "c5"], ...]} - знайдено мат (checkmates)
+    {"id": "j1", "event": "done", "status": "ok" | "timeout" | "cancelled" | "error",
+     "result": ..., "nodes": ..., "seconds": ...} - останнє повідомлення завдання
+    {"id": ..., "event": "error", "error": "..."} - некоректний запит
+
+Результати forced_mate і prove_mate (status ok) зберігаються в SolutionCache з ключем
+Position.get_canonical, тому задача, дзеркальна до вже розв'язаної, відповідається одразу,
+без процесу-виконавця: {"event": "done", "status": "ok", ..., "cached": true}, ходи
+перенесено на її орієнтацію.
+
+Коли клієнт відключається, всі його завдання скасовуються. Процес-виконавець
+перевіряє скасування через SearchBudget, тому завдання зупиняється за кілька
+тисяч позицій, а дошка і пул залишаються придатними для наступних завдань.
+
+Запуск:
+    python3 service.py --port 8765 --workers 4
+    echo '{"op": "submit", "id": 1, "fen": "8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1", "task": "checkmates", "depth": 4}' \\
+        | nc localhost 8765
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from figures import Position, SearchBudget, SearchStats, ErrorBudget, ErrorBadFormat, ErrorNoKing, transform_line
+from transposition import SolutionCache
+
+TASKS = ('checkmates', 'forced_mate', 'prove_mate')
+CACHED_TASKS = ('forced_mate', 'prove_mate')     # задачі з одним результатом, які зберігаються в кеші
+DEADLINE_GRACE = 0.5    # скільки секунд після deadline чекати done від виконавця, перш ніж відповісти timeout
+CANCEL_CHECK = 1023     # скасування перевіряється раз на 1024 позиції (це звернення до іншого процесу)
+
+
+class _JobBudget(SearchBudget):
+    """
+    SearchBudget, який також зупиняє пошук, коли завдання скасовано
+    """
+    def __init__(self, max_nodes, time_limit, cancel):
+        super().__init__(max_nodes, time_limit)
+        self.cancel = cancel
+
+    def spend(self):
+        super().spend()
+        if not self.nodes & CANCEL_CHECK and self.cancel.is_set():
+            raise ErrorBudget
+
+
+def run_job(key, job, deadline, events, cancel):
+    """
+    Виконує завдання у процесі-виконавці
+
+    :param key: номер завдання в сервісі (додається до кожної події)
+    :param job: словник запиту submit
+    :param deadline: час time.time(), до якого завдання має завершитись, або None
+    :param events: черга multiprocessing для проміжних результатів: кортежі (key, словник)
+    :param cancel: multiprocessing.Event, який встановлюється при скасуванні
+    :return: None - подія done теж кладеться в чергу, після всіх проміжних
+    """
+    start = time.perf_counter()
+    result = {'event': 'done', 'status': 'error', 'result': None, 'nodes': 0}
+    time_limit = None if deadline is None else deadline - time.time()
+    budget = _JobBudget(job.get('nodes'), time_limit, cancel)
+
+    def on_stats(event, record):
+        if event == 'iteration':
+            events.put((key, dict(event='depth', **record)))
+
+    stats = SearchStats(on_stats)
+    try:
+        if cancel.is_set() or time_limit is not None and time_limit <= 0:
+            raise ErrorBudget
+        position = Position()
+        color = position.set_fen(job['fen'])
+        task, depth = job['task'], int(job['depth'])
+        if task == 'checkmates':
+            n = 0
+            for line in position.iter_checkmates(color, depth, budget=budget, stats=stats):
+                events.put((key, {'event': 'mate', 'line': [list(turn) for turn in line]}))
+                n += 1
+            result['result'] = n
+        else:
+            search = position.find_forced_mate if task == 'forced_mate' else position.prove_mate
+            line = search(color, depth, budget=budget, stats=stats)
+            result['result'] = None if line is None else [list(turn) for turn in line]
+        result['status'] = 'ok'
+    except ErrorBudget:
+        result['status'] = 'cancelled' if cancel.is_set() else 'timeout'
+    except (ErrorBadFormat, ErrorNoKing, ValueError, KeyError) as e:
+        result['error'] = str(e)
+    result['nodes'] = budget.nodes
+    result['seconds'] = time.perf_counter() - start
+    events.put((key, result))
+
+
+def _job_id(request):
+    """
+    :param request: словник запиту
+    :return: id завдання з запиту (рядок або ціле число)
+    """
+    job_id = request.get('id')
+    if not isinstance(job_id, (str, int)) or isinstance(job_id, bool):
+        raise ValueError('id має бути рядком або цілим числом')
+    return job_id
+
+
+class _Job:
+    def __init__(self, key, client, job_id, cancel):
+        self.key = key
+        self.client = client
+        self.id = job_id
+        self.cancel = cancel
+        self.future = None
+        self.cache_key = None   # (ключ SolutionCache, симетрія до канонічної позиції) або None
+        self.timer = None       # asyncio.TimerHandle для deadline
+        self.expired = False    # deadline минув
+
+
+class _Client:
+    """
+    Підключений клієнт: потік для відповідей і його завдання {id: _Job}
+    """
+    def __init__(self, writer):
+        self.writer = writer
+        self.jobs = {}
+        self._lock = asyncio.Lock()
+
+    async def send(self, message):
+        if self.writer.is_closing():
+            return
+        async with self._lock:
+            self.writer.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+            try:
+                await self.writer.drain()
+            except ConnectionError:
+                pass
+
+
+class AnalysisService:
+    """
+    Сервіс аналізу (див. опис модуля)
+
+    методи:
+        start(host, port) -> asyncio.Server - починає приймати підключення
+        serve_forever(host, port) -> None - start і робота до скасування
+        close() -> None - скасовує завдання і зупиняє пул процесів
+    """
+    def __init__(self, workers=None, cache_size=1 << 12):
+        """
+        :param workers: к-ть процесів (None - за к-тю процесорів)
+        :param cache_size: к-ть розв'язків у кеші (0 - без кешу)
+        """
+        # процеси запускаються через spawn: при fork вони успадкували б сокети
+        # клієнтів, і закрите сервісом з'єднання лишалось би відкритим
+        context = multiprocessing.get_context('spawn')
+        self._manager = context.Manager()
+        self._events = self._manager.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        self._jobs = {}         # {номер завдання: _Job}
+        self._cache = SolutionCache(cache_size) if cache_size else None
+        self._keys = itertools.count(1)
+        self._server = None
+        self._pump = None
+
+    async def start(self, host='127.0.0.1', port=8765):
+        self._pump = asyncio.get_running_loop().create_task(self._pump_events())
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+        return self._server
+
+    async def serve_forever(self, host='127.0.0.1', port=8765):
+        server = await self.start(host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+        for job in list(self._jobs.values()):
+            self._cancel(job)
+        if self._pump is not None:
+            self._events.put(None)
+            await self._pump
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        self._manager.shutdown()
+
+    async def _pump_events(self):
+        # проміжні результати з процесів-виконавців пересилаються клієнтам
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self._events.get)
+            if item is None:
+                return
+            key, message = item
+            job = self._jobs.get(key)
+            if job is not None:
+                if message['event'] == 'done':
+                    self._forget(job)
+                    if job.cache_key is not None and message['status'] == 'ok':
+                        key, symmetry = job.cache_key
+                        line = message['result']
+                        self._cache.put(key, {'result': None if line is None else transform_line(line, symmetry)})
+                await job.client.send(dict(id=job.id, **message))
+
+    async def _handle_client(self, reader, writer):
+        client = _Client(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('запит має бути об\'єктом JSON')
+                    op = request.get('op')
+                    if op == 'submit':
+                        await self._submit(client, request)
+                    elif op == 'cancel':
+                        job = client.jobs.get(_job_id(request))
+                        if job is None:
+                            raise ValueError('немає завдання {!r}'.format(request.get('id')))
+                        self._cancel(job)
+                    else:
+                        raise ValueError('невідома операція {!r}'.format(op))
+                except ValueError as e:
+                    job_id = request.get('id') if isinstance(request, dict) else None
+                    await client.send({'id': job_id if isinstance(job_id, (str, int)) else None,
+                                       'event': 'error', 'error': str(e)})
+        except ConnectionError:
+            pass
+        finally:
+            for job in list(client.jobs.values()):
+                self._cancel(job)
+            writer.close()
+
+    async def _submit(self, client, request):
+        """
+        перевіряє запит submit і ставить завдання в чергу пулу процесів
+        """
+        job_id = _job_id(request)
+        if job_id in client.jobs:
+            raise ValueError('завдання {!r} вже виконується'.format(job_id))
+        if request.get('task') not in TASKS:
+            raise ValueError('task має бути одним з {}'.format(', '.join(TASKS)))
+        if not isinstance(request.get('fen'), str):
+            raise ValueError('немає позиції fen')
+        depth = request.get('depth')
+        if not isinstance(depth, int) or depth < 1:
+            raise ValueError('depth має бути додатнім цілим числом')
+        deadline = request.get('deadline')
+        if deadline is not None and not isinstance(deadline, (int, float)):
+            raise ValueError('deadline має бути числом секунд')
+        nodes = request.get('nodes')
+        if nodes is not None and not isinstance(nodes, int):
+            raise ValueError('nodes має бути цілим числом')
+
+        cache_key = self._cache_key(request['fen'], request['task'], depth)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key[0])
+            if cached is not None:
+                line = cached['result']
+                await client.send({'id': job_id, 'event': 'accepted'})
+                await client.send({'id': job_id, 'event': 'done', 'status': 'ok',
+                                   'result': None if line is None else
+                                   [list(turn) for turn in transform_line(line, cache_key[1])],
+                                   'nodes': 0, 'seconds': 0.0, 'cached': True})
+                return
+
+        job = _Job(next(self._keys), client, job_id, self._manager.Event())
+        job.cache_key = cache_key
+        self._jobs[job.key] = job
+        client.jobs[job_id] = job
+        await client.send({'id': job_id, 'event': 'accepted'})
+        fields = {'fen': request['fen'], 'task': request['task'], 'depth': depth, 'nodes': nodes}
+        job.future = self._executor.submit(run_job, job.key, fields,
+                                           None if deadline is None else time.time() + deadline,
+                                           self._events, job.cancel)
+        loop = asyncio.get_running_loop()
+        loop.create_task(self._watch(job))
+        if deadline is not None:
+            job.timer = loop.call_later(max(deadline, 0), self._expire, job)
+
+    def _cache_key(self, fen, task, depth):
+        """
+        :return: (ключ SolutionCache, симетрія до канонічної позиції) або None, якщо
+                 задача не кешується (некоректну позицію перевіряє процес-виконавець)
+        """
+        if self._cache is None or task not in CACHED_TASKS:
+            return None
+        position = Position()
+        try:
+            color = position.set_fen(fen)
+        except (ErrorBadFormat, ValueError):
+            return None
+        key, symmetry = position.get_canonical(color)
+        return (key, task, depth), symmetry
+
+    async def _watch(self, job):
+        # звичайне завершення (done) приходить через чергу подій; тут - завдання,
+        # зняті з черги пулу до початку, і процеси, які впали
+        try:
+            await asyncio.wrap_future(job.future)
+            return
+        except asyncio.CancelledError:
+            result = {'event': 'done', 'status': 'timeout' if job.expired else 'cancelled', 'result': None,
+                      'nodes': 0, 'seconds': 0.0}
+        except Exception as e:
+            result = {'event': 'done', 'status': 'error', 'result': None, 'nodes': 0, 'error': str(e)}
+        if self._jobs.get(job.key) is job:
+            self._forget(job)
+            await job.client.send(dict(id=job.id, **result))
+
+    def _expire(self, job):
+        # deadline включає чекання в черзі: завдання, яке ще в черзі пулу, знімається
+        # (done/timeout надсилає _watch); завдання, яке вже виконується, зупиняє
+        # SearchBudget процесу-виконавця, а якщо за DEADLINE_GRACE done так і не прийшов
+        # (завдання чекає у внутрішній черзі пулу, звідки його не зняти), timeout
+        # надсилається звідси, і пізніші події виконавця відкидаються
+        if self._jobs.get(job.key) is not job:
+            return
+        if not job.expired:
+            job.expired = True
+            if not job.future.cancel():
+                job.timer = asyncio.get_running_loop().call_later(DEADLINE_GRACE, self._expire, job)
+            return
+        job.cancel.set()
+        self._forget(job)
+        asyncio.get_running_loop().create_task(job.client.send(
+            {'id': job.id, 'event': 'done', 'status': 'timeout', 'result': None, 'nodes': 0, 'seconds': 0.0}))
+
+    def _forget(self, job):
+        if job.timer is not None:
+            job.timer.cancel()
+        del self._jobs[job.key]
+        if job.client.jobs.get(job.id) is job:
+            del job.client.jobs[job.id]
+
+    def _cancel(self, job):
+        # завдання в черзі знімається одразу, а те, що виконується, зупиняє SearchBudget
+        if job.future is not None and not job.future.cancel():
+            job.cancel.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='сервіс аналізу позицій')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, help='к-ть процесів (за замовчуванням - к-ть процесорів)')
+    parser.add_argument('--cache', type=int, default=1 << 12, help='к-ть розв\'язків у кеші (0 - без кешу)')
+    args = parser.parse_args(argv)
+
+    service = AnalysisService(args.workers, args.cache)
+    print('сервіс слухає {}:{}'.format(args.host, args.port), file=sys.stderr)
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
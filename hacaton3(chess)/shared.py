@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Пакети позицій у спільній пам'яті (multiprocessing.shared_memory)
+
+Коли процесам-виконавцям передаються об'єкти Position, кожна дошка (словник з
+об'єктами Figure) серіалізується pickle туди і назад, і для простих задач це
+займає стільки ж часу, скільки сам пошук. Тут позиції пакуються один раз у спільний
+блок пам'яті, процеси підключаються до нього за іменем при старті, а завданнями
+стають лише номери записів.
+
+Розмітка блоку (усі числа - little-endian):
+    8 байтів        к-ть записів N
+    32 * N байтів   дошки у форматі Position.get_bytes, підряд (див. vectorized.unpack_bytes)
+    N байтів        сторона, яка ходить: 0 - білі, 1 - чорні
+    N байтів        к-ть ходів до мату (0 - не задано)
+
+PositionView читає фігури прямо з блоку, без копіювання і без створення словників;
+для пошуку позиція розставляється в звичайний Position через set_bytes (to_position).
+
+Пакетне розв'язування в кількох процесах - solve_file_shared (batch.py --workers N).
+"""
+import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from core import SQUARE_COORDS, SQUARE_INDEX
+from figures import Figure, Position, FIGURE_TYPES, FIGURE_LETTERS, ErrorBadFormat, ErrorNoKing
+
+RECORD_SIZE = 32
+HEADER = struct.Struct('<Q')
+COLORS = ('w', 'b')
+
+# код поля -> фігура (None - порожнє поле або некоректний код)
+CODE_FIGURES = [None] * 16
+for _code, _type in enumerate(FIGURE_TYPES, 1):
+    CODE_FIGURES[_code] = Figure(_type, 'w')
+    CODE_FIGURES[_code | 8] = Figure(_type, 'b')
+
+
+class SharedBatch:
+    """
+    Пакет позицій у спільній пам'яті (розмітка - див. опис модуля)
+
+    методи:
+        set(index, position, color, mate_in) -> None - записує позицію
+        get_bytes(index) -> memoryview - 32 байти дошки (без копіювання)
+        get_color(index) -> string, get_mate_in(index) -> int
+        view(index) -> PositionView
+        load(index, position) -> string - розставляє позицію, повертає сторону, яка ходить
+        boards - memoryview усіх дошок підряд (для vectorized.unpack_bytes)
+        close() -> None - від'єднується від блоку; unlink() -> None - видаляє блок
+    """
+    def __init__(self, size=None, name=None):
+        """
+        :param size: к-ть записів - створює новий блок
+        :param name: ім'я існуючого блоку - підключається до нього (size тоді не вказується)
+        """
+        if name is None:
+            if size is None or size < 1:
+                raise ValueError('розмір пакета має бути додатнім')
+            self._shm = shared_memory.SharedMemory(create=True, size=HEADER.size + (RECORD_SIZE + 2) * size)
+            HEADER.pack_into(self._shm.buf, 0, size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            size = HEADER.unpack_from(self._shm.buf, 0)[0]
+        self.size = size
+        buf = self._shm.buf
+        end = HEADER.size + RECORD_SIZE * size
+        self.boards = buf[HEADER.size:end]
+        self._colors = buf[end:end + size]
+        self._mate_in = buf[end + size:end + 2 * size]
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __len__(self):
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def set(self, index, position, color='w', mate_in=0):
+        """
+        :param index: номер запису
+        :param position: об'єкт класу Position
+        :param color: колір сторони, яка ходить
+        :param mate_in: к-ть ходів до мату (0..255)
+        :return: None
+        """
+        offset = RECORD_SIZE * index
+        self.boards[offset:offset + RECORD_SIZE] = position.get_bytes()
+        self._colors[index] = COLORS.index(color)
+        self._mate_in[index] = mate_in
+
+    def get_bytes(self, index):
+        offset = RECORD_SIZE * index
+        return self.boards[offset:offset + RECORD_SIZE]
+
+    def get_color(self, index):
+        return COLORS[self._colors[index]]
+
+    def get_mate_in(self, index):
+        return self._mate_in[index]
+
+    def view(self, index):
+        """
+        :param index: номер запису
+        :return: об'єкт PositionView (дійсний до close)
+        """
+        return PositionView(self.get_bytes(index))
+
+    def load(self, index, position):
+        """
+        розставляє запис у позицію для пошуку
+
+        :param index: номер запису
+        :param position: об'єкт класу Position (попередня розстановка стирається)
+        :return: колір сторони, яка ходить
+        """
+        position.set_bytes(self.get_bytes(index))
+        return self.get_color(index)
+
+    def close(self):
+        # перед закриттям блоку треба звільнити всі memoryview на нього
+        for view in (self.boards, self._colors, self._mate_in):
+            view.release()
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+
+class PositionView:
+    """
+    Позиція тільки для читання поверх 32 байтів Position.get_bytes (без копіювання)
+
+    методи (як у Position):
+        get_figure(pos) -> Figure або None
+        get_figures_by_color(color) -> dict, get_figures_by_type_color(figure_type, color) -> dict
+        get_king_pos(color) -> кортеж (х, у) або None
+        get_bytes() -> bytes, get_fen(color) -> string
+        current_state - словник {позиція: фігура}, будується при кожному зверненні
+        to_position(position=None) -> Position - копія для пошуку
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        """
+        :param data: bytes або memoryview довжиною 32
+        """
+        if len(data) != RECORD_SIZE:
+            raise ErrorBadFormat
+        self._data = data
+
+    def _code(self, sq):
+        byte = self._data[sq >> 1]
+        return byte >> 4 if sq & 1 else byte & 15
+
+    def items(self):
+        """
+        генератор (позиція, фігура) для всіх фігур за порядком полів a1, b1, ..., h8
+        """
+        for i, byte in enumerate(self._data):
+            if not byte:
+                continue
+            for sq, code in ((2 * i, byte & 15), (2 * i + 1, byte >> 4)):
+                figure = CODE_FIGURES[code]
+                if figure is not None:
+                    yield SQUARE_COORDS[sq], figure
+
+    @property
+    def current_state(self):
+        return dict(self.items())
+
+    def get_figure(self, pos):
+        return CODE_FIGURES[self._code(SQUARE_INDEX[pos])]
+
+    def get_figures_by_color(self, color):
+        return {pos: figure for pos, figure in self.items() if figure.get_color() == color}
+
+    def get_figures_by_type_color(self, figure_type, color):
+        return {pos: figure for pos, figure in self.items()
+                if figure.get_type() == figure_type and figure.get_color() == color}
+
+    def get_king_pos(self, color):
+        king = Figure('king', color)
+        for pos, figure in self.items():
+            if figure is king:
+                return pos
+        return None
+
+    def get_bytes(self):
+        return bytes(self._data)
+
+    def get_fen(self, color='w'):
+        """
+        :param color: колір сторони, яка ходить
+        :return: рядок FEN, як у Position.get_fen
+        """
+        rows = []
+        for y in range(7, -1, -1):
+            row, empty = '', 0
+            for x in range(8):
+                figure = CODE_FIGURES[self._code(x + 8 * y)]
+                if figure is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                letter = FIGURE_LETTERS[figure.get_type()]
+                row += letter.upper() if figure.get_color() == 'w' else letter
+            rows.append(row + (str(empty) if empty else ''))
+        return '/'.join(rows) + ' ' + color + ' - - 0 1'
+
+    def to_position(self, position=None):
+        """
+        :param position: об'єкт класу Position, який треба перезаписати (None - новий)
+        :return: об'єкт класу Position
+        """
+        if position is None:
+            position = Position()
+        position.set_bytes(self._data)
+        return position
+
+
+_worker_batch = None        # пакет, до якого підключено процес-виконавець
+_worker_position = None     # позиція процесу-виконавця, в яку по черзі розставляються записи
+_worker_options = None      # параметри batch.solve_position
+_worker_tablebase = None
+
+
+def _init_worker(name, options, tablebase_dir):
+    global _worker_batch, _worker_position, _worker_options, _worker_tablebase
+    _worker_batch = SharedBatch(name=name)
+    _worker_position = Position()
+    _worker_options = options
+    if tablebase_dir is not None:
+        from tablebase import Tablebase
+        _worker_tablebase = Tablebase(tablebase_dir)
+
+
+def _solve_range(start, stop):
+    """
+    Завдання для процесу-виконавця: розв'язує записи пакета start..stop-1
+
+    :return: список словників batch.solve_position
+    """
+    from batch import solve_position
+    results = []
+    for index in range(start, stop):
+        color = _worker_batch.load(index, _worker_position)
+        results.append(solve_position(_worker_position, color, _worker_batch.get_mate_in(index),
+                                      tablebase=_worker_tablebase, **_worker_options))
+    return results
+
+
+def solve_file_shared(file, output, mate_in, workers=None, max_nodes=None, time_limit=None, checks_only=False,
+                      with_stats=False, tablebase_dir=None, proof=False, chunk=4096, cache=None):
+    """
+    Паралельна версія batch.solve_file: задачі читаються частинами по chunk, кожна
+    частина пакується в один і той самий SharedBatch, а процеси отримують діапазони номерів.
+    Результати записуються в порядку рядків файлу і збігаються з batch.solve_file (крім часу).
+
+    Кеш перевіряється в головному процесі ще до пакування, тому дзеркальні задачі (і з кешу,
+    і в межах однієї частини) до процесів не передаються.
+
+    :param workers: к-ть процесів (None - за к-тю процесорів)
+    :param tablebase_dir: каталог з таблицями ендшпілю (кожен процес відкриває їх сам)
+    :param chunk: к-ть задач в одному пакеті
+    :param cache: об'єкт SolutionCache або None
+    :return: словник {статус: к-ть задач}; решта параметрів - див. batch.solve_file
+    """
+    from batch import parse_epd, get_mate_in, iter_puzzles, orient_result, CACHED_STATUSES
+
+    options = {'max_nodes': max_nodes, 'time_limit': time_limit, 'checks_only': checks_only,
+               'with_stats': with_stats, 'proof': proof}
+    workers = workers or os.cpu_count() or 1
+    reused = {'nodes': 0, 'cached': True, 'seconds': 0.0}     # поля результату, взятого з кешу
+    if with_stats:
+        reused['stats'] = None
+    totals = {}
+    position = Position()
+    batch = SharedBatch(chunk)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(batch.name, options, tablebase_dir)) as executor:
+            puzzles = iter_puzzles(file)
+            while True:
+                # (номер рядка, результат без полів пошуку, None або (номер запису в пакеті,
+                #  симетрія, чи це сама задача з пакета, а не її дзеркальний повтор))
+                records = []
+                keys = []       # (ключ кешу, симетрія) для кожного запису пакета
+                queued = {}     # {ключ кешу: номер запису в пакеті}
+                for n, line in puzzles:
+                    result = {'id': None, 'fen': line}
+                    try:
+                        fen, operations = parse_epd(line)
+                        result['id'] = operations.get('id')
+                        result['fen'] = fen
+                        depth = get_mate_in(operations, mate_in)
+                        color = position.set_fen(fen)
+                    except (ErrorBadFormat, ErrorNoKing, ValueError) as e:
+                        result.update(status='error', mate_in=None, line=None, nodes=0, error=str(e), seconds=0.0)
+                        records.append((n, result, None))
+                        continue
+                    key = symmetry = None
+                    if cache is not None:
+                        key, symmetry = position.get_canonical(color)
+                        key = (key, depth)
+                        cached = cache.get(key)
+                        if cached is not None:
+                            result.update(orient_result(cached, symmetry), **reused)
+                            records.append((n, result, None))
+                            continue
+                        if key in queued:
+                            records.append((n, result, (queued[key], symmetry, False)))
+                            continue
+                        queued[key] = len(keys)
+                    batch.set(len(keys), position, color, depth)
+                    records.append((n, result, (len(keys), symmetry, True)))
+                    keys.append((key, symmetry))
+                    if len(keys) == chunk:
+                        break
+                if not records:
+                    break
+
+                # дрібніші діапазони - рівніший розподіл задач різної складності між процесами
+                count = len(keys)
+                step = max(1, count // (4 * workers))
+                futures = [executor.submit(_solve_range, start, min(start + step, count))
+                           for start in range(0, count, step)]
+                solved = [result for future in futures for result in future.result()]
+                if cache is not None:
+                    for (key, symmetry), result in zip(keys, solved):
+                        if result['status'] in CACHED_STATUSES:
+                            cache.put(key, orient_result(result, symmetry))
+
+                # повтор задачі, яка не вклалась у ліміт або завершилась помилкою, розв'язується
+                # заново (як і в solve_file, де такий результат не потрапляє в кеш)
+                retries = []
+                for n, result, slot in records:
+                    if slot is not None and not slot[2] and solved[slot[0]]['status'] not in CACHED_STATUSES:
+                        color = position.set_fen(result['fen'])
+                        batch.set(len(retries), position, color, keys[slot[0]][0][1])
+                        retries.append(result)
+                if retries:
+                    count = len(retries)
+                    step = max(1, count // (4 * workers))
+                    futures = [executor.submit(_solve_range, start, min(start + step, count))
+                               for start in range(0, count, step)]
+                    for result, own in zip(retries, (own for future in futures for own in future.result())):
+                        result.update(own)
+
+                for n, result, slot in records:
+                    if slot is not None and 'status' not in result:
+                        index, symmetry, own = slot
+                        if own:
+                            result.update(solved[index])
+                        else:
+                            # симетрії комутують, тому перехід від задачі з пакета до повтору - їх xor
+                            result.update(orient_result(solved[index], symmetry ^ keys[index][1]), **reused)
+                    result['n'] = n
+                    output.write(json.dumps(result, ensure_ascii=False) + '\n')
+                    totals[result['status']] = totals.get(result['status'], 0) + 1
+                output.flush()
+    finally:
+        batch.close()
+        batch.unlink()
+    return totals
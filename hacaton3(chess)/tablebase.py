@@ -0,0 +1,514 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Таблиці ендшпілю (до 4 фігур без пішаків), побудовані ретроградним аналізом
+
+Таблиця для набору фігур (сигнатура на кшталт 'KQK', 'KRK', 'KBNK' - спершу фігури
+білих, потім чорних) зберігає для кожної позиції відстань до мату в півходах (DTM).
+Файл <сигнатура>.tb - це 2 * 64**n байтів, по байту на позицію з індексом
+    side * 64**n + sq_1 * 64**(n-1) + ... + sq_n,   де sq = y * 8 + x, side: 0 - ходять білі
+(фігури - у порядку сигнатури). Байт: 0 - нічия (або позиція неможлива),
+1..127 - сторона, яка ходить, ставить мат за стільки півходів, 128 + d - сторона,
+яка ходить, отримує мат через d півходів (128 - мат вже стоїть).
+Кожна позиція зберігається лише у канонічному вигляді: з 8 симетрій дошки (без
+пішаків дошку можна віддзеркалювати і повертати) вибирається та, що дає найменший індекс.
+Файли читаються через mmap, тому з таблиці в пам'ять потрапляють лише ті сторінки, до
+яких були звернення.
+
+Побудова (менші таблиці, в які ведуть взяття, будуються автоматично):
+    python3 tablebase.py KQK KRK KBNK --dir tb
+
+Таблиця з 3 фігур будується за десяток секунд, з 4 - за десятки хвилин (чистий Python).
+"""
+import argparse
+import mmap
+import os
+import sys
+from itertools import product
+
+from core import SQUARE_COORDS, SQUARE_INDEX
+from figures import Position, Figure
+from attacks import KNIGHT_MOVES, KING_MOVES, ROOK_RAYS, BISHOP_RAYS, QUEEN_RAYS
+
+MAX_PIECES = 4
+SIGNATURE_LETTERS = 'KQRBN'     # порядок фігур у сигнатурі
+LETTER_TYPES = {'K': 'king', 'Q': 'queen', 'R': 'rook', 'B': 'bishop', 'N': 'knight'}
+TYPE_LETTERS = {v: k for k, v in LETTER_TYPES.items()}
+MAX_PLIES = 127
+
+# поля, з яких фігура могла прийти на дане поле (для ходів назад - ті ж, що і вперед)
+_REVERSE_STEPS = {'king': KING_MOVES, 'knight': KNIGHT_MOVES}
+_REVERSE_RAYS = {'queen': QUEEN_RAYS, 'rook': ROOK_RAYS, 'bishop': BISHOP_RAYS}
+
+
+def _symmetries():
+    """
+    8 симетрій дошки як перестановки полів 0..63
+
+    :return: список списків
+    """
+    result = []
+    for transpose, flip_x, flip_y in product((False, True), repeat=3):
+        table = []
+        for sq in range(64):
+            x, y = sq % 8, sq // 8
+            if transpose:
+                x, y = y, x
+            if flip_x:
+                x = 7 - x
+            if flip_y:
+                y = 7 - y
+            table.append(y * 8 + x)
+        result.append(table)
+    return result
+
+
+SYMMETRIES = _symmetries()
+# для кожного поля білого короля - симетрії, які переводять його на найменше поле з можливих
+# (лише вони можуть дати найменший індекс, бо поле білого короля - старший розряд індексу)
+KING_SYMMETRIES = [[symmetry for symmetry in SYMMETRIES if symmetry[sq] == min(s[sq] for s in SYMMETRIES)]
+                   for sq in range(64)]
+# поля білого короля у канонічних позиціях (a1-d1-d4)
+KING_SQUARES = [y * 8 + x for x in range(4) for y in range(x + 1)]
+
+
+def parse_signature(signature):
+    """
+    розбирає сигнатуру на типи фігур білих і чорних
+
+    :param signature: рядок, напр. 'KBNK'
+    :return: (кортеж типів білих, кортеж типів чорних)
+    """
+    signature = signature.upper()
+    if not 2 <= len(signature) <= MAX_PIECES or signature[0] != 'K' or signature[1:].count('K') != 1 \
+            or any(letter not in LETTER_TYPES for letter in signature):
+        raise ValueError('некоректна сигнатура: {} (до {} фігур без пішаків)'.format(signature, MAX_PIECES))
+    split = signature.index('K', 1)
+    white, black = signature[:split], signature[split:]
+    if canonical_side(white) != white or canonical_side(black) != black:
+        raise ValueError('фігури в сигнатурі мають іти в порядку {}: {}'.format(SIGNATURE_LETTERS, signature))
+    return tuple(LETTER_TYPES[letter] for letter in white), tuple(LETTER_TYPES[letter] for letter in black)
+
+
+def canonical_side(letters):
+    return ''.join(sorted(letters, key=SIGNATURE_LETTERS.index))
+
+
+def _side_letters(position, color):
+    return canonical_side(TYPE_LETTERS[figure.get_type()]
+                          for figure in position.get_figures_by_color(color).values())
+
+
+def _decode(value):
+    """
+    :param value: байт з таблиці
+    :return: (1 - виграш, -1 - програш, 0 - нічия; к-ть півходів до мату)
+    """
+    if not value:
+        return 0, 0
+    if value < 128:
+        return 1, value
+    return -1, value - 128
+
+
+class _Table:
+    """
+    Одна таблиця: порядок фігур і перетворення позиції в індекс
+    """
+    def __init__(self, signature, data=None):
+        self.signature = signature.upper()
+        white, black = parse_signature(self.signature)
+        self.pieces = [(t, 'w') for t in white] + [(t, 'b') for t in black]
+        self.n = len(self.pieces)
+        self.size = 2 * 64 ** self.n
+        # діапазони однакових фігур (їх поля сортуються, щоб позиція мала один індекс)
+        self.groups = []
+        start = 0
+        for i in range(1, self.n + 1):
+            if i == self.n or self.pieces[i] != self.pieces[start]:
+                if i - start > 1:
+                    self.groups.append((start, i))
+                start = i
+        self.data = data if data is not None else bytearray(self.size)
+
+    def _raw_index(self, squares, side):
+        index = side
+        for sq in squares:
+            index = index * 64 + sq
+        return index
+
+    def index(self, squares, side):
+        """
+        канонічний індекс позиції
+
+        :param squares: поля фігур у порядку сигнатури
+        :param side: 0 - ходять білі, 1 - чорні
+        :return: ціле число
+        """
+        best = None
+        for symmetry in KING_SYMMETRIES[squares[0]]:
+            mapped = [symmetry[sq] for sq in squares]
+            for start, end in self.groups:
+                mapped[start:end] = sorted(mapped[start:end])
+            index = self._raw_index(mapped, side)
+            if best is None or index < best:
+                best = index
+        return best
+
+    def decode_index(self, index):
+        """
+        :param index: індекс позиції
+        :return: (список полів фігур, side)
+        """
+        squares = []
+        for _ in range(self.n):
+            squares.append(index % 64)
+            index //= 64
+        return squares[::-1], index
+
+    def position_squares(self, position, flip):
+        """
+        поля фігур позиції у порядку сигнатури
+
+        :param position: об'єкт класу Position
+        :param flip: чи поміняні кольори (сильніша сторона в позиції - чорні)
+        :return: список полів
+        """
+        squares = []
+        seen = set()
+        for figure_type, color in self.pieces:
+            if flip:
+                color = 'w' if color == 'b' else 'b'
+            if (figure_type, color) in seen:
+                continue
+            seen.add((figure_type, color))
+            for pos in position.get_figures_by_type_color(figure_type, color):
+                squares.append(SQUARE_INDEX[pos])
+        return squares
+
+    def setup(self, position, squares, side):
+        """
+        розставляє фігури таблиці на дошці
+
+        :return: колір сторони, яка ходить
+        """
+        position._clear()
+        for (figure_type, color), sq in zip(self.pieces, squares):
+            position._place(SQUARE_COORDS[sq], Figure(figure_type, color))
+        return 'w' if side == 0 else 'b'
+
+
+class Tablebase:
+    """
+    Набір таблиць ендшпілю з каталогу
+
+    методи:
+        probe(position, color) -> кортеж або None - результат і к-ть півходів до мату
+        best_line(position, color) -> кортеж - найкоротший мат при найдовшому захисті
+        close() -> None - закриває файли
+    """
+    def __init__(self, directory='.'):
+        self.directory = directory
+        self._tables = {}       # {сигнатура: _Table або None, якщо файлу немає}
+        self._files = []
+
+    def _get_table(self, signature):
+        if signature not in self._tables:
+            path = os.path.join(self.directory, signature + '.tb')
+            table = None
+            if os.path.exists(path):
+                with open(path, 'rb') as file:
+                    data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                table = _Table(signature, data)
+                if len(data) != table.size:
+                    raise ValueError('пошкоджений файл таблиці: {}'.format(path))
+                self._files.append(data)
+            self._tables[signature] = table
+        return self._tables[signature]
+
+    def add_table(self, table):
+        self._tables[table.signature] = table
+
+    def close(self):
+        for data in self._files:
+            data.close()
+        self._files = []
+        self._tables = {}
+
+    def probe(self, position, color):
+        """
+        результат позиції з таблиць
+
+        :param position: об'єкт класу Position
+        :param color: колір сторони, яка ходить
+        :return: None - позиції немає в таблицях, інакше (1 - сторона color виграє,
+                 -1 - програє, 0 - нічия; к-ть півходів до мату)
+        """
+        if len(position.current_state) > MAX_PIECES:
+            return None
+        if position.get_figures_by_type_color('pawn', 'w') or position.get_figures_by_type_color('pawn', 'b'):
+            return None     # таблиці будуються лише для позицій без пішаків
+        white, black = _side_letters(position, 'w'), _side_letters(position, 'b')
+        if white.count('K') != 1 or black.count('K') != 1:
+            return None
+        if white == 'K' and black == 'K':
+            return 0, 0
+        signature = canonical_signature(white, black)
+        flip = signature != white + black
+        table = self._get_table(signature)
+        if table is None and white != black:
+            # таблиця могла бути побудована і для слабшої сторони першою
+            flip = not flip
+            table = self._get_table(black + white if signature == white + black else white + black)
+        if table is None:
+            return None
+        side = 0 if (color == 'w') != flip else 1
+        return _decode(table.data[table.index(table.position_squares(position, flip), side)])
+
+    def best_line(self, position, color):
+        """
+        головна лінія з таблиць: сторона, що виграє, матує найшвидше, сторона, що
+        програє, захищається найдовше
+
+        :param position: об'єкт класу Position (змінюється і відновлюється)
+        :param color: колір сторони, яка ходить
+        :return: кортеж ходів у шаховій нотації (порожній, якщо мату немає)
+        """
+        line = []
+        try:
+            result = self.probe(position, color)
+            while result is not None and result[1]:
+                wdl, plies = result
+                alter_color = 'b' if color == 'w' else 'w'
+                chosen = None
+                for pos1, pos2, transform, turn in position.get_legal_turns(color):
+                    position.make_move(pos1, pos2, transform)
+                    child = self.probe(position, alter_color)
+                    position.unmake_move()
+                    if child is not None and child[0] == -wdl and child[1] == plies - 1:
+                        chosen = (pos1, pos2, transform, turn)
+                        break
+                if chosen is None:
+                    break
+                position.make_move(*chosen[:3])
+                line.append(chosen[3])
+                color, result = alter_color, (-wdl, plies - 1)
+        finally:
+            for _ in line:
+                position.unmake_move()
+        return tuple(line)
+
+
+def canonical_signature(white, black):
+    """
+    сигнатура, в якій першою йде сильніша сторона (більше фігур, потім сильніші фігури)
+
+    :param white: літери фігур однієї сторони, напр. 'KR'
+    :param black: літери фігур іншої сторони
+    :return: рядок
+    """
+    def strength(letters):
+        return -len(letters), [SIGNATURE_LETTERS.index(letter) for letter in letters]
+    white, black = canonical_side(white), canonical_side(black)
+    return white + black if strength(white) <= strength(black) else black + white
+
+
+def _sub_signatures(signature):
+    """
+    сигнатури таблиць, в які можна потрапити взяттям
+
+    :return: множина канонічних сигнатур (без 'KK')
+    """
+    white, black = parse_signature(signature)
+    white, black = ''.join(TYPE_LETTERS[t] for t in white), ''.join(TYPE_LETTERS[t] for t in black)
+    result = set()
+    for i in range(1, len(white)):
+        result.add(canonical_signature(white[:i] + white[i + 1:], black))
+    for i in range(1, len(black)):
+        result.add(canonical_signature(white, black[:i] + black[i + 1:]))
+    result.discard('KK')
+    return result
+
+
+def _unmoves(position, table, squares, side):
+    """
+    позиції, з яких сторона, що щойно ходила, могла прийти в дану (без взяттів)
+
+    :param position: об'єкт класу Position з розставленою позицією
+    :param table: об'єкт _Table
+    :param squares: поля фігур у порядку сигнатури
+    :param side: 0 - ходять білі, 1 - чорні
+    :return: генератор списків полів попередніх позицій
+    """
+    mover = 'b' if side == 0 else 'w'
+    state = position.current_state
+    for i, (figure_type, color) in enumerate(table.pieces):
+        if color != mover:
+            continue
+        pos = SQUARE_COORDS[squares[i]]
+        if figure_type in _REVERSE_STEPS:
+            targets = [tmp for tmp in _REVERSE_STEPS[figure_type][pos] if tmp not in state]
+        else:
+            targets = []
+            for ray in _REVERSE_RAYS[figure_type][pos]:
+                for tmp in ray:
+                    if tmp in state:
+                        break
+                    targets.append(tmp)
+        for pos in targets:
+            previous = list(squares)
+            previous[i] = SQUARE_INDEX[pos]
+            yield previous
+
+
+def generate(signature, directory='.', verbose=False):
+    """
+    будує таблицю ретроградним аналізом і записує її у файл <сигнатура>.tb
+
+    спочатку для кожної позиції знаходяться мати, пати і взяття (результат взяття
+    береться з меншої таблиці), далі від позицій з відомим результатом ходами назад
+    знаходяться позиції на 1 півхід далі від мату: позиція виграна, якщо є хід у
+    програну для суперника, і програна, якщо всі ходи ведуть у виграні для суперника
+    :param signature: сигнатура, напр. 'KQK'
+    :param directory: каталог з таблицями
+    :param verbose: друкувати хід побудови
+    :return: шлях до файлу
+    """
+    table = _Table(signature)
+    os.makedirs(directory, exist_ok=True)
+    for sub in sorted(_sub_signatures(table.signature)):
+        if not os.path.exists(os.path.join(directory, sub + '.tb')):
+            generate(sub, directory, verbose)
+    tablebase = Tablebase(directory)
+    position = Position()
+    values = table.data
+    buckets = {}            # {к-ть півходів: [(індекс, виграш?)]}
+    exits = set()           # позиції, які не можуть бути програні: є взяття в нічию або виграш
+    legal = bytearray(table.size)       # 1 - канонічна можлива позиція
+
+    def lost_in(squares, side):
+        # к-ть півходів до мату, якщо всі ходи ведуть у виграні для суперника позиції, інакше None
+        color = table.setup(position, squares, side)
+        alter_color = 'b' if color == 'w' else 'w'
+        slots = {SQUARE_COORDS[sq]: i for i, sq in enumerate(squares)}
+        longest = 0
+        captures = []
+        for pos1, targets in position.get_legal_moves(color)[2].items():
+            for pos2 in targets:
+                if pos2 in slots:
+                    captures.append((pos1, pos2))
+                    continue
+                child = list(squares)
+                child[slots[pos1]] = SQUARE_INDEX[pos2]
+                value = values[table.index(child, 1 - side)]
+                if not value or value >= 128:
+                    return None
+                longest = max(longest, value)
+        for pos1, pos2 in captures:
+            position.make_move(pos1, pos2)
+            try:
+                wdl, plies = tablebase.probe(position, alter_color)
+            finally:
+                position.unmake_move()
+            if wdl != 1:
+                return None
+            longest = max(longest, plies)
+        return longest + 1
+
+    # 1. мати, пати і взяття
+    count = 0
+    for side in (0, 1):
+        color = 'w' if side == 0 else 'b'
+        for rest in product(range(64), repeat=table.n - 1):
+            squares = [KING_SQUARES[0]] + list(rest)
+            for king in KING_SQUARES:
+                squares[0] = king
+                if len(set(squares)) != table.n:
+                    continue
+                index = table._raw_index(squares, side)
+                if table.index(squares, side) != index:
+                    continue
+                table.setup(position, squares, side)
+                enemy_king = position.get_king_pos('b' if color == 'w' else 'w')
+                if position.is_attacked_by(enemy_king, color):
+                    continue        # неможлива позиція
+                count += 1
+                legal[index] = 1
+                king_pos, check, right_moves = position.get_legal_moves(color)
+                if not right_moves:
+                    if check:
+                        buckets.setdefault(0, []).append((index, False))
+                    continue
+                alter_color = 'b' if color == 'w' else 'w'
+                win, loss, quiet = None, -1, False
+                for pos1, pos2, transform, turn in position._get_turns(right_moves):
+                    if pos2 not in position.current_state:
+                        quiet = True
+                        continue
+                    position.make_move(pos1, pos2, transform)
+                    try:
+                        wdl, plies = tablebase.probe(position, alter_color)
+                    finally:
+                        position.unmake_move()
+                    if wdl == -1:
+                        win = plies + 1 if win is None else min(win, plies + 1)
+                    elif wdl == 0:
+                        exits.add(index)
+                    else:
+                        loss = max(loss, plies + 1)
+                if win is not None:
+                    exits.add(index)
+                    buckets.setdefault(win, []).append((index, True))
+                elif not quiet and index not in exits:
+                    buckets.setdefault(loss, []).append((index, False))
+    if verbose:
+        print('{}: {} позицій'.format(table.signature, count))
+
+    # 2. ретроградний аналіз за зростанням к-ті півходів
+    plies = 0
+    while plies <= max(buckets, default=-1):
+        solved = 0
+        for index, win in buckets.pop(plies, ()):
+            if values[index]:
+                continue
+            if plies > MAX_PLIES - 1:
+                raise ValueError('занадто довгий мат для таблиці: {}'.format(table.signature))
+            values[index] = plies if win else 128 + plies
+            solved += 1
+            squares, side = table.decode_index(index)
+            table.setup(position, squares, side)
+            previous_side = 1 - side
+            for previous in list(_unmoves(position, table, squares, side)):
+                previous_index = table.index(previous, previous_side)
+                # у попередній позиції король сторони, яка ходить зараз, не може бути під шахом
+                if values[previous_index] or not legal[previous_index]:
+                    continue
+                if not win:
+                    buckets.setdefault(plies + 1, []).append((previous_index, True))
+                elif previous_index not in exits:
+                    longest = lost_in(previous, previous_side)
+                    if longest is not None:
+                        buckets.setdefault(longest, []).append((previous_index, False))
+        if verbose and solved:
+            print('{}: {} півходів - {} позицій'.format(table.signature, plies, solved))
+        plies += 1
+
+    path = os.path.join(directory, table.signature + '.tb')
+    with open(path, 'wb') as file:
+        file.write(values)
+    tablebase.close()
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='побудова таблиць ендшпілю')
+    parser.add_argument('signatures', nargs='+', help='сигнатури таблиць, напр. KQK KRK KBNK')
+    parser.add_argument('--dir', default='.', help='каталог з таблицями')
+    args = parser.parse_args(argv)
+    for signature in args.signatures:
+        print(generate(signature, args.dir, verbose=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
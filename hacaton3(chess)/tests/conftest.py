@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+# модулі пакета імпортуються один з одного без префікса (from figures import ...),
+# тому тести запускаються з каталогом модулів у sys.path
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
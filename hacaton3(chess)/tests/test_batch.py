@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+
+from batch import solve_file
+from transposition import SolutionCache
+
+# задача і її дзеркальні копії: вертикалі a <-> h, кольори, обидві симетрії
+MIRRORED = '\n'.join([
+    '8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1',
+    '8/7Q/4pk2/8/8/6K1/4R3/2B5 w - - 0 1',
+    '5b2/3r4/1k6/8/8/2KP4/q7/8 b - - 0 1',
+    '2b5/4r3/6k1/8/8/4PK2/7q/8 b - - 0 1',
+]) + '\n'
+
+
+def _solve(text, **options):
+    output = io.StringIO()
+    solve_file(io.StringIO(text), output, 2, **options)
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_mirrored_positions_reuse_cached_result():
+    results = _solve(MIRRORED, cache=SolutionCache())
+    assert [result.get('cached', False) for result in results] == [False, True, True, True]
+    assert [result['line'] for result in results] == [
+        [['d2', 'e2'], ['d6', 'd5'], ['e2', 'e6']],
+        [['e2', 'd2'], ['e6', 'e5'], ['d2', 'd6']],
+        [['d7', 'e7'], ['d3', 'd4'], ['e7', 'e3']],
+        [['e7', 'd7'], ['e3', 'e4'], ['d7', 'd3']],
+    ]
+
+
+def test_cached_results_keep_stats_field():
+    results = _solve(MIRRORED, cache=SolutionCache(), with_stats=True)
+    assert all('stats' in result for result in results)
+    assert results[0]['stats'] is not None and results[1]['stats'] is None
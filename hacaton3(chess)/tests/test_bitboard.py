@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import random
+import time
+
+import pytest
+
+from bitboard import BitboardPosition, SIDES, BLACK
+from figures import Position, Figure, FIGURE_TYPES
+from perft import SUITE
+
+
+def _random_states(count, seed=1):
+    """
+    випадкові позиції з 4..14 фігур (королі не стоять поруч, пішаків немає на крайніх горизонталях)
+    """
+    rng = random.Random(seed)
+    cells = [(x, y) for x in range(8) for y in range(8)]
+    states = []
+    while len(states) < count:
+        picked = rng.sample(cells, rng.randint(4, 14))
+        (x1, y1), (x2, y2) = picked[:2]
+        if abs(x1 - x2) <= 1 and abs(y1 - y2) <= 1:
+            continue
+        state = {picked[0]: Figure('king', 'w'), picked[1]: Figure('king', 'b')}
+        for pos in picked[2:]:
+            figure_type = rng.choice(FIGURE_TYPES[1:])
+            if figure_type == 'pawn' and pos[1] in (0, 7):
+                figure_type = 'knight'
+            state[pos] = Figure(figure_type, rng.choice('wb'))
+        states.append(state)
+    return states
+
+
+def _perft(board, side, depth):
+    if not depth:
+        return 1
+    nodes = 0
+    for sq1, sq2, code, turn in board._get_turns(side, board._legal_moves(side)[2]):
+        board.make_move(sq1, sq2, code)
+        nodes += _perft(board, side ^ BLACK, depth - 1)
+        board.unmake_move()
+    return nodes
+
+
+@pytest.mark.parametrize('name, create, color, expected', SUITE)
+def test_perft_with_make_unmake(name, create, color, expected):
+    board = BitboardPosition(create().current_state)
+    key = board.get_key(color)
+    assert [_perft(board, SIDES[color], d) for d in (1, 2, 3)] == [expected[d] for d in (1, 2, 3)]
+    assert board.get_key(color) == key and not board.history
+
+
+def test_checkmates_match_position():
+    for state in _random_states(60):
+        position, board = Position(state), BitboardPosition(state)
+        assert board.get_key('b') == position.get_key('b')
+        assert sorted(board.find_checkmates('w', 3)) == sorted(position.find_checkmates('w', 3))
+        assert board.current_state == state and not board.history
+
+
+def test_not_slower_than_position():
+    states = _random_states(60, seed=2)
+
+    def best_time(cls):
+        times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            for state in states:
+                cls(state).find_checkmates('w', 3)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    assert best_time(BitboardPosition) <= best_time(Position)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from engine import search_best_move, MATE_BOUND
+from figures import Position
+from transposition import ScoreTable, TranspositionTable
+
+
+def test_engine_table_is_separate_from_mate_table():
+    position = Position()
+    color = position.set_fen('8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1')
+    with pytest.raises(TypeError):
+        search_best_move(position, color, 2, table=TranspositionTable())
+    turn, score = search_best_move(position, color, 4, table=ScoreTable())
+    assert turn == ('d2', 'e2') and score > MATE_BOUND
+
+
+class _Book:
+    def __init__(self, turn):
+        self.turn = turn
+
+    def choose(self, position, color):
+        return self.turn
+
+
+def test_book_move_is_checked_for_legality():
+    position = Position()
+    color = position.set_fen('8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1')
+    assert search_best_move(position, color, 4, book=_Book(('b3', 'b4'))) == (('b3', 'b4'), position.get_score(color))
+    turn, score = search_best_move(position, color, 4, book=_Book(('d2', 'd8')))
+    assert turn == ('d2', 'e2') and score > MATE_BOUND
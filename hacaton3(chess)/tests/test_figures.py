@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from core import ch2ch
+from figures import Position, ErrorBadFormat, START_FEN
+
+
+def _legal_moves(fen):
+    position = Position()
+    color = position.set_fen(fen)
+    king_pos, check, right_moves = position.get_legal_moves(color)
+    return check, {ch2ch(pos1): sorted(ch2ch(pos2) for pos2 in targets) for pos1, targets in right_moves.items()}
+
+
+@pytest.mark.parametrize('fen, check, expected', [
+    # зв'язана тура ходить лише вздовж лінії зв'язки
+    ('k3r3/8/8/8/8/8/4R3/4K3 w - - 0 1', False,
+     {'e2': ['e3', 'e4', 'e5', 'e6', 'e7', 'e8'], 'e1': ['d1', 'd2', 'f1', 'f2']}),
+    # шах від тури: закритись, з'їсти фігуру, що дає шах, або піти королем
+    ('k3r3/8/8/1B6/8/2N5/8/4K3 w - - 0 1', True,
+     {'b5': ['e2', 'e8'], 'c3': ['e2', 'e4'], 'e1': ['d1', 'd2', 'f1', 'f2']}),
+    # подвійний шах: ходить лише король
+    ('k3r3/8/8/1B6/8/3n4/8/4K3 w - - 0 1', True, {'e1': ['d1', 'd2', 'f1']}),
+])
+def test_legal_moves_with_pins_and_checks(fen, check, expected):
+    assert _legal_moves(fen) == (check, expected)
+
+
+FENS = [
+    START_FEN,
+    '8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1',
+    'r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5Q2/PPPP1PPP/RNB1K1NR b - - 0 1',
+    '6k1/5ppp/8/8/8/8/8/R5K1 b - - 0 1',
+]
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_fen_round_trip(fen):
+    position = Position()
+    color = position.set_fen(fen)
+    assert position.get_fen(color) == fen
+    restored = Position()
+    assert restored.set_fen(position.get_fen(color)) == color
+    assert restored.current_state == position.current_state
+    assert restored.get_key(color) == position.get_key(color)
+    restored = Position()
+    restored.set_bytes(position.get_bytes())
+    assert restored.get_fen(color) == fen
+
+
+@pytest.mark.parametrize('fen', [
+    '',
+    '8/8/8/8/8/8/8 w - - 0 1',                             # 7 горизонталей
+    '8/8/8/8/8/8/8/8/8 w - - 0 1',                         # 9 горизонталей
+    '4k3/8/8/8/8/8/8/4K3 x - - 0 1',                       # невідома сторона
+    '4k3/8/8/8/8/8/8/4K2 w - - 0 1',                       # 7 полів у горизонталі
+    '4k3/8/8/8/8/8/8/4K4 w - - 0 1',                       # 9 полів у горизонталі
+    '4k3/8/8/8/8/8/8/4X3 w - - 0 1',                       # невідома фігура
+])
+def test_bad_fen(fen):
+    with pytest.raises(ErrorBadFormat):
+        Position().set_fen(fen)
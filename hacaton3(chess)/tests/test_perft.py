@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+from perft import SUITE, run_suite
+
+
+def test_suite_depth_3():
+    report = run_suite(3)
+    assert report['ok']
+    assert [(r['position'], r['depth'], r['nodes']) for r in report['results']] == \
+        [(name, d, expected[d]) for name, create, color, expected in SUITE for d in (1, 2, 3)]
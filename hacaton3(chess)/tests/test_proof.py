@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from core import ch2py
+from figures import Position
+
+
+@pytest.mark.parametrize('fen, mate_in', [
+    ('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', 1),
+    ('r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5Q2/PPPP1PPP/RNBQK1NR w - - 0 1', 1),
+    ('8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1', 2),
+    ('4k3/8/8/8/8/8/4P3/4K3 w - - 0 1', 2),      # мату немає
+])
+def test_prove_mate_matches_forced_mate(fen, mate_in):
+    position = Position()
+    color = position.set_fen(fen)
+    key = position.get_key(color)
+    mate = position.prove_mate(color, mate_in)
+    assert position.get_fen(color) == fen and position.get_key(color) == key
+    forced = position.find_forced_mate(color, mate_in)
+    assert (mate is None) == (forced is None)
+    if mate is None:
+        return
+    assert len(mate) == len(forced)
+    for turn in mate:       # головна лінія закінчується матом
+        position.make_move(ch2py(turn[0]), ch2py(turn[1]), *turn[2:])
+        color = 'b' if color == 'w' else 'w'
+    assert position.check_mate(color)
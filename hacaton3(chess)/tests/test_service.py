@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+
+from service import AnalysisService
+
+
+async def _session(requests, until):
+    """
+    надсилає запити сервісу і читає відповіді, поки until(відповіді) не поверне True
+    """
+    service = AnalysisService(1, cache_size=0)
+    server = await service.start('127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    messages = []
+    try:
+        for request in requests:
+            writer.write((json.dumps(request) + '\n').encode('utf-8'))
+        await writer.drain()
+        while not until(messages):
+            messages.append(json.loads(await asyncio.wait_for(reader.readline(), 30)))
+    finally:
+        writer.close()
+        await service.close()
+    return messages
+
+
+def test_unhashable_id_is_reported():
+    messages = asyncio.run(_session(
+        [{'op': 'submit', 'id': [1], 'fen': '8/8/8/8/8/8/8/K6k w - - 0 1', 'task': 'forced_mate', 'depth': 1},
+         {'op': 'cancel', 'id': {'a': 1}},
+         {'op': 'submit', 'id': 'ok', 'fen': '6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', 'task': 'forced_mate',
+          'depth': 1}],
+        lambda messages: any(message['event'] == 'done' for message in messages)))
+    errors = [message for message in messages if message['event'] == 'error']
+    assert len(errors) == 2 and all(message['id'] is None for message in errors)
+    assert messages[-1] == dict(messages[-1], id='ok', status='ok', result=[['a1', 'a8']])
+
+
+def test_deadline_counts_time_in_queue():
+    # єдиний процес зайнятий довгим завданням, друге чекає в черзі довше за свій deadline
+    start = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1'
+    messages = asyncio.run(_session(
+        [{'op': 'submit', 'id': 'long', 'fen': start, 'task': 'checkmates', 'depth': 9, 'deadline': 20},
+         {'op': 'submit', 'id': 'queued', 'fen': start, 'task': 'forced_mate', 'depth': 1, 'deadline': 1},
+         {'op': 'submit', 'id': 'queued2', 'fen': start, 'task': 'forced_mate', 'depth': 1, 'deadline': 1}],
+        lambda messages: {message['id'] for message in messages if message['event'] == 'done'}
+        >= {'queued', 'queued2'}))
+    done = {message['id']: message for message in messages if message['event'] == 'done'}
+    assert 'long' not in done
+    assert done['queued']['status'] == done['queued2']['status'] == 'timeout'
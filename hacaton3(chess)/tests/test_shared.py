@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+
+import batch
+from figures import Position, START_FEN
+from shared import SharedBatch, PositionView
+from transposition import SolutionCache
+
+FENS = [
+    START_FEN,
+    '8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1',
+    'r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5Q2/PPPP1PPP/RNB1K1NR b - - 0 1',
+    '8/8/8/4k3/8/8/4P3/4K3 w - - 0 1',
+]
+
+# задачі, дзеркальні копії (вертикалі a <-> h, кольори) і некоректні рядки
+PUZZLES = '\n'.join([
+    '# test',
+    '6k1/5ppp/8/8/8/8/8/R5K1 w - - dm 1; id "back rank";',
+    '8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1',
+    '8/7Q/4pk2/8/8/6K1/4R3/2B5 w - - 0 1',
+    '5b2/3r4/1k6/8/8/2KP4/q7/8 b - - 0 1',
+    'bad fen',
+    '1k6/ppp5/8/8/8/8/8/1K5R w - - dm 1;',
+    '8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1',
+    START_FEN,
+    '2b5/4r3/6k1/8/8/4PK2/7q/8 b - - 0 1',
+]) + '\n'
+
+
+def test_view_round_trip():
+    positions = []
+    for fen in FENS:
+        position = Position()
+        positions.append((position, position.set_fen(fen)))
+    shared = SharedBatch(len(positions))
+    try:
+        for index, (position, color) in enumerate(positions):
+            shared.set(index, position, color, 3)
+        attached = SharedBatch(name=shared.name)
+        for index, (position, color) in enumerate(positions):
+            view = attached.view(index)
+            assert view.get_fen(color) == position.get_fen(color)
+            assert view.current_state == position.current_state
+            assert view.get_king_pos('b') == position.get_king_pos('b')
+            assert attached.get_color(index) == color and attached.get_mate_in(index) == 3
+            assert view.to_position().get_key(color) == position.get_key(color)
+        del view
+        attached.close()
+    finally:
+        shared.close()
+        shared.unlink()
+    assert PositionView(positions[0][0].get_bytes()).get_fen() == START_FEN
+
+
+def _strip(results):
+    return [{key: value for key, value in result.items() if key != 'seconds'} for result in results]
+
+
+def test_workers_match_serial(tmp_path):
+    path, output = tmp_path / 'puzzles.epd', tmp_path / 'results.jsonl'
+    path.write_text(PUZZLES, encoding='utf-8')
+    for cache in (0, 100):
+        serial = io.StringIO()
+        batch.solve_file(io.StringIO(PUZZLES), serial, 2, cache=SolutionCache(cache) if cache else None)
+        serial = [json.loads(line) for line in serial.getvalue().splitlines()]
+        assert batch.main([str(path), '--mate-in', '2', '--workers', '2', '--chunk', '3', '--cache', str(cache),
+                           '--output', str(output)]) == 0
+        parallel = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+        assert _strip(parallel) == _strip(serial)
+    assert sum(result.get('cached', False) for result in parallel) == 5
+
+
+def test_duplicate_over_budget_is_searched_again(tmp_path):
+    path, output = tmp_path / 'puzzles.epd', tmp_path / 'results.jsonl'
+    path.write_text(PUZZLES, encoding='utf-8')
+    serial = io.StringIO()
+    batch.solve_file(io.StringIO(PUZZLES), serial, 2, max_nodes=50, cache=SolutionCache())
+    serial = [json.loads(line) for line in serial.getvalue().splitlines()]
+    assert batch.main([str(path), '--mate-in', '2', '--nodes', '50', '--workers', '2',
+                       '--output', str(output)]) == 0
+    parallel = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert _strip(parallel) == _strip(serial)
+    repeats = [result for result in parallel if result['fen'] == '8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - 0 1']
+    assert [result['status'] for result in repeats] == ['budget', 'budget']
+    assert not any(result.get('cached', False) for result in repeats)
+
+
+def test_both_paths_reject_same_depth(tmp_path):
+    text = '\n'.join('8/Q7/2kp4/8/8/1K6/3R4/5B2 w - - dm {};'.format(depth) for depth in (0, 1, 255, 256)) + '\n'
+    path, output = tmp_path / 'puzzles.epd', tmp_path / 'results.jsonl'
+    path.write_text(text, encoding='utf-8')
+    serial = io.StringIO()
+    batch.solve_file(io.StringIO(text), serial, 2, max_nodes=50)
+    serial = [json.loads(line) for line in serial.getvalue().splitlines()]
+    assert batch.main([str(path), '--nodes', '50', '--workers', '1', '--cache', '0', '--output', str(output)]) == 0
+    parallel = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert _strip(parallel) == _strip(serial)
+    assert [result['status'] == 'error' for result in serial] == [True, False, False, True]
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+from figures import Position
+from tablebase import Tablebase
+
+
+def test_probe_skips_positions_with_pawns(tmp_path):
+    tablebase = Tablebase(str(tmp_path))
+    position = Position()
+    color = position.set_fen('8/8/8/4k3/8/8/4P3/4K3 w - - 0 1')
+    assert tablebase.probe(position, color) is None
+    assert position.find_forced_mate(color, 1, tablebase=tablebase) is None
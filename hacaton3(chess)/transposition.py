@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Модуль з таблицею транспозицій для пошуку матів
+
+Таблиця має обмежений розмір: вона складається з size кошиків по 2 записи.
+Перший запис кошика замінюється лише записом з не меншою глибиною
+(глибші результати дорожчі), другий - завжди. Запис зберігає вердикт для
+трійки (позиція, сторона, що ходить, глибина, що залишилась): кортеж
+продовжень, які ведуть до мату (порожній кортеж - мату немає).
+ProofTable - така ж таблиця для чисел доказу і спростування (модуль proof),
+ScoreTable - для оцінок альфа-бета пошуку (модуль engine). Ключі в усіх таблицях -
+однакові хеші Position.get_key, тому кожен вид пошуку має свій клас таблиці, і
+передати таблицю одного пошуку іншому не вийде (у них різні методи store).
+SolutionCache - готові розв'язки задач з ключем Position.get_canonical.
+"""
+from collections import OrderedDict
+
+
+class TranspositionTable:
+    """
+    Клас таблиці транспозицій
+
+    методи:
+        probe(key, depth) -> tuple або None - шукає вердикт для позиції
+        store(key, depth, lines) -> None - зберігає вердикт для позиції
+        clear() -> None - очищує таблицю і статистику
+        stats() -> словник - к-ть звернень, влучань, промахів, записів і замін
+    """
+    def __init__(self, size=1 << 16, max_lines=64):
+        """
+        :param size: к-ть кошиків (округлюється до степеня двійки)
+        :param max_lines: максимальна к-ть продовжень у записі з матом
+        """
+        self.size = 1 << max(size - 1, 1).bit_length()
+        self.max_lines = max_lines
+        self._mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        self._keys = [None] * (2 * self.size)
+        self._depths = [0] * (2 * self.size)
+        self._values = [None] * (2 * self.size)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def probe(self, key, depth):
+        """
+        шукає вердикт для позиції
+
+        :param key: хеш позиції разом зі стороною, що ходить
+        :param depth: к-ть ходів, що залишилась
+        :return: кортеж продовжень до мату або None, якщо запису немає
+        """
+        index = (key & self._mask) << 1
+        for i in (index, index + 1):
+            if self._keys[i] == key and self._depths[i] == depth:
+                self.hits += 1
+                return self._values[i]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, lines):
+        """
+        зберігає вердикт для позиції
+
+        занадто великі списки продовжень не зберігаються зовсім
+        :param key: хеш позиції разом зі стороною, що ходить
+        :param depth: к-ть ходів, що залишилась
+        :param lines: кортеж продовжень до мату (порожній - мату немає)
+        :return: None
+        """
+        if len(lines) > self.max_lines:
+            return
+        index = (key & self._mask) << 1
+        if self._keys[index] is not None and self._depths[index] > depth \
+                and not (self._keys[index] == key and self._depths[index] == depth):
+            index += 1      # глибший запис лишаємо, пишемо у запис "завжди замінювати"
+        if self._keys[index] is not None and \
+                (self._keys[index] != key or self._depths[index] != depth):
+            self.replacements += 1
+        self._keys[index] = key
+        self._depths[index] = depth
+        self._values[index] = tuple(lines)
+        self.stores += 1
+
+    def stats(self):
+        """
+        статистика використання таблиці
+
+        :return: словник
+        """
+        probes = self.hits + self.misses
+        return {'probes': probes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / probes if probes else 0.0,
+                'stores': self.stores,
+                'replacements': self.replacements}
+
+
+class ProofTable:
+    """
+    Таблиця чисел доказу і спростування для пошуку proof-number (модуль proof)
+
+    Влаштована так само, як TranspositionTable: size кошиків по 2 записи, перший
+    замінюється лише записом з не меншою к-тю півходів, що залишились, другий - завжди.
+    Запис для позиції (разом зі стороною, що ходить): число доказу pn, число
+    спростування dn, к-ть півходів до мату (для доведених позицій) і к-ть півходів,
+    що залишались до горизонту пошуку, коли запис було зроблено.
+
+    методи:
+        probe(key) -> кортеж (pn, dn, plies, depth) або None - шукає запис для позиції
+        store(key, depth, pn, dn, plies) -> None - зберігає запис для позиції
+        clear() -> None - очищує таблицю і статистику
+        stats() -> словник - к-ть звернень, влучань, промахів, записів і замін
+    """
+    def __init__(self, size=1 << 18):
+        """
+        :param size: к-ть кошиків (округлюється до степеня двійки)
+        """
+        self.size = 1 << max(size - 1, 1).bit_length()
+        self._mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        self._keys = [None] * (2 * self.size)
+        self._values = [None] * (2 * self.size)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def probe(self, key):
+        """
+        шукає запис для позиції
+
+        :param key: хеш позиції разом зі стороною, що ходить
+        :return: кортеж (pn, dn, plies, depth) або None, якщо запису немає
+        """
+        index = (key & self._mask) << 1
+        for i in (index, index + 1):
+            if self._keys[i] == key:
+                self.hits += 1
+                return self._values[i]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, pn, dn, plies=None):
+        """
+        зберігає запис для позиції
+
+        :param key: хеш позиції разом зі стороною, що ходить
+        :param depth: к-ть півходів до горизонту пошуку
+        :param pn: число доказу (0 - мат доведено)
+        :param dn: число спростування (0 - мату немає)
+        :param plies: к-ть півходів до мату для доведеної позиції
+        :return: None
+        """
+        index = (key & self._mask) << 1
+        if self._keys[index + 1] == key:
+            index += 1
+        elif self._keys[index] is not None and self._keys[index] != key and self._values[index][3] > depth:
+            index += 1      # глибший запис лишаємо, пишемо у запис "завжди замінювати"
+        if self._keys[index] is not None and self._keys[index] != key:
+            self.replacements += 1
+        self._keys[index] = key
+        self._values[index] = (pn, dn, plies, depth)
+        self.stores += 1
+
+    def stats(self):
+        """
+        статистика використання таблиці
+
+        :return: словник
+        """
+        probes = self.hits + self.misses
+        return {'probes': probes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / probes if probes else 0.0,
+                'stores': self.stores,
+                'replacements': self.replacements}
+
+
+class ScoreTable:
+    """
+    Таблиця оцінок для альфа-бета пошуку (модуль engine)
+
+    Влаштована так само, як TranspositionTable: size кошиків по 2 записи, перший
+    замінюється лише записом з не меншою глибиною, другий - завжди. Запис для трійки
+    (позиція, сторона, що ходить, глибина, що залишилась): тип оцінки (точна, не менша,
+    не більша), оцінка і найкращий хід.
+
+    методи:
+        probe(key, depth) -> кортеж (flag, score, best) або None - шукає запис для позиції
+        store(key, depth, flag, score, best) -> None - зберігає запис для позиції
+        clear() -> None - очищує таблицю і статистику
+        stats() -> словник - к-ть звернень, влучань, промахів, записів і замін
+    """
+    def __init__(self, size=1 << 16):
+        """
+        :param size: к-ть кошиків (округлюється до степеня двійки)
+        """
+        self.size = 1 << max(size - 1, 1).bit_length()
+        self._mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        self._keys = [None] * (2 * self.size)
+        self._depths = [0] * (2 * self.size)
+        self._values = [None] * (2 * self.size)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def probe(self, key, depth):
+        """
+        шукає запис для позиції
+
+        :param key: хеш позиції разом зі стороною, що ходить
+        :param depth: к-ть півходів, що залишилась
+        :return: кортеж (flag, score, best) або None, якщо запису немає
+        """
+        index = (key & self._mask) << 1
+        for i in (index, index + 1):
+            if self._keys[i] == key and self._depths[i] == depth:
+                self.hits += 1
+                return self._values[i]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, flag, score, best):
+        """
+        зберігає запис для позиції
+
+        :param key: хеш позиції разом зі стороною, що ходить
+        :param depth: к-ть півходів, що залишилась
+        :param flag: тип оцінки (engine.EXACT, LOWER, UPPER)
+        :param score: оцінка
+        :param best: найкращий хід у нотації або None
+        :return: None
+        """
+        index = (key & self._mask) << 1
+        if self._keys[index] is not None and self._depths[index] > depth \
+                and not (self._keys[index] == key and self._depths[index] == depth):
+            index += 1      # глибший запис лишаємо, пишемо у запис "завжди замінювати"
+        if self._keys[index] is not None and \
+                (self._keys[index] != key or self._depths[index] != depth):
+            self.replacements += 1
+        self._keys[index] = key
+        self._depths[index] = depth
+        self._values[index] = (flag, score, best)
+        self.stores += 1
+
+    def stats(self):
+        """
+        статистика використання таблиці
+
+        :return: словник
+        """
+        probes = self.hits + self.misses
+        return {'probes': probes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / probes if probes else 0.0,
+                'stores': self.stores,
+                'replacements': self.replacements}
+
+
+class SolutionCache:
+    """
+    Розв'язки цілих задач для повторного використання (пакетне розв'язування, сервіс)
+
+    Ключ - канонічний ключ позиції (Position.get_canonical) разом з параметрами задачі,
+    тому дзеркальні позиції потрапляють в один запис; розв'язок зберігається в канонічній
+    орієнтації. Коли записів стає більше за size, видаляється той, до якого найдовше
+    не звертались.
+
+    методи:
+        get(key) -> значення або None - шукає розв'язок
+        put(key, value) -> None - зберігає розв'язок
+        stats() -> словник - к-ть звернень, влучань, промахів і записів
+    """
+    def __init__(self, size=1 << 16):
+        """
+        :param size: максимальна к-ть записів
+        """
+        self.size = size
+        self._values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key):
+        value = self._values.get(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        self._values.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._values[key] = value
+        self._values.move_to_end(key)
+        if len(self._values) > self.size:
+            self._values.popitem(last=False)
+        self.stores += 1
+
+    def stats(self):
+        """
+        статистика використання кешу
+
+        :return: словник
+        """
+        probes = self.hits + self.misses
+        return {'probes': probes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / probes if probes else 0.0,
+                'stores': self.stores,
+                'size': len(self._values)}
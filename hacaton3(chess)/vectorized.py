@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Атаки, шахи і рухливість одразу для багатьох позицій (NumPy)
+
+Позиції подаються масивом int8 форми (N, 64): елемент [i, x + 8 * y] - код фігури
+на полі (x, y) в i-й позиції, як у Position.get_bytes: 0 - порожнє поле,
+1..6 - біла фігура (номер у FIGURE_TYPES + 1), 9..14 - чорна (те саме + 8).
+Об'єкти Figure не створюються: для кожного типу фігур масив перетворюється на
+бітборди - по одному uint64 на позицію, де біт x + 8 * y означає фігуру на полі (x, y),
+і ходи обчислюються зсувами бітбордів одразу для всіх позицій; промені далекобійних
+фігур поширюються крок за кроком, поки не впруться у фігуру.
+
+Рухливість - к-ть ходів і взяттів усіх фігур сторони, як у Position._get_all_moves_color
+(без перевірки, чи не залишається король під шахом). Атаковані поля - поля, які б'є
+хоча б одна фігура сторони, незалежно від того, що на них стоїть (як is_attacked_by).
+
+NumPy імпортується лише при першому виклику (pip install numpy).
+
+Запуск (статистика по файлу EPD/FEN):
+    python3 vectorized.py positions.epd --chunk 100000
+"""
+import argparse
+import json
+import sys
+
+from attacks import KNIGHT_STEPS, KING_STEPS, ROOK_DIRS, BISHOP_DIRS
+from figures import FIGURE_TYPES
+
+KING, QUEEN, BISHOP, ROOK, KNIGHT, PAWN = (FIGURE_TYPES.index(t) + 1 for t in
+                                           ('king', 'queen', 'bishop', 'rook', 'knight', 'pawn'))
+BLACK = 8       # додається до коду чорної фігури
+
+_np = None
+_source_masks = {}      # {dx: поля, з яких зсув на dx по горизонталі не виходить за край}
+_popcount8 = None       # к-ть одиничних бітів для кожного байта (якщо немає numpy.bitwise_count)
+
+
+def _numpy():
+    global _np, _popcount8
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('для пакетних обчислень потрібен NumPy: pip install numpy')
+        for dx in range(-2, 3):
+            _source_masks[dx] = numpy.uint64(sum(1 << sq for sq in range(64) if 0 <= sq % 8 + dx < 8))
+        if not hasattr(numpy, 'bitwise_count'):
+            _popcount8 = numpy.array([bin(i).count('1') for i in range(256)], dtype=numpy.int32)
+        _np = numpy
+    return _np
+
+
+def _shift(bb, dx, dy):
+    """
+    зсуває бітборди на (dx, dy); поля, що вийшли за край дошки, відкидаються
+
+    :param bb: масив uint64 форми (N,)
+    :return: масив uint64 форми (N,)
+    """
+    bb = bb & _source_masks[dx]
+    shift = dx + 8 * dy
+    return bb << _np.uint64(shift) if shift > 0 else bb >> _np.uint64(-shift)
+
+
+def _popcount(bb):
+    """
+    :param bb: масив uint64 форми (N,)
+    :return: масив int32 форми (N,) - к-ть полів у кожному бітборді
+    """
+    if _popcount8 is None:
+        return _np.bitwise_count(bb).astype(_np.int32)
+    return _popcount8[bb.view(_np.uint8).reshape(-1, 8)].sum(axis=1, dtype=_np.int32)
+
+
+def _to_bitboards(mask):
+    """
+    :param mask: масив bool форми (N, 64)
+    :return: масив uint64 форми (N,)
+    """
+    packed = _np.packbits(mask, axis=1, bitorder='little')
+    return _np.ascontiguousarray(packed).view('<u8').ravel().astype(_np.uint64)
+
+
+def _to_squares(bb):
+    """
+    :param bb: масив uint64 форми (N,)
+    :return: масив bool форми (N, 64)
+    """
+    packed = bb.astype('<u8').view(_np.uint8).reshape(-1, 8)
+    return _np.unpackbits(packed, axis=1, bitorder='little').astype(bool)
+
+
+def unpack_bytes(data):
+    """
+    масив позицій з записів Position.get_bytes, записаних підряд
+
+    :param data: bytes (або буфер) довжиною 32 * N
+    :return: масив int8 форми (N, 64)
+    """
+    np = _numpy()
+    packed = np.frombuffer(data, dtype=np.uint8)
+    if packed.size % 32:
+        raise ValueError('довжина даних має бути кратною 32')
+    boards = np.empty((packed.size // 32, 64), dtype=np.int8)
+    boards[:, 0::2] = (packed & 15).reshape(-1, 32)
+    boards[:, 1::2] = (packed >> 4).reshape(-1, 32)
+    return boards
+
+
+def encode_positions(positions):
+    """
+    :param positions: ітерабельний об'єкт з об'єктами класу Position
+    :return: масив int8 форми (N, 64)
+    """
+    return unpack_bytes(b''.join(position.get_bytes() for position in positions))
+
+
+def _side(boards, color):
+    """
+    атаковані поля і рухливість однієї сторони
+
+    :param boards: масив int8 форми (N, 64)
+    :param color: 'w' або 'b'
+    :return: (масив bool (N, 64) - атаковані поля, масив int32 (N,) - к-ть ходів)
+    """
+    np = _numpy()
+    base = 0 if color == 'w' else BLACK
+    empty = _to_bitboards(boards == 0)
+    own = _to_bitboards((boards > base) & (boards <= base + PAWN))
+    free = ~own         # поля, куди можна піти або де можна взяти
+    enemy = ~empty & free
+    attacks = np.zeros(boards.shape[0], dtype=np.uint64)
+    moves = np.zeros(boards.shape[0], dtype=np.int32)
+
+    for piece, steps in ((KNIGHT, KNIGHT_STEPS), (KING, KING_STEPS)):
+        pieces = _to_bitboards(boards == base + piece)
+        for dx, dy in steps:
+            target = _shift(pieces, dx, dy)
+            attacks |= target
+            moves += _popcount(target & free)
+
+    for piece, directions in ((ROOK, ROOK_DIRS), (BISHOP, BISHOP_DIRS)):
+        sliders = _to_bitboards((boards == base + piece) | (boards == base + QUEEN))
+        for dx, dy in directions:
+            # промені різних фігур в одному напрямку не перетинаються (задня фігура
+            # впирається в передню), тому к-ть полів - це к-ть ходів
+            frontier = sliders
+            for _ in range(7):
+                frontier = _shift(frontier, dx, dy)
+                attacks |= frontier
+                moves += _popcount(frontier & free)
+                frontier &= empty
+                if not frontier.any():
+                    break
+
+    pawns = _to_bitboards(boards == base + PAWN)
+    dy, start_row = (1, 1) if color == 'w' else (-1, 6)
+    for dx in (-1, 1):
+        target = _shift(pawns, dx, dy)
+        attacks |= target
+        moves += _popcount(target & enemy)
+    single = _shift(pawns, 0, dy) & empty
+    moves += _popcount(single)
+    # хід на 2 поля - для пішаків, які зі стартової горизонталі пройшли на 1 поле
+    double = single & np.uint64(0xff << 8 * (start_row + dy))
+    moves += _popcount(_shift(double, 0, dy) & empty)
+    return _to_squares(attacks), moves
+
+
+def analyse(boards):
+    """
+    атаковані поля, шахи і рухливість обох сторін
+
+    :param boards: масив int8 форми (N, 64) (див. опис модуля)
+    :return: словник {'attacks': {'w': bool (N, 64), 'b': ...},
+                      'check': {'w': bool (N,) - білий король під шахом, 'b': ...},
+                      'mobility': {'w': int32 (N,), 'b': ...}}
+    """
+    np = _numpy()
+    boards = np.asarray(boards, dtype=np.int8)
+    if boards.ndim != 2 or boards.shape[1] != 64:
+        raise ValueError('очікується масив форми (N, 64)')
+    attacks, moves = {}, {}
+    for color in ('w', 'b'):
+        attacks[color], moves[color] = _side(boards, color)
+    check = {'w': (attacks['b'] & (boards == KING)).any(axis=1),
+             'b': (attacks['w'] & (boards == BLACK + KING)).any(axis=1)}
+    return {'attacks': attacks, 'check': check, 'mobility': moves}
+
+
+def attack_maps(boards):
+    """
+    :param boards: масив int8 форми (N, 64)
+    :return: (білі, чорні) - масиви bool (N, 64) атакованих полів
+    """
+    result = analyse(boards)['attacks']
+    return result['w'], result['b']
+
+
+def in_check(boards):
+    """
+    :param boards: масив int8 форми (N, 64)
+    :return: (білі, чорні) - масиви bool (N,): чи король під шахом
+    """
+    result = analyse(boards)['check']
+    return result['w'], result['b']
+
+
+def mobility(boards):
+    """
+    :param boards: масив int8 форми (N, 64)
+    :return: (білі, чорні) - масиви int32 (N,) з к-тю ходів
+    """
+    result = analyse(boards)['mobility']
+    return result['w'], result['b']
+
+
+def main(argv=None):
+    from batch import parse_epd, iter_puzzles
+    from figures import Position, ErrorBadFormat, ErrorNoKing
+
+    parser = argparse.ArgumentParser(description='статистика атак, шахів і рухливості по файлу позицій')
+    parser.add_argument('input', help='файл EPD/FEN (одна позиція в рядку)')
+    parser.add_argument('--chunk', type=int, default=100000, help='к-ть позицій, що обробляються разом')
+    args = parser.parse_args(argv)
+
+    totals = {'positions': 0, 'errors': 0, 'check_w': 0, 'check_b': 0, 'mobility_w': 0, 'mobility_b': 0,
+              'attacked_w': 0, 'attacked_b': 0}
+
+    def flush(chunk):
+        if not chunk:
+            return
+        result = analyse(unpack_bytes(b''.join(chunk)))
+        totals['positions'] += len(chunk)
+        for color in ('w', 'b'):
+            totals['check_' + color] += int(result['check'][color].sum())
+            totals['mobility_' + color] += int(result['mobility'][color].sum())
+            totals['attacked_' + color] += int(result['attacks'][color].sum())
+        chunk.clear()
+
+    position = Position()
+    chunk = []
+    with open(args.input, encoding='utf-8') as file:
+        for line_number, line in iter_puzzles(file):
+            try:
+                position.set_fen(parse_epd(line)[0])
+            except (ErrorBadFormat, ErrorNoKing, ValueError):
+                totals['errors'] += 1
+                continue
+            chunk.append(position.get_bytes())
+            if len(chunk) >= args.chunk:
+                flush(chunk)
+    flush(chunk)
+    n = totals['positions'] or 1
+    for key in ('mobility_w', 'mobility_b', 'attacked_w', 'attacked_b'):
+        totals[key + '_mean'] = totals[key] / n
+    print(json.dumps(totals, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())